@@ -3,6 +3,7 @@ import logging
 import asyncio
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from django.db import transaction
 
 logger = logging.getLogger(__name__)
 
@@ -66,6 +67,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
             self.room_name,
             {
                 "type": "chat.message",
+                "id": message_info["id"],
                 "message": message_text or "",
                 "sender": self.me,
                 "file": message_info.get("file"),
@@ -103,9 +105,12 @@ class ChatConsumer(AsyncWebsocketConsumer):
             message.file_name = file_name
             message.file_size = len(file_content)
 
-        message.save()
+        # Сообщение и счётчики непрочитанных — одной транзакцией
+        with transaction.atomic():
+            message.save()
 
         return {
+            "id": message.id,
             "file": bool(message.file),
             "file_name": message.file_name if message.file else None,
             "file_url": message.file.url if message.file else None,
@@ -113,6 +118,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
     async def chat_message(self, event):
         await self.send(text_data=json.dumps({
+            "id": event.get("id"),
             "message": event["message"],
             "sender": event["sender"],
             "file": event.get("file", False),
@@ -193,6 +199,7 @@ class GroupChatConsumer(AsyncWebsocketConsumer):
             self.room_name,
             {
                 "type": "group.message",
+                "id": message_info["id"],
                 "message": message_text or "",
                 "sender": self.user_id,
                 "sender_name": message_info["sender_name"],
@@ -229,9 +236,12 @@ class GroupChatConsumer(AsyncWebsocketConsumer):
             message.file_name = file_name
             message.file_size = len(file_content)
 
-        message.save()
+        # Сообщение и счётчики непрочитанных — одной транзакцией
+        with transaction.atomic():
+            message.save()
 
         return {
+            "id": message.id,
             "sender_name": f"{sender.first_name} {sender.last_name}",
             "file": bool(message.file),
             "file_name": message.file_name if message.file else None,
@@ -240,6 +250,7 @@ class GroupChatConsumer(AsyncWebsocketConsumer):
 
     async def group_message(self, event):
         await self.send(text_data=json.dumps({
+            "id": event.get("id"),
             "message": event["message"],
             "sender": event["sender"],
             "sender_name": event["sender_name"],
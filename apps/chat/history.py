@@ -0,0 +1,79 @@
+"""
+Історія чату сторінками з курсором по (timestamp, id).
+
+Без курсора повертаються останні N повідомлень; before=<курсор> — старші
+за нього (підвантаження при прокрутці вгору), after=<курсор> — новіші
+(догнати пропущене після перепідключення). Курсор непрозорий для клієнта:
+base64 від "timestamp|id", id розрізняє повідомлення з однаковим часом.
+"""
+import base64
+import binascii
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(message):
+    raw = f"{message.timestamp.isoformat()}|{message.pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        timestamp, pk = raw.rsplit("|", 1)
+        parsed = parse_datetime(timestamp)
+        if parsed is None:
+            raise ValueError(timestamp)
+        return parsed, int(pk)
+    except (ValueError, binascii.Error, UnicodeDecodeError) as e:
+        raise InvalidCursor(cursor) from e
+
+
+def page_limit(value):
+    """Розмір сторінки з параметра limit, в межах 1..CHAT_PAGE_SIZE_MAX"""
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        return settings.CHAT_PAGE_SIZE
+    return min(max(limit, 1), settings.CHAT_PAGE_SIZE_MAX)
+
+
+def paginate(queryset, before=None, after=None, limit=None):
+    """
+    Сторінка повідомлень у хронологічному порядку:
+    {"messages": [...], "has_more": bool, "before": курсор, "after": курсор}.
+    has_more — чи є ще повідомлення в напрямку запиту (для after — новіші,
+    інакше — старші); before/after — курсори першого і останнього на сторінці.
+    """
+    limit = limit or settings.CHAT_PAGE_SIZE
+
+    if after:
+        timestamp, pk = decode_cursor(after)
+        queryset = queryset.filter(
+            Q(timestamp__gt=timestamp) | Q(timestamp=timestamp, pk__gt=pk)
+        ).order_by("timestamp", "pk")
+    else:
+        if before:
+            timestamp, pk = decode_cursor(before)
+            queryset = queryset.filter(Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, pk__lt=pk))
+        queryset = queryset.order_by("-timestamp", "-pk")
+
+    # Зайвий рядок показує, чи є наступна сторінка, без окремого COUNT
+    messages = list(queryset[:limit + 1])
+    has_more = len(messages) > limit
+    messages = messages[:limit]
+    if not after:
+        messages.reverse()
+
+    return {
+        "messages": messages,
+        "has_more": has_more,
+        "before": encode_cursor(messages[0]) if messages else before,
+        "after": encode_cursor(messages[-1]) if messages else after,
+    }
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:47
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chat", "0003_groupmessage_file_groupmessage_file_name_and_more"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="groupmessage",
+            index=models.Index(fields=["timestamp", "id"], name="chat_groupmsg_ts_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="message",
+            index=models.Index(
+                fields=["sender", "receiver", "timestamp"],
+                name="chat_message_pair_ts_idx",
+            ),
+        ),
+    ]
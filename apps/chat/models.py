@@ -19,6 +19,9 @@ class Message(models.Model):
 
     class Meta:
         ordering = ["timestamp"]
+        indexes = [
+            models.Index(fields=["sender", "receiver", "timestamp"], name="chat_message_pair_ts_idx"),
+        ]
 
     def get_file_size_display(self):
         if self.file_size < 1024:
@@ -40,6 +43,9 @@ class GroupMessage(models.Model):
 
     class Meta:
         ordering = ["timestamp"]
+        indexes = [
+            models.Index(fields=["timestamp", "id"], name="chat_groupmsg_ts_idx"),
+        ]
     
     def get_file_size_display(self):
         """Форматированный размер файла"""
@@ -48,4 +54,28 @@ class GroupMessage(models.Model):
         elif self.file_size < 1024 * 1024:
             return f"{self.file_size / 1024:.1f} KB"
         else:
-            return f"{self.file_size / (1024 * 1024):.1f} MB"
\ No newline at end of file
+            return f"{self.file_size / (1024 * 1024):.1f} MB"
+
+class ReadReceipt(models.Model):
+    """
+    Прочитанное пользователем в одном разговоре: личный чат с peer или общий
+    чат (peer=None). unread поддерживается при вставке сообщений и при
+    прочтении (apps.chat.receipts), поэтому счётчики не пересчитываются.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="chat_receipts")
+    peer = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name="+")
+    last_read_id = models.BigIntegerField(default=0)
+    unread = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "peer"], condition=models.Q(peer__isnull=False),
+                                    name="chat_receipt_user_peer"),
+            models.UniqueConstraint(fields=["user"], condition=models.Q(peer__isnull=True),
+                                    name="chat_receipt_user_group"),
+        ]
+
+    @property
+    def conversation(self):
+        return "group" if self.peer_id is None else str(self.peer_id)
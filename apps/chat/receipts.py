@@ -0,0 +1,118 @@
+"""
+Лічильники непрочитаних повідомлень чату (ReadReceipt).
+
+Рядок на (користувач, розмова): особистий чат з peer або загальний (peer=None)
+з id останнього прочитаного повідомлення і кількістю непрочитаних.
+
+* нове особисте повідомлення — один upsert: отримувачу unread + 1;
+* нове повідомлення в загальному чаті — один INSERT ... SELECT по активних
+  користувачах з ON CONFLICT (unread + 1 усім, крім відправника);
+* прочитання — last_read_id зсувається вперед, unread перераховується лише
+  по повідомленнях після нього, під блокуванням рядка.
+
+Лічильник треба оновлювати в тій самій транзакції, що й вставку
+повідомлення: тоді прочитання під блокуванням або ще не бачить повідомлення
+(і інкремент прийде після нього), або бачить разом з інкрементом.
+
+Нові значення після коміту йдуть подією chat_unread у вкладки користувача
+(ws/notifications/). Розмови без рядка вважаються прочитаними.
+"""
+from django.db import connection, transaction
+from django.db.models import Max
+
+from apps.notification.events import send_event, user_group
+from .models import GroupMessage, Message, ReadReceipt
+
+
+GROUP_CONVERSATION = "group"
+
+PRIVATE_MESSAGE_SQL = """
+INSERT INTO {receipt} (user_id, peer_id, last_read_id, unread, updated_at)
+VALUES (%(receiver)s, %(sender)s, 0, 1, now())
+ON CONFLICT (user_id, peer_id) WHERE peer_id IS NOT NULL
+DO UPDATE SET unread = {receipt}.unread + 1, updated_at = now()
+RETURNING unread
+"""
+
+# ORDER BY: паралельні вставки блокують рядки в однаковому порядку, без дедлоків
+GROUP_MESSAGE_SQL = """
+INSERT INTO {receipt} (user_id, peer_id, last_read_id, unread, updated_at)
+SELECT u.id, NULL, 0, 1, now()
+FROM {user} u
+WHERE u.is_active AND u.id <> %(sender)s
+ORDER BY u.id
+ON CONFLICT (user_id) WHERE peer_id IS NULL
+DO UPDATE SET unread = {receipt}.unread + 1, updated_at = now()
+RETURNING user_id, unread
+"""
+
+
+def _publish(user_id, conversation, unread):
+    transaction.on_commit(
+        lambda: send_event(user_group(user_id), "chat_unread", conversation=conversation, unread=unread)
+    )
+
+
+def _sql(template):
+    from apps.users.models import User
+
+    return template.format(receipt=ReadReceipt._meta.db_table, user=User._meta.db_table)
+
+
+def message_created(message):
+    """Особисте повідомлення збережено: +1 непрочитаних отримувачу"""
+    if message.sender_id == message.receiver_id:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(_sql(PRIVATE_MESSAGE_SQL), {
+            "sender": message.sender_id,
+            "receiver": message.receiver_id,
+        })
+        unread = cursor.fetchone()[0]
+    _publish(message.receiver_id, str(message.sender_id), unread)
+
+
+def group_message_created(message):
+    """Повідомлення в загальному чаті: +1 усім активним, крім відправника"""
+    with connection.cursor() as cursor:
+        cursor.execute(_sql(GROUP_MESSAGE_SQL), {"sender": message.sender_id})
+        rows = cursor.fetchall()
+    for user_id, unread in rows:
+        _publish(user_id, GROUP_CONVERSATION, unread)
+
+
+def _incoming(user, peer_id):
+    if peer_id is None:
+        return GroupMessage.objects.exclude(sender=user)
+    return Message.objects.filter(sender_id=peer_id, receiver=user)
+
+
+def mark_read(user, peer_id=None, last_id=None):
+    """
+    Позначає розмову прочитаною до last_id включно (за замовчуванням — до
+    останнього повідомлення). Повертає кількість непрочитаних, що лишились.
+    """
+    incoming = _incoming(user, peer_id)
+    if last_id is None:
+        last_id = incoming.aggregate(last=Max("id"))["last"] or 0
+
+    with transaction.atomic():
+        receipt, _ = ReadReceipt.objects.get_or_create(user=user, peer_id=peer_id)
+        receipt = ReadReceipt.objects.select_for_update().get(pk=receipt.pk)
+        last_read_id = max(receipt.last_read_id, last_id)
+        unread = incoming.filter(id__gt=last_read_id).count()
+
+        if (last_read_id, unread) != (receipt.last_read_id, receipt.unread):
+            receipt.last_read_id, receipt.unread = last_read_id, unread
+            receipt.save(update_fields=["last_read_id", "unread", "updated_at"])
+            # Інші вкладки того ж користувача
+            _publish(user.pk, receipt.conversation, unread)
+    return unread
+
+
+def unread_counts(user):
+    """{розмова: непрочитані} — один запит по рядках користувача"""
+    return {
+        receipt.conversation: receipt.unread
+        for receipt in ReadReceipt.objects.filter(user=user).only("peer_id", "unread")
+    }
@@ -0,0 +1,45 @@
+"""
+Список користувачів для бічної панелі чату.
+
+Список спільний для всіх (кожен лише прибирає себе) і лежить у кеші під
+версійованим ключем: зміна будь-якого користувача збільшує версію, і
+наступний запит збирає список заново. Старі версії просто вичерпують таймаут.
+"""
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+
+
+ROSTER_TIMEOUT = 60 * 60
+ROSTER_VERSION_KEY = "chat:roster:version"
+
+
+def roster_version():
+    version = cache.get(ROSTER_VERSION_KEY)
+    if version is None:
+        version = 1
+        cache.add(ROSTER_VERSION_KEY, version, None)
+    return version
+
+
+def chat_roster():
+    """[{id, first_name, last_name}, ...] усіх користувачів, один запит на версію"""
+    key = f"chat:roster:{roster_version()}"
+    roster = cache.get(key)
+    if roster is None:
+        User = get_user_model()
+        roster = list(
+            User.objects.order_by("id").values("id", "first_name", "last_name")
+        )
+        cache.set(key, roster, ROSTER_TIMEOUT)
+    return roster
+
+
+def user_roster(user):
+    return [entry for entry in chat_roster() if entry["id"] != user.id]
+
+
+def invalidate_roster():
+    try:
+        cache.incr(ROSTER_VERSION_KEY)
+    except ValueError:
+        cache.add(ROSTER_VERSION_KEY, 1, None)
@@ -0,0 +1,27 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import GroupMessage, Message
+from .receipts import group_message_created, message_created
+from .roster import invalidate_roster
+
+
+@receiver([post_save, post_delete], sender=get_user_model())
+def invalidate_roster_on_user_change(sender, **kwargs):
+    transaction.on_commit(invalidate_roster)
+
+
+# Счётчики непрочитанных обновляются в транзакции вставки (см. apps.chat.receipts)
+@receiver(post_save, sender=Message)
+def count_unread_message(sender, instance, created, **kwargs):
+    if created:
+        message_created(instance)
+
+
+@receiver(post_save, sender=GroupMessage)
+def count_unread_group_message(sender, instance, created, **kwargs):
+    if created:
+        group_message_created(instance)
+
@@ -1,3 +1,193 @@
+from unittest.mock import call, patch
+
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from apps.chat.models import GroupMessage, Message, ReadReceipt
+from apps.chat.receipts import mark_read, unread_counts
+from apps.chat.roster import chat_roster
+from apps.notification.events import user_group
+from apps.users.models import User
+
+
+class ChatRosterTests(TestCase):
+    """Tests for the lazily loaded, cached chat roster fragment."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email="hr@example.com", password="pass12345",
+                                             first_name="Olena", last_name="Shevchenko")
+        self.other = User.objects.create_user(email="ops@example.com", password="pass12345",
+                                              first_name="Ivan", last_name="Koval")
+        self.client.force_login(self.user)
+
+    def test_fragment_lists_other_users_from_cache(self):
+        response = self.client.get(reverse("chat:roster"))
+        self.assertContains(response, 'data-user-id="%d"' % self.other.id)
+        self.assertNotContains(response, 'data-user-id="%d"' % self.user.id)
+
+        with self.assertNumQueries(0):
+            chat_roster()
+
+    def test_user_change_invalidates_roster(self):
+        chat_roster()
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.create_user(email="new@example.com", password="pass12345", first_name="Taras")
+
+        self.assertContains(self.client.get(reverse("chat:roster")), "Taras")
+
+    def test_pages_do_not_query_users_for_the_sidebar(self):
+        response = self.client.get(reverse("main:dashboard"))
+        self.assertContains(response, 'hx-get="%s"' % reverse("chat:roster"))
+        self.assertNotContains(response, 'data-user-id="%d"' % self.other.id)
+
+
+class ChatHistoryTests(TestCase):
+    """Tests for cursor-paginated private and group chat history."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email="hr@example.com", password="pass12345",
+                                             first_name="Olena", last_name="Shevchenko")
+        self.other = User.objects.create_user(email="ops@example.com", password="pass12345",
+                                              first_name="Ivan", last_name="Koval")
+        self.third = User.objects.create_user(email="it@example.com", password="pass12345")
+        self.client.force_login(self.user)
+
+    def conversation(self, count):
+        messages = []
+        for n in range(count):
+            sender, receiver = (self.user, self.other) if n % 2 else (self.other, self.user)
+            messages.append(Message.objects.create(sender=sender, receiver=receiver, text=f"m{n}"))
+        # Same timestamp for several messages: the cursor must break ties by id
+        Message.objects.filter(pk__in=[m.pk for m in messages[3:5]]).update(timestamp=messages[2].timestamp)
+        return messages
+
+    def fetch(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_pages_walk_back_through_the_conversation(self):
+        self.conversation(7)
+        Message.objects.create(sender=self.third, receiver=self.user, text="elsewhere")
+        url = reverse("chat:get_messages", args=[self.other.id])
+
+        texts, page = [], self.fetch(url, limit=3)
+        while True:
+            texts = [m["message"] for m in page["messages"]] + texts
+            if not page["has_more"]:
+                break
+            page = self.fetch(url, limit=3, before=page["before"])
+
+        self.assertEqual(texts, [f"m{n}" for n in range(7)])
+
+    def test_after_cursor_returns_newer_messages(self):
+        self.conversation(5)
+        url = reverse("chat:get_messages", args=[self.other.id])
+        oldest = self.fetch(url, limit=2, before=self.fetch(url, limit=3)["before"])
+
+        page = self.fetch(url, limit=10, after=oldest["after"])
+        self.assertEqual([m["message"] for m in page["messages"]], ["m2", "m3", "m4"])
+        self.assertFalse(page["has_more"])
+
+    def test_invalid_cursor_is_rejected(self):
+        url = reverse("chat:get_messages", args=[self.other.id])
+        self.assertEqual(self.client.get(url, {"before": "not-a-cursor"}).status_code, 400)
+
+    def test_group_history_does_not_query_senders_per_message(self):
+        def count_queries():
+            with CaptureQueriesContext(connection) as queries:
+                page = self.fetch(reverse("chat:get_group_messages"), limit=50)
+            return len(queries), page
+
+        GroupMessage.objects.create(sender=self.other, text="first")
+        baseline, _ = count_queries()
+
+        for n in range(10):
+            GroupMessage.objects.create(sender=self.third if n % 2 else self.user, text=f"g{n}")
+        queries, page = count_queries()
+
+        self.assertEqual(queries, baseline)
+        self.assertEqual(len(page["messages"]), 11)
+        self.assertEqual(page["messages"][0]["sender_name"], "Ivan Koval")
+
+
+class ChatReadReceiptTests(TestCase):
+    """Tests for unread counters maintained on insert and on read."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email="hr@example.com", password="pass12345")
+        self.other = User.objects.create_user(email="ops@example.com", password="pass12345")
+        self.third = User.objects.create_user(email="it@example.com", password="pass12345")
+        self.client.force_login(self.user)
+
+    def send(self, sender, receiver, text="hi"):
+        return Message.objects.create(sender=sender, receiver=receiver, text=text)
+
+    def test_private_messages_count_for_the_receiver_only(self):
+        self.send(self.other, self.user)
+        self.send(self.other, self.user)
+        self.send(self.third, self.user)
+        self.send(self.user, self.other)
+
+        self.assertEqual(unread_counts(self.user), {str(self.other.id): 2, str(self.third.id): 1})
+        self.assertEqual(unread_counts(self.other), {str(self.user.id): 1})
+
+    def test_reading_resets_and_partial_reads_keep_the_rest(self):
+        first = self.send(self.other, self.user)
+        self.send(self.other, self.user)
+        self.send(self.other, self.user)
+
+        self.assertEqual(mark_read(self.user, self.other.id, last_id=first.id), 2)
+        # last_read_id never moves back
+        self.assertEqual(mark_read(self.user, self.other.id, last_id=first.id - 1), 2)
+
+        response = self.client.post(reverse("chat:mark_read", args=[self.other.id]))
+        self.assertEqual(response.json(), {"conversation": str(self.other.id), "unread": 0})
+
+        self.send(self.other, self.user)
+        self.assertEqual(self.client.get(reverse("chat:get_unread_counts")).json(), {str(self.other.id): 1})
+
+    def test_group_messages_count_for_everyone_but_the_sender(self):
+        inactive = User.objects.create_user(email="old@example.com", password="pass12345", is_active=False)
+        GroupMessage.objects.create(sender=self.other, text="hello")
+        GroupMessage.objects.create(sender=self.third, text="hello")
+
+        self.assertEqual(unread_counts(self.user), {"group": 2})
+        self.assertEqual(unread_counts(self.other), {"group": 1})
+        self.assertEqual(unread_counts(inactive), {})
+
+        response = self.client.post(reverse("chat:mark_group_read"))
+        self.assertEqual(response.json(), {"conversation": "group", "unread": 0})
+        self.assertEqual(ReadReceipt.objects.get(user=self.user, peer=None).last_read_id,
+                         GroupMessage.objects.latest("id").id)
+
+    @patch("apps.chat.receipts.send_event")
+    def test_counts_are_pushed_after_commit(self, send_event):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.send(self.other, self.user)
+        send_event.assert_called_once_with(
+            user_group(self.user.id), "chat_unread", conversation=str(self.other.id), unread=1
+        )
+
+        send_event.reset_mock()
+        with self.captureOnCommitCallbacks(execute=True):
+            GroupMessage.objects.create(sender=self.user, text="hello")
+        self.assertCountEqual(send_event.call_args_list, [
+            call(user_group(self.other.id), "chat_unread", conversation="group", unread=1),
+            call(user_group(self.third.id), "chat_unread", conversation="group", unread=1),
+        ])
+
+    def test_unread_endpoint_does_not_scan_messages(self):
+        for _ in range(5):
+            self.send(self.other, self.user)
+        GroupMessage.objects.create(sender=self.third, text="hello")
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse("chat:get_unread_counts"))
+        self.assertFalse(any("chat_message" in q["sql"] or "chat_groupmessage" in q["sql"]
+                             for q in queries.captured_queries))
 
-# Create your tests here.
@@ -7,4 +7,7 @@ urlpatterns = [
     path('messages/<int:user_id>/', views.get_messages, name='get_messages'),
     path('group-messages/', views.get_group_messages, name='get_group_messages'),
     path('unread-counts/', views.get_unread_counts, name='get_unread_counts'),
+    path('read/<int:user_id>/', views.mark_conversation_read, name='mark_read'),
+    path('read/group/', views.mark_conversation_read, name='mark_group_read'),
+    path('roster/', views.roster, name='roster'),
 ]
@@ -1,9 +1,13 @@
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render
+from django.views.decorators.http import require_POST
 from .models import Message, GroupMessage
-from django.db.models import Q, Count, Max
+from django.db.models import Q
 from django.http import JsonResponse
+from .roster import user_roster
+from .history import InvalidCursor, page_limit, paginate
+from .receipts import GROUP_CONVERSATION, mark_read, unread_counts
 
 User = get_user_model()
 
@@ -12,87 +16,87 @@ def chat_view(request):
     users = User.objects.exclude(id=request.user.id)
     return render(request, "chat/chat.html", {"users": users})
 
+def serialize_message(m, with_sender=False):
+    data = {
+        "id": m.id,
+        "sender": m.sender_id,
+        "message": m.text,
+        "timestamp": m.timestamp.isoformat(),
+        "file": bool(m.file),
+        "file_name": m.file_name if m.file else None,
+        "file_url": m.file.url if m.file else None,
+        "file_size": m.get_file_size_display() if m.file else None,
+    }
+    if with_sender:
+        data["sender_name"] = f"{m.sender.first_name} {m.sender.last_name}"
+    return data
+
+
+def history_response(request, queryset, with_sender=False):
+    """Страница истории по курсору из ?before= / ?after= (apps.chat.history)"""
+    try:
+        page = paginate(
+            queryset,
+            before=request.GET.get("before"),
+            after=request.GET.get("after"),
+            limit=page_limit(request.GET.get("limit")),
+        )
+    except InvalidCursor:
+        return JsonResponse({"error": "invalid cursor"}, status=400)
+
+    page["messages"] = [serialize_message(m, with_sender) for m in page["messages"]]
+    return JsonResponse(page)
+
+
 @login_required
 def get_messages(request, user_id):
+    # Каждая ветка OR идёт по индексу (sender, receiver, timestamp)
     messages = Message.objects.filter(
         (Q(sender=request.user, receiver_id=user_id) |
          Q(sender_id=user_id, receiver=request.user))
-    ).order_by("timestamp")
-
-    data = {
-        "messages": [
-            {
-                "sender": m.sender_id,
-                "message": m.text,
-                "timestamp": m.timestamp.isoformat(),
-                "file": bool(m.file),
-                "file_name": m.file_name if m.file else None,
-                "file_url": m.file.url if m.file else None,
-                "file_size": m.get_file_size_display() if m.file else None,
-            } for m in messages
-        ]
-    }
-    return JsonResponse(data)
+    )
+    return history_response(request, messages)
 
 
 @login_required
 def get_group_messages(request):
-    messages = GroupMessage.objects.all().order_by("timestamp")
-    
-    data = {
-        "messages": [
-            {
-                "sender": m.sender_id,
-                "sender_name": f"{m.sender.first_name} {m.sender.last_name}",
-                "message": m.text,
-                "timestamp": m.timestamp.isoformat(),
-                "file": bool(m.file),
-                "file_name": m.file_name if m.file else None,
-                "file_url": m.file.url if m.file else None,
-                "file_size": m.get_file_size_display() if m.file else None,
-            } for m in messages
-        ]
-    }
-    
-    return JsonResponse(data)
+    # Имя отправителя берём одним JOIN, а не запросом на каждое сообщение
+    messages = GroupMessage.objects.select_related("sender").only(
+        "id", "text", "timestamp", "file", "file_name", "file_size",
+        "sender__id", "sender__first_name", "sender__last_name",
+    )
+    return history_response(request, messages, with_sender=True)
 
 
 @login_required
 def get_unread_counts(request):
     """
-    Получить информацию о последних сообщениях для синхронизации счетчика.
-    Возвращает последнее сообщение от каждого пользователя с timestamp.
-    Клиент сам определит, какие сообщения он уже видел.
+    Точные счётчики непрочитанных по разговорам: {user_id: n, "group": n}.
+    Берутся из ReadReceipt (apps.chat.receipts), без агрегатов по сообщениям.
     """
-    from django.db.models import Max
-    
-    # Получаем последнее сообщение от каждого отправителя
-    last_messages = Message.objects.filter(
-        receiver=request.user
-    ).values('sender_id').annotate(
-        last_timestamp=Max('timestamp'),
-        count=Count('id')
-    )
-    
-    # Формируем данные для клиента
-    result = {}
-    for item in last_messages:
-        result[str(item['sender_id'])] = {
-            'last_timestamp': item['last_timestamp'].isoformat(),
-            'total_count': item['count']
-        }
-    
-    # Для группового чата получаем последнее сообщение
-    last_group_msg = GroupMessage.objects.order_by('-timestamp').first()
-    if last_group_msg:
-        result['group'] = {
-            'last_timestamp': last_group_msg.timestamp.isoformat(),
-            'total_count': GroupMessage.objects.count()
-        }
-    else:
-        result['group'] = {
-            'last_timestamp': None,
-            'total_count': 0
-        }
-    
-    return JsonResponse(result)
\ No newline at end of file
+    return JsonResponse(unread_counts(request.user))
+
+
+@login_required
+@require_POST
+def mark_conversation_read(request, user_id=None):
+    """
+    Отмечает разговор прочитанным до last_id (по умолчанию — до последнего
+    сообщения). user_id=None — общий чат.
+    """
+    try:
+        last_id = int(request.POST["last_id"]) if request.POST.get("last_id") else None
+    except ValueError:
+        return JsonResponse({"error": "invalid last_id"}, status=400)
+
+    conversation = GROUP_CONVERSATION if user_id is None else str(user_id)
+    return JsonResponse({
+        "conversation": conversation,
+        "unread": mark_read(request.user, user_id, last_id),
+    })
+
+
+@login_required
+def roster(request):
+    """Фрагмент со списком личных чатов (грузится HTMX после загрузки страницы)"""
+    return render(request, "chat/roster.html", {"chat_users": user_roster(request.user)})
@@ -6,4 +6,4 @@ class MainConfig(AppConfig):
     name = "apps.main"
 
     def ready(self):
-        from . import signals
+        from . import signals, queues, instrumentation
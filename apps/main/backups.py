@@ -0,0 +1,229 @@
+"""
+Резервні копії PostgreSQL.
+
+Конвеєр create_backup():
+
+1. pg_dump -F d -j N — каталоговий формат, таблиці дампляться паралельно
+   і стискаються самим pg_dump на льоту (settings.BACKUP_COMPRESSION);
+   каталоговий формат також дозволяє паралельне відновлення pg_restore -j;
+2. SHA256SUMS — контрольні суми всіх файлів, читаються потоком блоками
+   (перевірка з шелу: cd <каталог> && sha256sum -c SHA256SUMS);
+3. pg_restore --list — TOC читається повністю, отже архів придатний до
+   відновлення;
+4. лише перевірений дамп перейменовується з .partial у фінальну назву.
+
+Кожна копія — рядок DatabaseBackup з тривалістю, розміром і статусом.
+prune_backups() прибирає старі копії з урахуванням кількості, віку і
+сумарного розміру, але завжди лишає BACKUP_KEEP_MIN останніх перевірених.
+"""
+import glob
+import hashlib
+import logging
+import os
+import shutil
+import subprocess
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Sum
+from django.utils import timezone
+
+from apps.main.models import DatabaseBackup
+
+logger = logging.getLogger(__name__)
+
+
+CHECKSUM_FILE = "SHA256SUMS"
+CHECKSUM_CHUNK_SIZE = 1024 * 1024
+PARTIAL_SUFFIX = ".partial"
+
+
+class BackupError(Exception):
+    pass
+
+
+def _run(cmd, env):
+    try:
+        return subprocess.run(cmd, env=env, check=True, capture_output=True, text=True).stdout
+    except subprocess.CalledProcessError as e:
+        raise BackupError(f"{cmd[0]} exited with {e.returncode}: {e.stderr.strip()}") from e
+
+
+def _pg_env(db):
+    env = os.environ.copy()
+    if db.get("PASSWORD"):
+        env["PGPASSWORD"] = str(db["PASSWORD"])
+    return env
+
+
+def _connection_args(db):
+    args = ["-d", db["NAME"]]
+    if db.get("HOST"):
+        args += ["-h", str(db["HOST"])]
+    if db.get("PORT"):
+        args += ["-p", str(db["PORT"])]
+    if db.get("USER"):
+        args += ["-U", str(db["USER"])]
+    return args
+
+
+def file_checksum(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHECKSUM_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_checksums(directory):
+    """Пише SHA256SUMS для всіх файлів каталогу. Повертає (розмір у байтах, кількість файлів)"""
+    size, lines = 0, []
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if name == CHECKSUM_FILE or not os.path.isfile(path):
+            continue
+        size += os.path.getsize(path)
+        lines.append(f"{file_checksum(path)}  {name}\n")
+
+    with open(os.path.join(directory, CHECKSUM_FILE), "w") as f:
+        f.writelines(lines)
+    return size, len(lines)
+
+
+def verify_checksums(directory):
+    """Список файлів, чия контрольна сума не збігається або які зникли"""
+    mismatched = []
+    with open(os.path.join(directory, CHECKSUM_FILE)) as f:
+        for line in f:
+            expected, name = line.rstrip("\n").split("  ", 1)
+            path = os.path.join(directory, name)
+            if not os.path.isfile(path) or file_checksum(path) != expected:
+                mismatched.append(name)
+    return mismatched
+
+
+def restore_list(directory, env=None):
+    """Кількість записів TOC за pg_restore --list; помилка — архів не читається"""
+    output = _run(["pg_restore", "--list", directory], env or os.environ.copy())
+    return sum(1 for line in output.splitlines() if line.strip() and not line.startswith(";"))
+
+
+def create_backup(jobs=None, compression=None, db=None):
+    """Знімає, перевіряє і реєструє копію. При помилці — статус failed і BackupError"""
+    db = db or connection.settings_dict
+    jobs = jobs or settings.BACKUP_JOBS
+    compression = compression or settings.BACKUP_COMPRESSION
+
+    os.makedirs(settings.BACKUP_DIR, exist_ok=True)
+    started_at = timezone.now()
+    name = f"db_backup_{started_at:%Y-%m-%d_%H-%M-%S}"
+    path = os.path.join(settings.BACKUP_DIR, name)
+    partial = path + PARTIAL_SUFFIX
+
+    backup = DatabaseBackup.objects.create(name=name, path=path, jobs=jobs, started_at=started_at)
+    env = _pg_env(db)
+    try:
+        started = time.monotonic()
+        _run(["pg_dump", *_connection_args(db), "-F", "d", "-j", str(jobs),
+              "-Z", str(compression), "-f", partial], env)
+        backup.dump_duration = time.monotonic() - started
+        backup.size, backup.files = write_checksums(partial)
+
+        started = time.monotonic()
+        backup.toc_entries = restore_list(partial, env)
+        if not backup.toc_entries:
+            raise BackupError("pg_restore --list returned an empty table of contents")
+        if mismatched := verify_checksums(partial):
+            raise BackupError(f"Checksum mismatch: {', '.join(mismatched)}")
+        backup.verify_duration = time.monotonic() - started
+
+        os.rename(partial, path)
+    except Exception as e:
+        shutil.rmtree(partial, ignore_errors=True)
+        backup.status = DatabaseBackup.FAILED
+        backup.error = str(e)
+        backup.finished_at = timezone.now()
+        backup.save()
+        logger.error(f"Backup {name} failed: {e}")
+        if isinstance(e, BackupError):
+            raise
+        raise BackupError(str(e)) from e
+
+    backup.status = DatabaseBackup.VERIFIED
+    backup.finished_at = timezone.now()
+    backup.save()
+    logger.info(
+        f"Backup {name}: {backup.size} bytes in {backup.files} files, "
+        f"dump {backup.dump_duration:.1f}s, verify {backup.verify_duration:.1f}s"
+    )
+    return backup
+
+
+def verify_backup(backup):
+    """Повторна перевірка збереженої копії (контрольні суми і TOC). True, якщо ціла"""
+    if not os.path.isdir(backup.path):
+        return False
+    try:
+        return not verify_checksums(backup.path) and restore_list(backup.path) > 0
+    except (OSError, ValueError, BackupError) as e:
+        logger.warning(f"Backup {backup.name} failed verification: {e}")
+        return False
+
+
+def _delete(backup):
+    shutil.rmtree(backup.path, ignore_errors=True)
+    shutil.rmtree(backup.path + PARTIAL_SUFFIX, ignore_errors=True)
+    backup.delete()
+
+
+def prune_backups(keep_min=None, keep_max=None, max_age_days=None, max_bytes=None):
+    """
+    Видаляє копії, що виходять за будь-яку межу: кількість (keep_max), вік
+    (max_age_days) або сумарний розмір (max_bytes, від найновіших). keep_min
+    найновіших перевірених лишаються завжди. Невдалі і завислі (running)
+    записи видаляються за віком. Повертає кількість видалених.
+    """
+    keep_min = settings.BACKUP_KEEP_MIN if keep_min is None else keep_min
+    keep_max = settings.BACKUP_KEEP_MAX if keep_max is None else keep_max
+    max_age_days = settings.BACKUP_MAX_AGE_DAYS if max_age_days is None else max_age_days
+    max_bytes = settings.BACKUP_MAX_BYTES if max_bytes is None else max_bytes
+
+    cutoff = timezone.now() - timedelta(days=max_age_days)
+    deleted = 0
+    for backup in DatabaseBackup.objects.exclude(status=DatabaseBackup.VERIFIED).filter(started_at__lt=cutoff):
+        _delete(backup)
+        deleted += 1
+
+    total = 0
+    for index, backup in enumerate(DatabaseBackup.objects.filter(status=DatabaseBackup.VERIFIED)
+                                   .order_by('-started_at')):
+        total += backup.size
+        if index < keep_min:
+            continue
+        if index >= keep_max or backup.started_at < cutoff or total > max_bytes:
+            _delete(backup)
+            total -= backup.size
+            deleted += 1
+
+    # Одиночні файли старого формату (pg_dump -F c) — лише за віком
+    for path in glob.glob(os.path.join(settings.BACKUP_DIR, "db_backup_*.dump")):
+        if os.stat(path).st_mtime < cutoff.timestamp():
+            os.remove(path)
+            deleted += 1
+
+    if deleted:
+        logger.info(f"Backups: pruned {deleted}, {total} bytes kept")
+    return deleted
+
+
+def backup_stats():
+    """Остання перевірена копія і підсумки по збережених — для метрик"""
+    verified = DatabaseBackup.objects.filter(status=DatabaseBackup.VERIFIED)
+    return {
+        "latest": verified.first(),
+        "count": verified.count(),
+        "total_size": verified.aggregate(total=Sum('size'))['total'] or 0,
+        "failures": DatabaseBackup.objects.filter(status=DatabaseBackup.FAILED).count(),
+    }
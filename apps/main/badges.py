@@ -0,0 +1,80 @@
+"""
+Лічильники для бейджів у шапці та сайдбарі (сповіщення, завдання).
+
+Значення тримаються в кеші Django і скидаються сигналами при зміні
+Notification чи Task, тож сторінка читає лише кеш, а COUNT виконується
+один раз після кожної зміни. Завдання мають спільну версію: перепризначення
+змінює лічильники двох користувачів одразу, і простіше інвалідувати всі.
+Таймаут — страховка для змін, що обходять сигнали (update(), raw SQL).
+"""
+from django.core.cache import cache
+
+from apps.main.models import Task
+from apps.notification.models import Notification
+
+
+BADGE_TIMEOUT = 300
+
+NOTIFICATIONS_KEY = "badges:notifications"
+TASKS_VERSION_KEY = "badges:tasks:version"
+
+
+def _tasks_version():
+    version = cache.get(TASKS_VERSION_KEY)
+    if version is None:
+        version = 1
+        cache.add(TASKS_VERSION_KEY, version, None)
+    return version
+
+
+def notification_count():
+    """Кількість сповіщень про документи, що закінчуються (одна на всіх)"""
+    count = cache.get(NOTIFICATIONS_KEY)
+    if count is None:
+        count = Notification.objects.count()
+        cache.set(NOTIFICATIONS_KEY, count, BADGE_TIMEOUT)
+    return count
+
+
+def _cached_task_count(scope, queryset):
+    key = f"badges:tasks:{_tasks_version()}:{scope}"
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, BADGE_TIMEOUT)
+    return count
+
+
+def completed_task_count():
+    return _cached_task_count("completed", Task.objects.filter(status="completed"))
+
+
+def task_count(user):
+    """
+    Суперкористувач бачить кількість виконаних завдань (їх треба перевірити),
+    решта — кількість призначених їм.
+    """
+    if not user.is_authenticated:
+        return 0
+    if user.is_superuser:
+        return completed_task_count()
+    return _cached_task_count(f"user:{user.pk}", Task.objects.filter(assigned_to=user))
+
+
+def user_badges(user):
+    return {
+        "notifications": notification_count(),
+        "tasks": task_count(user),
+    }
+
+
+def invalidate_notification_badge():
+    cache.delete(NOTIFICATIONS_KEY)
+
+
+def invalidate_task_badges():
+    try:
+        cache.incr(TASKS_VERSION_KEY)
+    except ValueError:
+        # Версії ще немає (або кеш очищено) — старих ключів теж немає
+        cache.add(TASKS_VERSION_KEY, 1, None)
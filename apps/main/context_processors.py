@@ -1,19 +1,18 @@
-from apps.main.models import Task
-from apps.notification.models import Notification
+from functools import partial
+
+from apps.main.badges import notification_count, task_count
 
-def available_tasks(request):
-    if request.user.is_authenticated and request.user.is_superuser:
-        tasks = Task.objects.filter(status="completed")
-        return {"available_tasks": tasks}
 
+# Лічильники віддаються функціями: шаблон викликає їх лише там, де бейдж
+# справді рендериться (base.html), а HTMX-фрагменти кеш навіть не читають
+
+def available_tasks(request):
     if request.user.is_authenticated:
-        tasks = Task.objects.filter(assigned_to=request.user)
-        return {"available_tasks": tasks}
-    return {"available_tasks": Task.objects.none()}
+        return {"available_tasks_count": partial(task_count, request.user)}
+    return {"available_tasks_count": 0}
 
 
 def expired_docs(request):
     if request.user.is_authenticated:
-        notifications = Notification.objects.all()
-        return {"expired_docs": notifications}
-    return {"expired_docs": Task.objects.none()}
\ No newline at end of file
+        return {"expired_docs_count": notification_count}
+    return {"expired_docs_count": 0}
@@ -0,0 +1,68 @@
+"""
+Блокування редагування співробітника (кеш, EDIT_LOCK_TIMEOUT секунд).
+
+Значення в кеші — {"user": id, "expires_at": unix time}. Кожна зміна
+публікується подією lock з expires_in, а поточні блокування видимих рядків
+віддаються разом зі сторінкою таблиці і на запит вкладки через
+ws/notifications/. Блокування, що спливло в кеші без unlock (закрита вкладка,
+таймаут), вкладки знімають самі за expires_in.
+"""
+import time
+
+from django.core.cache import cache
+
+from apps.notification.events import publish_lock_changed
+
+
+EDIT_LOCK_TIMEOUT = 300
+
+
+def lock_key(employee_id):
+    return f"employee_edit_lock:{employee_id}"
+
+
+def _holder(value):
+    # До появи expires_at значенням був просто id користувача
+    return value.get("user") if isinstance(value, dict) else value
+
+
+def lock_holder(employee_id):
+    """id користувача, що редагує співробітника, або None"""
+    return _holder(cache.get(lock_key(employee_id)))
+
+
+def _value(user_id):
+    return {"user": user_id, "expires_at": time.time() + EDIT_LOCK_TIMEOUT}
+
+
+def set_lock(employee_id, user_id):
+    """Встановлює або продовжує блокування і повідомляє вкладки"""
+    cache.set(lock_key(employee_id), _value(user_id), timeout=EDIT_LOCK_TIMEOUT)
+    publish_lock_changed(employee_id, user_id, EDIT_LOCK_TIMEOUT)
+
+
+def add_lock(employee_id, user_id):
+    """Атомарно встановлює блокування, лише якщо його немає. True, якщо встановлено"""
+    added = cache.add(lock_key(employee_id), _value(user_id), timeout=EDIT_LOCK_TIMEOUT)
+    if added:
+        publish_lock_changed(employee_id, user_id, EDIT_LOCK_TIMEOUT)
+    return added
+
+
+def release_lock(employee_id):
+    cache.delete(lock_key(employee_id))
+    publish_lock_changed(employee_id)
+
+
+def active_locks(employee_ids):
+    """{id співробітника: {"locked_by", "expires_in"}} для заблокованих — один запит до кешу"""
+    keys = {lock_key(employee_id): employee_id for employee_id in employee_ids}
+    now = time.time()
+    locks = {}
+    for key, value in cache.get_many(keys).items():
+        expires_at = value.get("expires_at") if isinstance(value, dict) else None
+        locks[keys[key]] = {
+            "locked_by": _holder(value),
+            "expires_in": max(int(expires_at - now), 0) if expires_at else EDIT_LOCK_TIMEOUT,
+        }
+    return locks
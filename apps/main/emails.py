@@ -0,0 +1,69 @@
+"""Листи, які надсилаються з черги email (apps.main.tasks.send_invitation_email_task)"""
+import logging
+import os
+from email.mime.image import MIMEImage
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives
+from django.template.loader import render_to_string
+from django.utils.translation import gettext as _
+
+logger = logging.getLogger(__name__)
+
+
+def send_invitation_email(invite, registration_url):
+    """Лист із посиланням на реєстрацію; помилка SMTP пробрасується (задача повторить)"""
+    context = {
+        'email': invite.email,
+        'registration_url': registration_url,
+        'expires_at': invite.expires_at,
+        'days_valid': 7,
+    }
+
+    subject = _("Посилання на реєстрацію Akorasp")
+    from_email = settings.DEFAULT_FROM_EMAIL
+    to = [invite.email]
+
+    text_content = _(
+        "Вітаємо!\n\n"
+        "Вас запросили зареєструватися на Akorasp.\n\n"
+        "Посилання для реєстрації: {url}\n\n"
+        "Це запрошення дійсне протягом {days} днів.\n\n"
+        "З найкращими побажаннями,\n"
+        "Команда Akorasp"
+    ).format(url=registration_url, days=7)
+
+    html_content = render_to_string("email/invitation_email.html", context)
+
+    msg = EmailMultiAlternatives(
+        subject,
+        text_content,
+        from_email,
+        to,
+        headers={
+            'X-Priority': '3',
+            'X-MSMail-Priority': 'Normal',
+            'Importance': 'Normal',
+            'List-Unsubscribe': f'<mailto:{from_email}?subject=unsubscribe>',
+            'Precedence': 'bulk',
+        }
+    )
+    msg.attach_alternative(html_content, "text/html")
+
+    attach_logo_to_email(msg)
+
+    msg.send()
+
+
+def attach_logo_to_email(msg):
+    logo_path = os.path.join(settings.BASE_DIR, "static/images/logo.png")
+
+    if os.path.exists(logo_path):
+        try:
+            with open(logo_path, "rb") as f:
+                logo = MIMEImage(f.read())
+                logo.add_header("Content-ID", "<logo>")
+                logo.add_header("Content-Disposition", "inline", filename="logo.png")
+                msg.attach(logo)
+        except Exception as e:
+            logger.warning(f"Failed to attach logo to email: {str(e)}")
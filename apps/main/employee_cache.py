@@ -0,0 +1,33 @@
+"""
+Кеш списку співробітників (відфільтровані id і кількість для таблиці).
+
+Кеш спільний для всіх процесів (Redis), тому при зміні співробітників не
+можна скидати його цілком — там же блокування редагування, лічильники
+бейджів, список чату і статистика черг. Ключі списку версійовані: зміна
+збільшує версію, і наступний запит рахує заново. Старі версії просто
+вичерпують таймаут.
+"""
+from django.core.cache import cache
+
+
+EMPLOYEE_LIST_VERSION_KEY = "employees:list:version"
+
+
+def employee_list_version():
+    version = cache.get(EMPLOYEE_LIST_VERSION_KEY)
+    if version is None:
+        version = 1
+        cache.add(EMPLOYEE_LIST_VERSION_KEY, version, None)
+    return version
+
+
+def employee_list_key(kind, params):
+    """kind — "filtered" або "count", params — urlencode параметрів фільтра"""
+    return f"employees:list:{employee_list_version()}:{kind}:{params}"
+
+
+def invalidate_employee_list():
+    try:
+        cache.incr(EMPLOYEE_LIST_VERSION_KEY)
+    except ValueError:
+        cache.add(EMPLOYEE_LIST_VERSION_KEY, 1, None)
@@ -0,0 +1,113 @@
+"""
+Підтримка таблиці ExpiryEntry (єдиний календар дат закінчення).
+
+Звичайні save()/delete() оновлюють рядок через сигнали (один upsert або delete),
+а масові шляхи (імпорт, update() статусів) викликають rebuild_expiry_entries /
+set_employees_dismissed для зачеплених співробітників.
+"""
+from django.db import transaction
+
+from apps.main.models import (
+    Employee, Document, WorkPermit, Sanepid, EmploymentPeriod, ExpiryEntry,
+)
+
+
+DISMISSED_STATUS = "Zwolniony"
+
+# Модель -> (source, поле дати, поле підпису)
+EXPIRY_SOURCES = {
+    Document: ('document', 'valid_until', 'doc_type'),
+    WorkPermit: ('work_permit', 'end_date', 'doc_type'),
+    Sanepid: ('sanepid', 'end_date', 'doc_type'),
+    EmploymentPeriod: ('employment_period', 'end_date', None),
+    Employee: ('student', 'student_end_date', None),
+}
+
+
+def upsert_expiry_entries(entries, batch_size=1000):
+    if entries:
+        ExpiryEntry.objects.bulk_create(
+            entries,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=['source', 'source_id'],
+            update_fields=['employee', 'expires_on', 'label', 'employee_dismissed'],
+        )
+
+
+def sync_expiry_entry(instance):
+    """Оновлює (або видаляє, якщо дати немає) рядок календаря для одного об'єкта"""
+    source, date_field, label_field = EXPIRY_SOURCES[type(instance)]
+    expires_on = getattr(instance, date_field)
+
+    if not expires_on:
+        ExpiryEntry.objects.filter(source=source, source_id=instance.pk).delete()
+        return
+
+    employee = instance if isinstance(instance, Employee) else instance.employee
+    upsert_expiry_entries([
+        ExpiryEntry(
+            employee_id=employee.pk,
+            source=source,
+            source_id=instance.pk,
+            expires_on=expires_on,
+            label=(getattr(instance, label_field) or '')[:128] if label_field else '',
+            employee_dismissed=employee.working_status == DISMISSED_STATUS,
+        )
+    ])
+
+
+def delete_expiry_entry(instance):
+    source = EXPIRY_SOURCES[type(instance)][0]
+    ExpiryEntry.objects.filter(source=source, source_id=instance.pk).delete()
+
+
+def set_employees_dismissed(employee_ids, dismissed=True):
+    """Для масової зміни статусу через update(), яка не викликає сигналів"""
+    return ExpiryEntry.objects.filter(employee_id__in=employee_ids).exclude(
+        employee_dismissed=dismissed
+    ).update(employee_dismissed=dismissed)
+
+
+def rebuild_expiry_entries(employees=None, batch_size=1000):
+    """
+    Перебудовує календар для співробітників (queryset або список id; None — для всіх)
+    одним проходом по кожній моделі-джерелу. Повертає кількість рядків.
+    """
+    entries = []
+
+    for model, (source, date_field, label_field) in EXPIRY_SOURCES.items():
+        employee_field = 'pk' if model is Employee else 'employee_id'
+        status_field = 'working_status' if model is Employee else 'employee__working_status'
+
+        qs = model.objects.filter(**{f"{date_field}__isnull": False})
+        if employees is not None:
+            qs = qs.filter(**{f"{employee_field}__in": employees})
+
+        fields = ['pk', employee_field, date_field, status_field] + ([label_field] if label_field else [])
+        for row in qs.values_list(*fields).iterator(chunk_size=batch_size):
+            entries.append(ExpiryEntry(
+                source=source,
+                source_id=row[0],
+                employee_id=row[1],
+                expires_on=row[2],
+                employee_dismissed=row[3] == DISMISSED_STATUS,
+                label=(row[4] or '')[:128] if label_field else '',
+            ))
+
+    with transaction.atomic():
+        stale = ExpiryEntry.objects.all()
+        if employees is not None:
+            stale = stale.filter(employee_id__in=employees)
+        stale.delete()
+        ExpiryEntry.objects.bulk_create(entries, batch_size=batch_size)
+
+    return len(entries)
+
+
+def expiring_between(start, end, sources=None):
+    """Дати закінчення активних співробітників у [start, end] — range scan по expiry_active_idx"""
+    qs = ExpiryEntry.objects.filter(employee_dismissed=False, expires_on__gte=start, expires_on__lte=end)
+    if sources:
+        qs = qs.filter(source__in=sources)
+    return qs
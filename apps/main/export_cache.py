@@ -0,0 +1,146 @@
+"""
+Кеш готових файлів експорту.
+
+Ключ — нормалізовані параметри фільтра, мова, формат і версія набору даних
+(DataVersion), а для фільтрів відносно сьогоднішньої дати — ще й дата.
+Будь-яка зміна співробітників або їх документів збільшує
+версію, тому застарілий файл ніколи не віддається — він просто перестає
+використовуватись і з часом витісняється. Витіснення — LRU за сумарним
+розміром файлів на диску (EXPORT_CACHE_MAX_BYTES).
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+from datetime import date
+
+from django.conf import settings
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from apps.main.exports import export_language
+from apps.main.filters import EmployeeMultiFilter
+from apps.main.models import DataVersion, ExportArtifact
+
+
+logger = logging.getLogger(__name__)
+
+EXPORT_CACHE_DIR = 'export_cache'
+
+# Фільтри, порядок значень яких не впливає на результат
+UNORDERED_FILTERS = ('status',)
+
+# Фільтри відносно сьогоднішньої дати: результат змінюється щодня і без правок даних
+DATE_RELATIVE_FILTERS = ('permit_expires_within',)
+
+
+def normalize_filter_params(filter_params):
+    """Лише параметри фільтра, без порожніх значень, у стабільному порядку"""
+    normalized = {}
+    for name in EmployeeMultiFilter.base_filters:
+        if hasattr(filter_params, 'getlist'):
+            values = filter_params.getlist(name)
+        else:
+            values = filter_params.get(name) or []
+            if not isinstance(values, (list, tuple)):
+                values = [values]
+
+        values = [str(value).strip() for value in values if str(value).strip()]
+        if not values:
+            continue
+        if name in UNORDERED_FILTERS:
+            values = sorted(set(values))
+        normalized[name] = values
+    return normalized
+
+
+def is_date_relative(filter_params):
+    normalized = normalize_filter_params(filter_params)
+    return any(name in normalized for name in DATE_RELATIVE_FILTERS)
+
+
+def export_cache_key(filter_params, fmt, version=None):
+    filters = normalize_filter_params(filter_params)
+    payload = {
+        'filters': filters,
+        'language': export_language(filter_params),
+        'format': fmt,
+        'version': DataVersion.current() if version is None else version,
+    }
+    if any(name in filters for name in DATE_RELATIVE_FILTERS):
+        payload['date'] = date.today().isoformat()
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+def _full_path(path):
+    return os.path.join(settings.PRIVATE_MEDIA_ROOT, path)
+
+
+def get_cached_export(key):
+    """ExportArtifact для ключа (з оновленням часу використання) або None"""
+    artifact = ExportArtifact.objects.filter(key=key).first()
+    if artifact is None:
+        return None
+
+    if not os.path.exists(_full_path(artifact.path)):
+        artifact.delete()
+        return None
+
+    ExportArtifact.objects.filter(pk=artifact.pk).update(hits=F('hits') + 1, last_used_at=timezone.now())
+    return artifact
+
+
+def store_export(key, source_path, filename):
+    """
+    Кладе готовий файл у кеш (жорстке посилання, якщо ФС дозволяє, інакше копія)
+    і витісняє найдавніше використані файли понад ліміт.
+    """
+    path = os.path.join(EXPORT_CACHE_DIR, key + os.path.splitext(filename)[1])
+    target = _full_path(path)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+
+    tmp_path = f"{target}.{os.getpid()}.part"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    try:
+        os.link(source_path, tmp_path)
+    except OSError:
+        shutil.copyfile(source_path, tmp_path)
+    os.replace(tmp_path, target)
+
+    artifact, _ = ExportArtifact.objects.update_or_create(
+        key=key,
+        defaults={
+            'path': path,
+            'filename': filename,
+            'size': os.path.getsize(target),
+            'last_used_at': timezone.now(),
+        },
+    )
+    evict_exports()
+    return artifact
+
+
+def evict_exports(max_bytes=None):
+    """Видаляє найдавніше використані файли, доки кеш не влізе в max_bytes. Повертає кількість"""
+    if max_bytes is None:
+        max_bytes = settings.EXPORT_CACHE_MAX_BYTES
+
+    total = ExportArtifact.objects.aggregate(total=Sum('size'))['total'] or 0
+    evicted = 0
+
+    for artifact in ExportArtifact.objects.order_by('last_used_at').iterator():
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(_full_path(artifact.path))
+        except FileNotFoundError:
+            pass
+        artifact.delete()
+        total -= artifact.size
+        evicted += 1
+
+    if evicted:
+        logger.info(f"Export cache: evicted {evicted} files, {total} bytes left")
+    return evicted
@@ -0,0 +1,156 @@
+"""
+Табличний експорт (CSV / XLSX) відфільтрованого списку співробітників.
+
+Співробітники читаються серверним курсором (iterator(chunk_size=...)):
+у пам'яті веб-воркера одночасно лише одна пачка разом з її prefetch.
+CSV віддається рядок за рядком одразу під час читання, XLSX пишеться
+openpyxl у write-only режимі (рядки скидаються на диск, а не тримаються
+в пам'яті) і віддається файлом після збирання архіву.
+"""
+import csv
+import tempfile
+
+from apps.main.pdf import employees_pdf_queryset, PDF_PREFETCH, TRANSLATIONS
+
+
+# Рядків в одному fetch серверного курсора (і в одному prefetch)
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx'),
+}
+
+EXPORT_HEADERS = {
+    'uk': ['ID', 'Прізвище', "Ім'я", 'Вік', 'Місце роботи', 'Статус', 'PESEL', 'PESEL UKR',
+           'Студент', 'PIT-2', 'Період роботи', 'Документи', 'Дозвіл на роботу',
+           'Контракт', 'Контакти', 'Додаткова інформація'],
+    'pl': ['ID', 'Nazwisko', 'Imię', 'Wiek', 'Miejsce pracy', 'Status', 'PESEL', 'PESEL UKR',
+           'Student', 'PIT-2', 'Okres pracy', 'Dokumenty', 'Zezwolenie na pracę',
+           'Umowa', 'Kontakty', 'Dodatkowe informacje'],
+}
+
+# Роздільник кількох значень в одній клітинці (періоди, документи, контакти)
+VALUES_SEPARATOR = '; '
+
+# Табличні редактори виконують клітинку, що починається з цих символів, як формулу
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def export_language(filter_params):
+    language = filter_params.get('language', 'uk')
+    if isinstance(language, list):
+        language = language[0] if language else 'uk'
+    return language if language in EXPORT_HEADERS else 'uk'
+
+
+def _date(value):
+    return value.strftime('%d.%m.%Y') if value else ''
+
+
+def _joined(values):
+    return VALUES_SEPARATOR.join(v for v in values if v)
+
+
+def iter_export_rows(filter_params, chunk_size=EXPORT_CHUNK_SIZE):
+    """Заголовок, а за ним по рядку на співробітника (серверний курсор)"""
+    language = export_language(filter_params)
+    t = TRANSLATIONS[language]
+    status_map = t['status_map']
+
+    def yes_no(value):
+        return t['yes'] if value else t['no']
+
+    yield EXPORT_HEADERS[language]
+
+    employees = employees_pdf_queryset(filter_params).prefetch_related(*PDF_PREFETCH)
+    for emp in employees.iterator(chunk_size=chunk_size):
+        yield [
+            emp.id,
+            emp.last_name or '',
+            emp.first_name or '',
+            emp.age if emp.age is not None else '',
+            emp.workplace or '',
+            status_map.get(emp.working_status, emp.working_status or ''),
+            emp.pesel or '',
+            yes_no(emp.pesel_urk),
+            yes_no(emp.is_student),
+            yes_no(emp.pit_2),
+            _joined(
+                f"{_date(p.start_date)}-{_date(p.end_date)}"
+                for p in emp.employment_period.all()
+            ),
+            _joined(
+                f"{d.doc_type or ''} {d.number or ''} ({_date(d.valid_until)})".replace(' ()', '').strip()
+                for d in emp.documents.all()
+            ),
+            _joined(
+                f"{p.doc_type or ''} ({_date(p.end_date)})".replace(' ()', '').strip()
+                for p in emp.work_permits.all()
+            ),
+            _joined(c.get_contract_type_display() for c in emp.contracts.all()),
+            _joined(c.value for c in emp.contacts.all()),
+            emp.additional_information or '',
+        ]
+
+
+def escape_formula(value):
+    """Текст, що виглядає як формула, з префіксом ' — редактор покаже його як текст"""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+class Echo:
+    """Псевдо-файл для csv.writer: write() повертає рядок замість запису"""
+
+    def write(self, value):
+        return value
+
+
+def iter_employees_csv(filter_params, chunk_size=EXPORT_CHUNK_SIZE):
+    """CSV по рядку; BOM, щоб Excel відкривав UTF-8 з кирилицею коректно"""
+    writer = csv.writer(Echo())
+    yield '﻿'
+    for row in iter_export_rows(filter_params, chunk_size):
+        yield writer.writerow([escape_formula(value) for value in row])
+
+
+def build_employees_xlsx(filter_params, output, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Пише XLSX у output (шлях або файловий об'єкт). Write-only книга
+    скидає рядки у тимчасовий файл, тому пам'ять не росте з кількістю рядків.
+    Повертає кількість співробітників.
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title='Employees')
+
+    def text_cell(value):
+        # openpyxl зберігає рядок, що починається з "=", як формулу
+        if isinstance(value, str) and value.startswith('='):
+            cell = WriteOnlyCell(sheet, value=value)
+            cell.data_type = 's'
+            return cell
+        return value
+
+    rows = iter_export_rows(filter_params, chunk_size)
+    sheet.append(next(rows))
+    total = 0
+    for row in rows:
+        sheet.append([text_cell(value) for value in row])
+        total += 1
+
+    workbook.save(output)
+    return total
+
+
+def employees_xlsx_file(filter_params, chunk_size=EXPORT_CHUNK_SIZE):
+    """Готовий XLSX у тимчасовому файлі (видаляється при закритті), позиція на початку"""
+    output = tempfile.NamedTemporaryFile(suffix='.xlsx')
+    build_employees_xlsx(filter_params, output, chunk_size)
+    output.flush()
+    output.seek(0)
+    return output
@@ -1,4 +1,4 @@
-from datetime import date
+from datetime import date, timedelta
 
 import django_filters
 from django import forms
@@ -7,6 +7,7 @@ from django.db.models.functions import Coalesce
 from django.utils.translation import gettext_lazy as _
 
 from .models import Employee
+from .expiry import expiring_between
 
 
 class EmployeeMultiFilter(django_filters.FilterSet):
@@ -34,6 +35,11 @@ class EmployeeMultiFilter(django_filters.FilterSet):
         widget=forms.CheckboxSelectMultiple(attrs={"class": "form-check-input"}),
     )
 
+    permit_expires_within = django_filters.NumberFilter(
+        method="filter_by_permit_expiry",
+        label=_("Дозвіл на роботу закінчується протягом (днів)"),
+    )
+
     ordering = django_filters.OrderingFilter(
         fields=(
             ('last_name', 'last_name'),
@@ -46,7 +52,7 @@ class EmployeeMultiFilter(django_filters.FilterSet):
 
     class Meta:
         model = Employee
-        fields = ["status", "q", "ordering"]
+        fields = ["status", "q", "permit_expires_within", "ordering"]
 
     def filter_by_status(self, queryset, name, value):
         if not value:
@@ -93,6 +99,15 @@ class EmployeeMultiFilter(django_filters.FilterSet):
             Q(first_name__icontains=value) | Q(last_name__icontains=value)
         )
 
+    def filter_by_permit_expiry(self, queryset, name, value):
+        if value is None:
+            return queryset
+
+        # Календар дат закінчення: range scan замість JOIN з усіма дозволами
+        today = date.today()
+        permits = expiring_between(today, today + timedelta(days=int(value)), sources=['work_permit'])
+        return queryset.filter(pk__in=permits.values('employee_id'))
+
     def filter_ordering(self, queryset, name, value):
         if not value:
             return queryset
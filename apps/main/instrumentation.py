@@ -0,0 +1,198 @@
+"""
+Інструментування задач Celery сигналами task_prerun / task_postrun /
+task_failure: для кожного виконання пишеться рядок TaskExecution.
+
+* очікування в черзі — від заголовка published_at (apps.main.queues);
+* час роботи — monotonic між prerun і postrun;
+* пам'ять — приріст ru_maxrss процесу воркера (наскільки задача підняла пік);
+* рядки — сума cursor.rowcount усіх SQL-запитів задачі (execute wrapper);
+* повторні спроби — request.retries, стан retry для спроби, що впала.
+
+Звідси ж агрегати для сторінки метрик і текст у форматі Prometheus.
+"""
+import logging
+import resource
+import time
+from dataclasses import dataclass
+
+from celery.signals import task_failure, task_postrun, task_prerun
+from django.db import DatabaseError, connection
+from django.db.models import Avg, Count, Max, Q, Sum
+from django.utils import timezone
+
+from apps.main.models import TaskExecution
+from apps.main.queues import request_queue, request_wait
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Tracker:
+    started_at: object
+    started: float
+    maxrss: int
+    queue: str
+    queue_wait: float = None
+    rows: int = 0
+    queries: int = 0
+    error: str = ''
+
+    def __call__(self, execute, sql, params, many, context):
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            rowcount = getattr(context.get("cursor"), "rowcount", -1)
+            if rowcount and rowcount > 0:
+                self.rows += rowcount
+
+
+# task_id -> _Tracker; задачі виконуються послідовно в процесі воркера,
+# але eager-виклики можуть вкладатися, тож ключ — id задачі
+_running = {}
+
+
+def _maxrss():
+    # Linux: кілобайти
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+@task_prerun.connect(dispatch_uid="instrumentation_task_started")
+def task_started(task_id=None, task=None, **kwargs):
+    request = task.request
+    tracker = _Tracker(
+        started_at=timezone.now(),
+        started=time.monotonic(),
+        maxrss=_maxrss(),
+        queue=request_queue(request),
+        queue_wait=request_wait(request),
+    )
+    connection.execute_wrappers.append(tracker)
+    _running[task_id] = tracker
+
+
+@task_failure.connect(dispatch_uid="instrumentation_task_failed")
+def task_failed(task_id=None, exception=None, **kwargs):
+    tracker = _running.get(task_id)
+    if tracker is not None:
+        tracker.error = repr(exception)
+
+
+@task_postrun.connect(dispatch_uid="instrumentation_task_finished")
+def task_finished(task_id=None, task=None, state=None, **kwargs):
+    tracker = _running.pop(task_id, None)
+    if tracker is None:
+        return
+    if tracker in connection.execute_wrappers:
+        connection.execute_wrappers.remove(tracker)
+
+    if state == "RETRY":
+        execution_state = TaskExecution.RETRY
+    elif state == "FAILURE":
+        execution_state = TaskExecution.FAILED
+    else:
+        execution_state = TaskExecution.SUCCEEDED
+
+    try:
+        TaskExecution.objects.create(
+            task_id=task_id,
+            name=task.name,
+            queue=tracker.queue,
+            state=execution_state,
+            retries=task.request.retries or 0,
+            started_at=tracker.started_at,
+            queue_wait=tracker.queue_wait,
+            runtime=time.monotonic() - tracker.started,
+            rss_delta=max(_maxrss() - tracker.maxrss, 0),
+            rows=tracker.rows,
+            queries=tracker.queries,
+            error=tracker.error,
+        )
+    except DatabaseError as e:
+        logger.warning(f"Failed to record execution of {task.name} [{task_id}]: {e}")
+
+
+def task_summary(since):
+    """Агрегати по кожній задачі за виконання, що стартували після since"""
+    return list(
+        TaskExecution.objects.filter(started_at__gte=since)
+        .values("name")
+        .annotate(
+            runs=Count("id"),
+            failures=Count("id", filter=Q(state=TaskExecution.FAILED)),
+            retries=Count("id", filter=Q(state=TaskExecution.RETRY)),
+            avg_runtime=Avg("runtime"),
+            max_runtime=Max("runtime"),
+            avg_wait=Avg("queue_wait"),
+            max_wait=Max("queue_wait"),
+            max_rss_delta=Max("rss_delta"),
+            rows=Sum("rows"),
+            queries=Sum("queries"),
+        )
+        .order_by("-max_runtime")
+    )
+
+
+def _labels(**labels):
+    return ",".join(f'{key}="{value}"' for key, value in labels.items())
+
+
+def prometheus_metrics(summary, queues=(), backups=None):
+    """
+    Текстовий формат Prometheus для task_summary, apps.main.queues.queue_stats
+    і apps.main.backups.backup_stats
+    """
+    metrics = [
+        ("celery_task_runs", "runs", "Task executions in the window"),
+        ("celery_task_failures", "failures", "Failed task executions in the window"),
+        ("celery_task_retries", "retries", "Task executions that ended in a retry"),
+        ("celery_task_runtime_seconds_avg", "avg_runtime", "Average task run time"),
+        ("celery_task_runtime_seconds_max", "max_runtime", "Longest task run time"),
+        ("celery_task_queue_wait_seconds_avg", "avg_wait", "Average time spent waiting in the queue"),
+        ("celery_task_queue_wait_seconds_max", "max_wait", "Longest time spent waiting in the queue"),
+        ("celery_task_rss_delta_kilobytes_max", "max_rss_delta", "Largest worker peak RSS growth"),
+        ("celery_task_rows", "rows", "Rows touched by task SQL statements"),
+    ]
+
+    lines = []
+    for metric, key, help_text in metrics:
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} gauge")
+        for row in summary:
+            if row[key] is not None:
+                lines.append(f"{metric}{{{_labels(task=row['name'])}}} {row[key]}")
+
+    if queues:
+        lines.append("# HELP celery_queue_depth Messages waiting in the queue")
+        lines.append("# TYPE celery_queue_depth gauge")
+        for queue in queues:
+            lines.append(f"celery_queue_depth{{{_labels(queue=queue['queue'])}}} {queue['depth']}")
+        lines.append("# HELP celery_queue_latency_seconds Smoothed publish-to-start latency")
+        lines.append("# TYPE celery_queue_latency_seconds gauge")
+        for queue in queues:
+            if queue["latency"]:
+                lines.append(
+                    f"celery_queue_latency_seconds{{{_labels(queue=queue['queue'])}}} {queue['latency']['avg']}"
+                )
+
+    if backups is not None:
+        latest = backups["latest"]
+        backup_metrics = [
+            ("db_backup_count", backups["count"], "Verified database backups kept"),
+            ("db_backup_total_bytes", backups["total_size"], "Size of all kept backups"),
+            ("db_backup_failures", backups["failures"], "Failed backups still on record"),
+        ]
+        if latest is not None:
+            backup_metrics += [
+                ("db_backup_last_size_bytes", latest.size, "Size of the latest verified backup"),
+                ("db_backup_last_dump_seconds", latest.dump_duration, "pg_dump duration of the latest backup"),
+                ("db_backup_last_verify_seconds", latest.verify_duration, "Verification time of the latest backup"),
+                ("db_backup_last_success_timestamp", latest.finished_at.timestamp(),
+                 "Unix time the latest verified backup finished"),
+            ]
+        for metric, value, help_text in backup_metrics:
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric} {value}")
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,202 @@
+"""
+Одноразовий запуск періодичних задач Celery (beat).
+
+@single_run гарантує, що задача не виконується двічі паралельно і не
+повторюється в тому ж слоті розкладу (наприклад, у ту ж добу):
+
+* lease-блокування в Redis (SET NX PX з токеном) — поки задача працює,
+  фоновий потік продовжує оренду; якщо воркер помер, оренда спливає сама;
+* рядок JobRun на (name, slot) — унікальний індекс відсікає дублікат слоту,
+  а статус і тривалість лишаються як журнал запусків.
+
+Повторна спроба (retry) після помилки в тому ж слоті дозволена. Рядок у
+статусі running, чия оренда вже спливла, теж переймається новим запуском.
+Прямий виклик функції (manage.py shell, тести) — без блокування і журналу.
+"""
+import functools
+import logging
+import threading
+import time
+import uuid
+
+import redis
+from celery import current_task
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from apps.main.models import JobRun
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_LEASE_SECONDS = 10 * 60
+LOCK_KEY_PREFIX = "jobs:lock:"
+
+_client = None
+
+
+def lock_client():
+    """Redis для блокувань (settings.JOB_LOCK_REDIS_URL), одне з'єднання на процес"""
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.JOB_LOCK_REDIS_URL)
+    return _client
+
+
+def daily_slot(now):
+    return now.date().isoformat()
+
+
+class LeaseLock:
+    """
+    Блокування з орендою: ключ живе lease секунд і належить власнику токена.
+    Продовження і зняття перевіряють токен у WATCH/MULTI, тож чуже
+    (перехоплене після спливу оренди) блокування не буде зняте.
+    """
+
+    def __init__(self, client, name, lease=DEFAULT_LEASE_SECONDS):
+        self.client = client
+        self.key = f"{LOCK_KEY_PREFIX}{name}"
+        self.lease_ms = int(lease * 1000)
+        self.token = uuid.uuid4().hex
+
+    def acquire(self):
+        return bool(self.client.set(self.key, self.token, nx=True, px=self.lease_ms))
+
+    def _if_owner(self, command):
+        with self.client.pipeline() as pipe:
+            try:
+                pipe.watch(self.key)
+                if pipe.get(self.key) != self.token.encode():
+                    pipe.unwatch()
+                    return False
+                pipe.multi()
+                command(pipe)
+                pipe.execute()
+                return True
+            except redis.WatchError:
+                return False
+
+    def renew(self):
+        return self._if_owner(lambda pipe: pipe.pexpire(self.key, self.lease_ms))
+
+    def release(self):
+        return self._if_owner(lambda pipe: pipe.delete(self.key))
+
+
+class _Renewer(threading.Thread):
+    """Продовжує оренду кожну третину її тривалості, поки задача працює"""
+
+    def __init__(self, lock, lease):
+        super().__init__(daemon=True)
+        self.lock = lock
+        self.interval = lease / 3
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                if not self.lock.renew():
+                    logger.error(f"Lease {self.lock.key} lost while the job was still running")
+                    return
+            except redis.RedisError as e:
+                logger.warning(f"Failed to renew lease {self.lock.key}: {e}")
+
+    def stop(self):
+        self.stopped.set()
+
+
+def _claim_slot(name, slot, run_id, lease_held):
+    """
+    True, якщо цей запуск має виконати слот: рядка ще немає, попередній
+    запуск упав, або він "running", але його оренда спливла (ми її тримаємо).
+    """
+    now = timezone.now()
+    try:
+        with transaction.atomic():
+            JobRun.objects.create(name=name, slot=slot, run_id=run_id, started_at=now)
+        return True
+    except IntegrityError:
+        pass
+
+    reclaimable = [JobRun.FAILED] + ([JobRun.RUNNING] if lease_held else [])
+    return bool(JobRun.objects.filter(name=name, slot=slot, status__in=reclaimable).update(
+        status=JobRun.RUNNING, run_id=run_id, started_at=now,
+        finished_at=None, duration=None, error='',
+    ))
+
+
+def _finish(name, slot, run_id, started, **fields):
+    JobRun.objects.filter(name=name, slot=slot, run_id=run_id).update(
+        finished_at=timezone.now(), duration=time.monotonic() - started, **fields
+    )
+
+
+def single_run(name=None, lease=DEFAULT_LEASE_SECONDS, slot=daily_slot):
+    """
+    Декоратор для функції задачі (під @shared_task):
+
+        @shared_task
+        @single_run(lease=30 * 60)
+        def mark_working_status(): ...
+
+    Дублікат (блокування зайняте або слот уже виконано) повертає None.
+    Недоступний Redis не зупиняє задачу: лишається захист унікальним слотом у БД.
+    """
+
+    def decorator(func):
+        job_name = name or f"{func.__module__}.{func.__name__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            run_id = getattr(current_task.request, "id", None) if current_task else None
+            if not run_id:
+                return func(*args, **kwargs)
+
+            job_slot = slot(timezone.now())
+            lock = LeaseLock(lock_client(), job_name, lease)
+            try:
+                lease_held = lock.acquire()
+            except redis.RedisError as e:
+                logger.warning(f"Job lock backend unavailable for {job_name}, relying on slot dedupe: {e}")
+                lock, lease_held = None, False
+            else:
+                if not lease_held:
+                    logger.info(f"Skipping {job_name} [{job_slot}]: another run holds the lease")
+                    JobRun.objects.filter(name=job_name, slot=job_slot).update(skipped=F('skipped') + 1)
+                    return None
+
+            renewer = None
+            try:
+                if not _claim_slot(job_name, job_slot, run_id, lease_held):
+                    logger.info(f"Skipping {job_name} [{job_slot}]: slot already ran")
+                    JobRun.objects.filter(name=job_name, slot=job_slot).update(skipped=F('skipped') + 1)
+                    return None
+
+                if lock is not None:
+                    renewer = _Renewer(lock, lease)
+                    renewer.start()
+
+                started = time.monotonic()
+                try:
+                    result = func(*args, **kwargs)
+                except Exception as e:
+                    _finish(job_name, job_slot, run_id, started, status=JobRun.FAILED, error=repr(e))
+                    raise
+                _finish(job_name, job_slot, run_id, started, status=JobRun.SUCCEEDED,
+                        result='' if result is None else str(result))
+                return result
+            finally:
+                if renewer is not None:
+                    renewer.stop()
+                if lock is not None:
+                    try:
+                        lock.release()
+                    except redis.RedisError as e:
+                        logger.warning(f"Failed to release lease {lock.key}: {e}")
+
+        return wrapper
+
+    return decorator
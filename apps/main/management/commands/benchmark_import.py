@@ -0,0 +1,83 @@
+import os
+import time
+
+import pandas as pd
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from utils.csv_to_objects import (
+    read_import_csv,
+    clean_and_parse_row,
+    create_employee_from_row,
+    preprocess_frame,
+    bulk_create_from_frame,
+)
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Benchmark row-wise vs vectorized employee import"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows",
+            type=int,
+            default=10000,
+            help="Number of rows (the sample CSV is repeated to reach it)",
+        )
+        parser.add_argument(
+            "--with-db",
+            action="store_true",
+            help="Also benchmark inserts (inside a transaction that is rolled back)",
+        )
+
+    def handle(self, *args, **options):
+        path = os.path.join(settings.BASE_DIR, "utils", "data1.csv")
+        sample = read_import_csv(path)
+        repeats = -(-options["rows"] // len(sample))
+        df = pd.concat([sample] * repeats, ignore_index=True).head(options["rows"])
+
+        self.stdout.write(f"Rows: {len(df)}")
+
+        started = time.perf_counter()
+        for raw_row in df.to_dict(orient="records"):
+            clean_and_parse_row(raw_row)
+        rowwise = time.perf_counter() - started
+
+        started = time.perf_counter()
+        frame = preprocess_frame(df)
+        vectorized = time.perf_counter() - started
+
+        self.stdout.write(f"Parse row-wise:   {rowwise:.3f}s")
+        self.stdout.write(f"Parse vectorized: {vectorized:.3f}s (x{rowwise / vectorized:.1f})")
+
+        if not options["with_db"]:
+            return
+
+        rowwise = self._timed_rollback(
+            lambda: [create_employee_from_row(clean_and_parse_row(r)) for r in df.to_dict(orient="records")]
+        )
+        vectorized = self._timed_rollback(
+            lambda: bulk_create_from_frame(preprocess_frame(df))
+        )
+
+        self.stdout.write(f"Import row-wise:   {rowwise:.3f}s")
+        self.stdout.write(
+            self.style.SUCCESS(f"Import vectorized: {vectorized:.3f}s (x{rowwise / vectorized:.1f})")
+        )
+
+    @staticmethod
+    def _timed_rollback(func):
+        started = time.perf_counter()
+        try:
+            with transaction.atomic():
+                func()
+                elapsed = time.perf_counter() - started
+                raise _Rollback
+        except _Rollback:
+            pass
+        return elapsed
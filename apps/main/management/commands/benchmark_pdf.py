@@ -0,0 +1,180 @@
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+
+from apps.main.models import Employee, EmploymentPeriod, Document, WorkPermit, Contract, Contact
+from apps.main.pdf import (
+    build_employees_pdf,
+    build_employees_pdf_parallel,
+    reset_render_context,
+    StageTimings,
+    PDF_CHUNK_SIZE,
+)
+
+
+# Позначка синтетичних співробітників, щоб прибрати їх після бенчмарку
+BENCHMARK_MARK = "benchmark_pdf"
+
+
+class Command(BaseCommand):
+    help = "Benchmark employees PDF export (time and peak Python memory)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows",
+            type=int,
+            nargs="+",
+            default=[10000, 100000],
+            help="Employee counts to benchmark (synthetic rows, deleted afterwards)",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=PDF_CHUNK_SIZE,
+            help="Rows per table chunk in streaming mode",
+        )
+        parser.add_argument(
+            "--legacy",
+            action="store_true",
+            help="Also benchmark the single-table mode (whole result set prefetched at once)",
+        )
+        parser.add_argument(
+            "--memory",
+            action="store_true",
+            help="Measure peak Python memory in a separate tracemalloc run (about 10x slower)",
+        )
+        parser.add_argument(
+            "--parallelism",
+            type=int,
+            nargs="+",
+            default=[],
+            help="Also benchmark rendering in N processes with merging (e.g. --parallelism 2 4)",
+        )
+        parser.add_argument(
+            "--database",
+            help="Connection alias from settings.DATABASES (a dedicated migrated database) "
+                 "to seed and benchmark in; required unless DEBUG is set",
+        )
+
+    def handle(self, *args, **options):
+        # Синтетичні рядки комітяться, тож на робочій базі бенчмарк не запускається
+        using = options["database"] or "default"
+        if using not in settings.DATABASES:
+            raise CommandError(f"Unknown database alias {using!r}: add it to settings.DATABASES")
+        if using == "default" and not settings.DEBUG:
+            raise CommandError("benchmark_pdf commits synthetic rows: set DEBUG or pass --database")
+        self.using = using
+
+        modes = [("streaming", options["chunk_size"], 1)]
+        if options["legacy"]:
+            modes.append(("single table", None, 1))
+        for parallelism in options["parallelism"]:
+            modes.append((f"parallel x{parallelism}", options["chunk_size"], parallelism))
+
+        # Дані комітяться (процеси пулу не бачать незакомічену транзакцію) і видаляються в кінці
+        try:
+            seeded = 0
+            for rows in sorted(options["rows"]):
+                self._seed(using, seeded, rows)
+                seeded = rows
+
+                # Перший прогін — з холодним RenderContext (шрифти, стилі), далі — теплий
+                reset_render_context()
+                baseline = None
+                for run, (name, chunk_size, parallelism) in enumerate(modes):
+                    timings = StageTimings()
+                    elapsed, size = self._timed(chunk_size, parallelism, timings)
+                    baseline = baseline or elapsed
+                    line = (
+                        f"{rows:>7} rows  {name:<12}  {elapsed:7.2f}s  (x{baseline / elapsed:.2f})  "
+                        f"pdf {size / 2**20:6.1f} MiB"
+                    )
+                    if options["memory"] and parallelism == 1:
+                        line += f"  peak {self._peak_memory(chunk_size) / 2**20:7.1f} MiB"
+                    self.stdout.write(line)
+                    if timings:
+                        self.stdout.write(f"{'':>14}{'cold' if run == 0 else 'warm'}: {timings}")
+        finally:
+            self._cleanup(using)
+
+    def _build(self, path, chunk_size, parallelism, timings=None):
+        if parallelism > 1:
+            build_employees_pdf_parallel(
+                {"language": "uk"}, path, parallelism, chunk_size=chunk_size, using=self.using,
+            )
+        else:
+            build_employees_pdf(
+                {"language": "uk"}, path, chunk_size=chunk_size, timings=timings, using=self.using,
+            )
+
+    def _timed(self, chunk_size, parallelism=1, timings=None):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "employees.pdf")
+            started = time.perf_counter()
+            self._build(path, chunk_size, parallelism, timings)
+            return time.perf_counter() - started, os.path.getsize(path)
+
+    def _peak_memory(self, chunk_size):
+        """Окремий прогін під tracemalloc, щоб його накладні витрати не псували час"""
+        with tempfile.TemporaryDirectory() as tmp:
+            tracemalloc.start()
+            try:
+                self._build(os.path.join(tmp, "employees.pdf"), chunk_size, 1)
+                return tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+
+    @staticmethod
+    def _cleanup(using):
+        employees = Employee.objects.using(using).filter(additional_information=BENCHMARK_MARK)
+        with transaction.atomic(using=using):
+            # Усі залежні моделі (і сповіщення, і ExpiryEntry, що могли з'явитись за
+            # час бенчмарку), інакше DELETE співробітників впаде на зовнішньому ключі
+            for relation in Employee._meta.related_objects:
+                relation.related_model.objects.using(using).filter(**{f"{relation.field.name}__in": employees}).delete()
+            # Без post_delete-сигналів: синтетичні рядки не повинні потрапити в History
+            with connections[using].cursor() as cursor:
+                cursor.execute(
+                    f"DELETE FROM {Employee._meta.db_table} WHERE additional_information = %s",
+                    [BENCHMARK_MARK],
+                )
+
+    @staticmethod
+    def _seed(using, start, stop, batch_size=2000):
+        for offset in range(start, stop, batch_size):
+            with transaction.atomic(using=using):
+                employees = Employee.objects.using(using).bulk_create([
+                    Employee(
+                        first_name=f"Name{i}",
+                        last_name=f"Surname{i}",
+                        age=20 + i % 40,
+                        pesel=f"{i:011d}",
+                        workplace="Magazyn Poznań",
+                        working_status="Pracujący",
+                        is_student=i % 5 == 0,
+                        additional_information=BENCHMARK_MARK,
+                    )
+                    for i in range(offset, min(offset + batch_size, stop))
+                ])
+                EmploymentPeriod.objects.using(using).bulk_create(
+                    EmploymentPeriod(employee=e, start_date=date(2025, 1, 1), end_date=date(2026, 12, 31))
+                    for e in employees
+                )
+                Document.objects.using(using).bulk_create(
+                    Document(employee=e, doc_type="karta", valid_until=date(2027, 6, 30))
+                    for e in employees
+                )
+                WorkPermit.objects.using(using).bulk_create(
+                    WorkPermit(employee=e, doc_type="zez WRP-II.8671.91044.2024", end_date=date(2026, 1, 21))
+                    for e in employees
+                )
+                Contract.objects.using(using).bulk_create(Contract(employee=e, contract_type="zlecenia") for e in employees)
+                Contact.objects.using(using).bulk_create(
+                    Contact(employee=e, contact_type="viber", value="+48453172686") for e in employees
+                )
@@ -0,0 +1,30 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Start a Celery worker for one queue with its concurrency and prefetch from settings.WORKER_QUEUES"
+
+    def add_arguments(self, parser):
+        parser.add_argument("queue", choices=sorted(settings.WORKER_QUEUES), help="Queue to consume")
+        parser.add_argument("--loglevel", default="info")
+
+    def handle(self, *args, **options):
+        queue = options["queue"]
+        config = settings.WORKER_QUEUES[queue]
+        argv = [
+            "celery", "-A", "core", "worker",
+            "-Q", queue,
+            "-n", f"{queue}@%h",
+            "--concurrency", str(config["concurrency"]),
+            "--prefetch-multiplier", str(config["prefetch_multiplier"]),
+            "--loglevel", options["loglevel"],
+        ]
+        self.stdout.write(" ".join(argv))
+        try:
+            # Процес замінюється воркером, щоб сигнали зупинки контейнера йшли прямо в celery
+            os.execvp(argv[0], argv)
+        except OSError as e:
+            raise CommandError(f"Could not start celery: {e}")
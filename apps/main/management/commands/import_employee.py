@@ -2,36 +2,81 @@ import os
 
 from django.core.management.base import BaseCommand
 from django.conf import settings
-import pandas as pd
-from utils.csv_to_objects import create_employee_from_row, clean_and_parse_row
+from django.utils import timezone
+from apps.main.models import Employee
+from apps.main.expiry import rebuild_expiry_entries
+from apps.notification.utils import check_and_create_notifications_bulk
+from utils.csv_to_objects import iter_csv_frames, import_frames
+from utils.xlsx_to_objects import iter_xlsx_frames
 
 
 
 
 class Command(BaseCommand):
-    help = "Importing csv files from data folder"
+    help = "Importing csv/xlsx files from data folder"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--path",
+            default=os.path.join(settings.BASE_DIR, "utils", "data1.csv"),
+            help="CSV or XLSX file to import",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Rows per bulk INSERT batch",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=5000,
+            help="Rows read from the file at once",
+        )
+        parser.add_argument(
+            "--update",
+            action="store_true",
+            help="Incremental import: match rows by PESEL (or name), skip unchanged rows, update changed fields",
+        )
 
     def handle(self, *args, **options):
-        path = os.path.join(settings.BASE_DIR, "utils", "data1.csv")
-        df = pd.read_csv(
-            path,
-            delimiter=",",
-            encoding="utf-8",
-            dtype=str,
+        path = options["path"]
+
+        if path.lower().endswith(".xlsx"):
+            frames = iter_xlsx_frames(path, chunk_size=options["chunk_size"])
+        else:
+            frames = iter_csv_frames(path, chunk_size=options["chunk_size"])
+
+        started = timezone.now()
+        report = import_frames(
+            frames,
+            batch_size=options["batch_size"],
+            update=options["update"],
         )
-        df = df.apply(lambda col: col.str.strip() if col.dtype == "object" else col)
 
-        df["Призвіще"] = df["Призвіще"].str.strip()
-        df["Призвіще"] = df["Призвіще"].str.replace(r"^\d+\.\s*", "", regex=True)
+        imported = Employee.objects.filter(updated_at__gte=started)
+        rebuild_expiry_entries(imported)
+        notifications = check_and_create_notifications_bulk(imported)
+        self.stdout.write(f"Expiry notifications created or updated: {notifications}")
+
+        for error in report["errors"]:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"Row {error['row']}, {error['column']}: {error['error']} ({error['value']})"
+                )
+            )
+
+        if options["update"]:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Created: {report['created']}, updated: {report['updated']}, "
+                    f"unchanged: {report['unchanged']}, skipped: {report['rows'] - report['valid']}"
+                )
+            )
+            return
 
-        instances = 0
-        for raw_row in df.to_dict(orient="records"):
-            row = clean_and_parse_row(raw_row)
-            create_employee_from_row(row)
-            instances += 1
         self.stdout.write(
             self.style.SUCCESS(
-                f"Created: {instances} instances"
+                f"Created: {report['created']} instances"
             )
         )
-
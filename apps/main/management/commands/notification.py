@@ -38,11 +38,7 @@ class Command(BaseCommand):
                 notification_type="document",
                 employee=doc.employee,
                 document=doc,
-                days_left=(doc.valid_until - today).days,
-                message=(
-                    f"Документ {doc.doc_type or 'Невідомий'} №{doc.number or 'Не вказано'} "
-                    f"закінчується через {(doc.valid_until - today).days} днів (до {doc.valid_until})."
-                ),
+                expires_on=doc.valid_until,
             )
             for doc in documents
         ]
@@ -52,11 +48,7 @@ class Command(BaseCommand):
                 notification_type="work_permit",
                 employee=permit.employee,
                 work_permit=permit,
-                days_left=(permit.end_date - today).days,
-                message=(
-                    f"Документ {permit.doc_type or 'Невідомий'} "
-                    f"закінчується через {(permit.end_date - today).days} днів (до {permit.end_date})."
-                ),
+                expires_on=permit.end_date,
             )
             for permit in work_permits
         ]
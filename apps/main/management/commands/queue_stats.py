@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from apps.main.queues import queue_stats
+
+
+class Command(BaseCommand):
+    help = "Show Celery queue depth and task start latency per queue"
+
+    def handle(self, *args, **options):
+        for row in queue_stats():
+            latency = row["latency"]
+            line = f"{row['queue']:<12} depth {row['depth']:>6}"
+            if latency:
+                line += (
+                    f"  latency last {latency['last']:7.2f}s  avg {latency['avg']:7.2f}s"
+                    f"  max {latency['max']:7.2f}s  ({latency['count']} tasks)"
+                )
+            else:
+                line += "  latency n/a"
+            self.stdout.write(line)
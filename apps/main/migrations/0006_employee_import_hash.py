@@ -0,0 +1,20 @@
+# Generated by Django 5.2.8 on 2026-10-19 10:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0005_employee_student_end_date_sanepid_end_date"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="employee",
+            name="import_hash",
+            field=models.CharField(
+                blank=True, editable=False, max_length=16, null=True
+            ),
+        ),
+    ]
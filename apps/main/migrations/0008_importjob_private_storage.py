@@ -0,0 +1,21 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:04
+
+import apps.main.utils
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0007_importjob"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="importjob",
+            name="file",
+            field=models.FileField(
+                storage=apps.main.utils.private_storage, upload_to="imports/"
+            ),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0009_export_cache"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReportArtifact",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("preset", models.CharField(max_length=64)),
+                ("format", models.CharField(max_length=8)),
+                ("language", models.CharField(max_length=8)),
+                ("path", models.CharField(max_length=255)),
+                ("filename", models.CharField(max_length=255)),
+                ("size", models.PositiveBigIntegerField(default=0)),
+                ("rows", models.PositiveIntegerField(default=0)),
+                ("data_version", models.PositiveBigIntegerField(default=0)),
+                ("generated_at", models.DateTimeField()),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("preset", "format", "language"),
+                        name="unique_report_artifact",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0010_reportartifact"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="workpermit",
+            index=models.Index(
+                fields=["end_date"], name="main_workpe_end_dat_add75c_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,104 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Модель -> (source, поле дати, поле підпису); див. apps.main.expiry.EXPIRY_SOURCES
+SOURCES = [
+    ("Document", "document", "valid_until", "doc_type"),
+    ("WorkPermit", "work_permit", "end_date", "doc_type"),
+    ("Sanepid", "sanepid", "end_date", "doc_type"),
+    ("EmploymentPeriod", "employment_period", "end_date", None),
+    ("Employee", "student", "student_end_date", None),
+]
+
+
+def fill_expiry_entries(apps, schema_editor):
+    ExpiryEntry = apps.get_model("main", "ExpiryEntry")
+
+    for model_name, source, date_field, label_field in SOURCES:
+        model = apps.get_model("main", model_name)
+        employee_field = "pk" if model_name == "Employee" else "employee_id"
+        status_field = "working_status" if model_name == "Employee" else "employee__working_status"
+        fields = ["pk", employee_field, date_field, status_field] + ([label_field] if label_field else [])
+
+        rows = model.objects.filter(**{f"{date_field}__isnull": False}).values_list(*fields)
+        ExpiryEntry.objects.bulk_create(
+            (
+                ExpiryEntry(
+                    source=source,
+                    source_id=row[0],
+                    employee_id=row[1],
+                    expires_on=row[2],
+                    employee_dismissed=row[3] == "Zwolniony",
+                    label=(row[4] or "")[:128] if label_field else "",
+                )
+                for row in rows.iterator(chunk_size=1000)
+            ),
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0011_workpermit_end_date_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ExpiryEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "source",
+                    models.CharField(
+                        choices=[
+                            ("document", "Document"),
+                            ("work_permit", "Work permit"),
+                            ("sanepid", "Sanepid"),
+                            ("employment_period", "Employment period"),
+                            ("student", "Student status"),
+                        ],
+                        max_length=32,
+                    ),
+                ),
+                ("source_id", models.PositiveBigIntegerField()),
+                ("expires_on", models.DateField()),
+                ("label", models.CharField(blank=True, default="", max_length=128)),
+                ("employee_dismissed", models.BooleanField(default=False)),
+                (
+                    "employee",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="expiry_entries",
+                        to="main.employee",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("employee_dismissed", False)),
+                        fields=["expires_on", "source"],
+                        name="expiry_active_idx",
+                    ),
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("source", "source_id"), name="unique_expiry_source"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(fill_expiry_entries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0013_jobrun"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TaskExecution",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("task_id", models.CharField(max_length=255)),
+                ("name", models.CharField(max_length=255)),
+                ("queue", models.CharField(blank=True, default="", max_length=64)),
+                (
+                    "state",
+                    models.CharField(
+                        choices=[
+                            ("succeeded", "Succeeded"),
+                            ("failed", "Failed"),
+                            ("retry", "Retry"),
+                        ],
+                        max_length=16,
+                    ),
+                ),
+                ("retries", models.PositiveIntegerField(default=0)),
+                ("started_at", models.DateTimeField()),
+                ("queue_wait", models.FloatField(blank=True, null=True)),
+                ("runtime", models.FloatField()),
+                ("rss_delta", models.BigIntegerField(default=0)),
+                ("rows", models.BigIntegerField(default=0)),
+                ("queries", models.PositiveIntegerField(default=0)),
+                ("error", models.TextField(blank=True, default="")),
+            ],
+            options={
+                "ordering": ["-started_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["name", "started_at"], name="task_execution_name_idx"
+                    ),
+                    models.Index(
+                        fields=["started_at"], name="task_execution_started_idx"
+                    ),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 13:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0015_databasebackup"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="reportartifact",
+            name="rendered_on",
+            field=models.DateField(blank=True, null=True),
+        ),
+    ]
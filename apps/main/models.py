@@ -2,7 +2,7 @@ from django.db import models
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
 from .querysets import EmployeeQuerySet
-from .utils import get_change_user
+from .utils import get_change_user, private_storage
 
 class EmployeeManager(models.Manager):
     def get_queryset(self):
@@ -132,6 +132,10 @@ class Employee(HistoryMixin, models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     student_end_date = models.DateField(blank=True, null=True)
+    # Хеш рядка останнього імпорту (utils.csv_to_objects.upsert_from_frame)
+    import_hash = models.CharField(max_length=16, null=True, blank=True, editable=False)
+
+    history_exclude_fields = ["updated_at", "created_at", "import_hash"]
 
     objects = EmployeeManager()
 
@@ -183,6 +187,7 @@ class WorkPermit(HistoryMixin, models.Model):
     class Meta:
         indexes = [
             models.Index(fields=['doc_type', 'end_date']),
+            models.Index(fields=['end_date']),
         ]
 
 
@@ -314,3 +319,290 @@ class Task(models.Model):
 
 
 
+
+
+class ImportJob(models.Model):
+    """Фоновий імпорт працівників: пробний прогон з валідацією → підтвердження → запис."""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('validating', 'Validating'),
+        ('validated', 'Validated'),
+        ('confirmed', 'Confirmed'),
+        ('importing', 'Importing'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    RUNNING_STATUSES = ('pending', 'validating', 'confirmed', 'importing')
+
+    # Скільки помилок валідації зберігати у звіті (решта лише рахується)
+    MAX_STORED_ERRORS = 1000
+
+    file = models.FileField(upload_to='imports/', storage=private_storage)
+    file_name = models.CharField(max_length=255)
+    update_existing = models.BooleanField(default=False)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+
+    rows = models.PositiveIntegerField(default=0)
+    valid = models.PositiveIntegerField(default=0)
+    duplicates = models.PositiveIntegerField(default=0)
+    created_count = models.PositiveIntegerField(default=0)
+    updated_count = models.PositiveIntegerField(default=0)
+    unchanged_count = models.PositiveIntegerField(default=0)
+    errors_count = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    error_message = models.TextField(null=True, blank=True)
+
+    created_by = models.ForeignKey(
+        'users.User',
+        on_delete=models.CASCADE,
+        related_name='import_jobs'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.file_name} ({self.status})"
+
+    @property
+    def is_running(self):
+        return self.status in self.RUNNING_STATUSES
+
+    @property
+    def is_xlsx(self):
+        return self.file_name.lower().endswith('.xlsx')
+
+    @property
+    def spool_dir(self):
+        """Каталог з уже розібраними пачками (щоб не розбирати файл двічі)"""
+        from django.conf import settings
+        import os
+        return os.path.join(settings.PRIVATE_MEDIA_ROOT, 'imports', f'job_{self.pk}')
+
+    def cleanup_files(self):
+        import shutil
+        shutil.rmtree(self.spool_dir, ignore_errors=True)
+        if self.file:
+            self.file.delete(save=False)
+
+
+class DataVersion(models.Model):
+    """
+    Лічильник версії набору даних (співробітники і пов'язані записи).
+    Збільшується при кожній зміні, тому входить у ключ кешу експортів.
+    """
+    EMPLOYEES = 'employees'
+
+    name = models.CharField(max_length=64, unique=True)
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.version}"
+
+    @classmethod
+    def current(cls, name=EMPLOYEES):
+        return cls.objects.filter(name=name).values_list('version', flat=True).first() or 0
+
+    @classmethod
+    def bump(cls, name=EMPLOYEES):
+        if not cls.objects.filter(name=name).update(version=models.F('version') + 1):
+            cls.objects.get_or_create(name=name)
+            cls.objects.filter(name=name).update(version=models.F('version') + 1)
+
+
+class ExportArtifact(models.Model):
+    """Готовий файл експорту в кеші (PRIVATE_MEDIA_ROOT/export_cache/)"""
+    key = models.CharField(max_length=64, unique=True)
+    path = models.CharField(max_length=255)
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField(default=0)
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['last_used_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.filename} ({self.size} B)"
+
+
+class ReportArtifact(models.Model):
+    """Останній нічний рендер звіту-пресету (settings.REPORT_PRESETS) у конкретному форматі і мові"""
+    preset = models.CharField(max_length=64)
+    format = models.CharField(max_length=8)
+    language = models.CharField(max_length=8)
+    path = models.CharField(max_length=255)
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField(default=0)
+    rows = models.PositiveIntegerField(default=0)
+    data_version = models.PositiveBigIntegerField(default=0)
+    generated_at = models.DateTimeField()
+    # День рендеру: звіти з фільтрами відносно дати застарівають щодня
+    rendered_on = models.DateField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['preset', 'format', 'language'], name='unique_report_artifact'),
+        ]
+
+    def __str__(self):
+        return f"{self.preset} ({self.format}, {self.language})"
+
+    @property
+    def is_outdated(self):
+        """Дані змінились після рендеру або звіт відносно дати зроблено не сьогодні"""
+        from apps.main.reports import is_report_outdated
+
+        return is_report_outdated(self)
+
+
+class ExpiryEntry(models.Model):
+    """
+    Єдиний календар дат закінчення: по рядку на кожну дату з документів, дозволів,
+    Sanepid, періодів роботи і статусу студента. Підтримується при збереженні
+    (apps.main.expiry), тож будь-який запит "що закінчується з X по Y" —
+    один range scan по частковому індексу активних співробітників.
+    """
+    SOURCE_CHOICES = [
+        ('document', 'Document'),
+        ('work_permit', 'Work permit'),
+        ('sanepid', 'Sanepid'),
+        ('employment_period', 'Employment period'),
+        ('student', 'Student status'),
+    ]
+
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='expiry_entries')
+    source = models.CharField(max_length=32, choices=SOURCE_CHOICES)
+    source_id = models.PositiveBigIntegerField()
+    expires_on = models.DateField()
+    label = models.CharField(max_length=128, blank=True, default='')
+    # Копія статусу співробітника — для часткового індексу (звільнені в календар не потрапляють)
+    employee_dismissed = models.BooleanField(default=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'source_id'], name='unique_expiry_source'),
+        ]
+        indexes = [
+            models.Index(
+                fields=['expires_on', 'source'],
+                name='expiry_active_idx',
+                condition=models.Q(employee_dismissed=False),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.source} #{self.source_id}: {self.expires_on}"
+
+
+class JobRun(models.Model):
+    """
+    Запуск періодичної задачі (apps.main.jobs.single_run) у конкретному слоті
+    розкладу. Один рядок на (name, slot): повторний запуск того ж слоту
+    пропускається і лише збільшує лічильник skipped.
+    """
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ]
+
+    name = models.CharField(max_length=255)
+    slot = models.CharField(max_length=64)
+    run_id = models.CharField(max_length=255, blank=True, default='')
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=RUNNING)
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField(null=True, blank=True)
+    duration = models.FloatField(null=True, blank=True)
+    result = models.TextField(blank=True, default='')
+    error = models.TextField(blank=True, default='')
+    skipped = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-started_at']
+        constraints = [
+            models.UniqueConstraint(fields=['name', 'slot'], name='unique_job_run_slot'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} [{self.slot}] {self.status}"
+
+
+class TaskExecution(models.Model):
+    """
+    Одне виконання задачі Celery (apps.main.instrumentation): очікування в
+    черзі, час роботи, приріст пікової пам'яті воркера і кількість рядків,
+    яких торкнулися SQL-запити задачі. Повторна спроба — окремий рядок.
+    """
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    RETRY = 'retry'
+    STATE_CHOICES = [
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+        (RETRY, 'Retry'),
+    ]
+
+    task_id = models.CharField(max_length=255)
+    name = models.CharField(max_length=255)
+    queue = models.CharField(max_length=64, blank=True, default='')
+    state = models.CharField(max_length=16, choices=STATE_CHOICES)
+    retries = models.PositiveIntegerField(default=0)
+    started_at = models.DateTimeField()
+    queue_wait = models.FloatField(null=True, blank=True)
+    runtime = models.FloatField()
+    # Приріст ru_maxrss процесу воркера за час задачі, КБ
+    rss_delta = models.BigIntegerField(default=0)
+    rows = models.BigIntegerField(default=0)
+    queries = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, default='')
+
+    class Meta:
+        ordering = ['-started_at']
+        indexes = [
+            models.Index(fields=['name', 'started_at'], name='task_execution_name_idx'),
+            models.Index(fields=['started_at'], name='task_execution_started_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} {self.state} {self.runtime:.2f}s"
+
+
+class DatabaseBackup(models.Model):
+    """
+    Резервна копія БД (apps.main.backups): каталог pg_dump -F d у
+    settings.BACKUP_DIR з файлом контрольних сум SHA256SUMS.
+    """
+    RUNNING = 'running'
+    VERIFIED = 'verified'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (RUNNING, 'Running'),
+        (VERIFIED, 'Verified'),
+        (FAILED, 'Failed'),
+    ]
+
+    name = models.CharField(max_length=64, unique=True)
+    path = models.CharField(max_length=255)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=RUNNING)
+    jobs = models.PositiveSmallIntegerField(default=1)
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField(null=True, blank=True)
+    dump_duration = models.FloatField(null=True, blank=True)
+    verify_duration = models.FloatField(null=True, blank=True)
+    size = models.PositiveBigIntegerField(default=0)
+    files = models.PositiveIntegerField(default=0)
+    # Кількість записів у TOC за pg_restore --list
+    toc_entries = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, default='')
+
+    class Meta:
+        ordering = ['-started_at']
+
+    def __str__(self):
+        return f"{self.name} {self.status} ({self.size} B)"
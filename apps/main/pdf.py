@@ -0,0 +1,564 @@
+"""
+Генерація PDF зі списком співробітників.
+
+Таблиця будується потоково: queryset читається пачками по chunk_size
+(keyset-пагінація по id, prefetch лише для поточної пачки), кожна пачка —
+окремий Table, а doc.build() отримує flowables ліниво. Тому пікова пам'ять
+не залежить від кількості співробітників.
+
+Великі експорти можна рендерити паралельно: список ділиться на діапазони id,
+кожен діапазон рендериться в окремий PDF (Celery chord або пул процесів),
+частини зливаються в один файл, а номери сторінок проставляються вже після злиття.
+"""
+import logging
+import time
+from contextlib import contextmanager
+
+from django.utils import timezone
+
+from apps.main.filters import EmployeeMultiFilter
+from apps.main.models import Employee
+
+
+logger = logging.getLogger(__name__)
+
+# Рядків у одному Table (і в одному запиті з prefetch)
+PDF_CHUNK_SIZE = 500
+
+# Менші частини не варті накладних витрат на окремий процес і злиття
+PDF_MIN_PART_ROWS = 2000
+
+PDF_PREFETCH = (
+    'employment_period',
+    'documents',
+    'work_permits',
+    'contracts',
+    'contacts',
+)
+
+EMPLOYEE_STATUS_MAP = {
+    'uk': {
+        "pracujący": "'Працевлаштовані'",
+        "zwolniony": "'Звільнені'",
+        "umowa_o_prace": "'Трудовий договір'",
+        "zmiana_stanowiska": "'Зміна посади'",
+        "student": "'Студенти'",
+        "pit": "'PIT-2'",
+    },
+    'pl': {
+        "pracujący": "'Pracujący'",
+        "zwolniony": "'Zwolniony'",
+        "umowa_o_prace": "'Umowa o prace'",
+        "zmiana_stanowiska": "'Zmiana_stanowiska'",
+        "student": "'Studenci'",
+        "pit": "'PIT-2'",
+    }
+}
+
+TRANSLATIONS = {
+    'uk': {
+        'title': 'Список співробітників ',
+        'date_label': 'Дата формування',
+        'total_label': 'Всього співробітників',
+        'headers': ['№', 'Прізвище', "Ім'я", 'Вік', 'Місце роботи', 'Статус',
+                    'PESEL', 'Студент', 'Період роботи', 'Документи',
+                    'Дозвіл на роботу', 'Контракт', 'Контакти'],
+        'yes': 'Так',
+        'no': 'Ні',
+        'status_map': {
+            'Pracujący': 'Працевлаштований',
+            'Zwolniony': 'Звільнений',
+            'Umowa o prace': 'Трудовий договір',
+            'Zmiana stanowiska': 'Зміна посади'
+        }
+    },
+    'pl': {
+        'title': 'Lista pracowników ',
+        'date_label': 'Data utworzenia',
+        'total_label': 'Łącznie pracowników',
+        'headers': ['№', 'Nazwisko', 'Imię', 'Wiek', 'Miejsce pracy', 'Status',
+                    'PESEL', 'Student', 'Okres pracy', 'Dokumenty',
+                    'Zezwolenie na pracę', 'Umowa', 'Kontakty'],
+        'yes': 'Tak',
+        'no': 'Nie',
+        'status_map': {
+            'Pracujący': 'Pracujący',
+            'Zwolniony': 'Zwolniony',
+            'Umowa o prace': 'Umowa o prace',
+            'Zmiana stanowiska': 'Zmiana stanowiska'
+        }
+    }
+}
+
+
+class FlowableStream(list):
+    """
+    list для doc.build(), який дочитує flowables з генератора по мірі споживання.
+
+    build() і handle_flowable() звертаються до списку лише через len(),
+    flowables[i] та вставки/видалення на початку, а len() викликається перед
+    кожним кроком — тут і поповнюємо буфер.
+    """
+
+    def __init__(self, flowables, prefetch=2):
+        super().__init__()
+        self._source = iter(flowables)
+        self._prefetch = prefetch
+
+    def __len__(self):
+        while self._source is not None and super().__len__() < self._prefetch:
+            try:
+                self.append(next(self._source))
+            except StopIteration:
+                self._source = None
+        return super().__len__()
+
+
+def employees_pdf_queryset(filter_params, using=None):
+    """
+    Відфільтрований queryset без prefetch (prefetch робиться по пачках).
+    using — аліас БД з settings.DATABASES (бенчмарк на окремій базі)
+    """
+    filterset = EmployeeMultiFilter(filter_params, queryset=Employee.objects.using(using))
+    # Сортуємо за ID для збереження порядку з бази
+    return filterset.qs.order_by('id')
+
+
+def iter_employee_chunks(queryset, chunk_size=PDF_CHUNK_SIZE):
+    """
+    Пачки співробітників з prefetch лише для поточної пачки.
+    chunk_size=None — одна пачка з усіма співробітниками (без потокової обробки).
+    """
+    if not chunk_size:
+        yield list(queryset.prefetch_related(*PDF_PREFETCH))
+        return
+
+    last_id = 0
+    while True:
+        chunk = list(queryset.filter(id__gt=last_id).prefetch_related(*PDF_PREFETCH)[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last_id = chunk[-1].id
+
+
+def split_employee_ranges(filter_params, parallelism, min_part_rows=None, using=None):
+    """
+    Ділить відфільтрованих співробітників на не більше ніж parallelism
+    діапазонів id однакового розміру.
+
+    Повертає (total, [(first_id, last_id, start_index), ...]); start_index —
+    номер першого рядка діапазону в таблиці (наскрізна нумерація).
+    """
+    ids = list(employees_pdf_queryset(filter_params, using).values_list('id', flat=True))
+    total = len(ids)
+    if not total:
+        return 0, []
+
+    parts = max(1, min(parallelism, total // (min_part_rows or PDF_MIN_PART_ROWS)))
+    size = -(-total // parts)
+    return total, [
+        (ids[start], ids[min(start + size, total) - 1], start + 1)
+        for start in range(0, total, size)
+    ]
+
+
+class RenderContext:
+    """
+    Ресурси рендерингу, які не залежать від конкретного експорту: шрифти,
+    стилі, ширини колонок, стиль таблиці. Створюються один раз на процес
+    (воркер Celery прогріває їх на worker_process_init) і перевикористовуються.
+    """
+
+    def __init__(self):
+        from reportlab.lib import colors
+        from reportlab.lib.pagesizes import A4, landscape
+        from reportlab.platypus import TableStyle
+        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+        from reportlab.lib.units import cm
+        from reportlab.lib.enums import TA_CENTER
+        from reportlab.pdfbase import pdfmetrics
+        from reportlab.pdfbase.ttfonts import TTFont
+
+        # Реєструємо шрифт DejaVu Sans для підтримки кирилиці
+        try:
+            pdfmetrics.registerFont(TTFont('DejaVuSans', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'))
+            pdfmetrics.registerFont(TTFont('DejaVuSans-Bold', '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf'))
+        except Exception as e:
+            logger.warning(f"Could not register DejaVu fonts: {e}")
+
+        self.pagesize = landscape(A4)
+        self.margin = 1*cm
+
+        # Стилі
+        styles = getSampleStyleSheet()
+        self.title_style = ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Heading1'],
+            fontName='DejaVuSans-Bold',
+            fontSize=14,
+            textColor=colors.HexColor('#333333'),
+            alignment=TA_CENTER,
+            spaceAfter=10
+        )
+        self.meta_style = ParagraphStyle(
+            'Meta',
+            parent=styles['Normal'],
+            fontName='DejaVuSans',
+            fontSize=7,
+            textColor=colors.HexColor('#666666'),
+            alignment=TA_CENTER
+        )
+        # Стиль для тексту в комірках з переносом
+        self.cell_style = ParagraphStyle(
+            'CellText',
+            parent=styles['Normal'],
+            fontName='DejaVuSans',
+            fontSize=5,
+            leading=6,
+            wordWrap='CJK'
+        )
+
+        self.col_widths = [
+            0.5*cm,   # №
+            1.9*cm,   # Прізвище
+            1.5*cm,   # Ім'я
+            0.5*cm,   # Вік
+            1.7*cm,   # Місце роботи
+            2.4*cm,   # Статус
+            1.7*cm,   # PESEL
+            1.0*cm,   # Студент
+            2.2*cm,   # Період роботи
+            2.1*cm,   # Документи
+            3.7*cm,   # Дозвіл на роботу
+            1.3*cm,   # Контракт
+            2.2*cm    # Контакти
+        ]
+        self.spacer_height = 0.3*cm
+
+        # Стиль таблиці (заголовок — перший рядок кожної пачки, повторюється на кожній сторінці)
+        self.table_style = TableStyle([
+            # Заголовок
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4A90E2')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, 0), 'LEFT'),
+            ('FONTNAME', (0, 0), (-1, 0), 'DejaVuSans-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 5.5),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 3),
+            ('TOPPADDING', (0, 0), (-1, 0), 3),
+            ('LEFTPADDING', (0, 0), (-1, 0), 2),
+            ('RIGHTPADDING', (0, 0), (-1, 0), 2),
+
+            # Дані
+            ('FONTNAME', (0, 1), (-1, -1), 'DejaVuSans'),
+            ('FONTSIZE', (0, 1), (-1, -1), 5),
+            ('ALIGN', (0, 1), (-1, -1), 'LEFT'),
+            ('VALIGN', (0, 1), (-1, -1), 'TOP'),
+            ('TOPPADDING', (0, 1), (-1, -1), 1.5),
+            ('BOTTOMPADDING', (0, 1), (-1, -1), 1.5),
+            ('LEFTPADDING', (0, 1), (-1, -1), 2),
+            ('RIGHTPADDING', (0, 1), (-1, -1), 2),
+            ('WORDWRAP', (0, 1), (-1, -1), True),
+
+            # Сітка
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+
+            # Чергування кольорів рядків
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f9f9f9')]),
+        ])
+
+    def translations(self, language):
+        return TRANSLATIONS.get(language, TRANSLATIONS['uk'])
+
+
+_render_context = None
+
+
+def get_render_context():
+    """RenderContext поточного процесу (створюється при першому зверненні)"""
+    global _render_context
+    if _render_context is None:
+        _render_context = RenderContext()
+    return _render_context
+
+
+def reset_render_context():
+    """Скидає кеш — для вимірювання «холодного» старту"""
+    global _render_context
+    _render_context = None
+
+
+class StageTimings(dict):
+    """Сумарний час по етапах генерації: {"setup": ..., "query": ..., "layout": ..., "build": ...}"""
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self[name] = self.get(name, 0.0) + time.perf_counter() - started
+
+    def __str__(self):
+        return ", ".join(f"{name} {seconds:.3f}s" for name, seconds in self.items())
+
+
+def draw_page_number(canvas, number):
+    """Номер сторінки в правому нижньому куті (однаково для звичайного і злитого PDF)"""
+    from reportlab.lib.units import cm
+
+    canvas.saveState()
+    canvas.setFont('DejaVuSans', 6)
+    canvas.drawRightString(canvas._pagesize[0] - 1*cm, 0.5*cm, str(number))
+    canvas.restoreState()
+
+
+def filter_title(filter_params, language):
+    employees_filter = filter_params.get('status', '')
+
+    if isinstance(employees_filter, list):
+        return ", ".join(
+            EMPLOYEE_STATUS_MAP.get(language, {}).get(item, item)
+            for item in employees_filter
+        )
+    return EMPLOYEE_STATUS_MAP.get(language, {}).get(employees_filter, '')
+
+
+def build_employees_pdf(filter_params, output, chunk_size=PDF_CHUNK_SIZE,
+                        id_range=None, start_index=1, total=None, page_numbers=True, timings=None,
+                        using=None):
+    """
+    Пише PDF у output (шлях або файловий об'єкт). Повертає кількість співробітників.
+
+    id_range=(first_id, last_id) — рендер лише частини списку для паралельної
+    генерації: нумерація рядків починається зі start_index, заголовок документа
+    є лише у першій частині, а номери сторінок (page_numbers=False) проставляє merge_pdf_parts.
+
+    timings (StageTimings) заповнюється часом етапів: setup (RenderContext),
+    query (запити до БД), layout (рядки та Table-и), build (верстка reportlab і запис).
+
+    using — аліас БД, з якої читаються співробітники (за замовчуванням default).
+    """
+    from reportlab.platypus import SimpleDocTemplate, Table, Paragraph, Spacer
+
+    if timings is None:
+        timings = StageTimings()
+
+    with timings.stage("setup"):
+        ctx = get_render_context()
+
+    # Визначаємо мову з параметрів (за замовчуванням українська)
+    language = filter_params.get('language', 'uk')
+    if isinstance(language, list):
+        language = language[0]
+
+    with timings.stage("query"):
+        employees = employees_pdf_queryset(filter_params, using)
+        if total is None:
+            total = employees.count()
+        if id_range:
+            employees = employees.filter(id__gte=id_range[0], id__lte=id_range[1])
+
+    logger.info(f"Generating PDF for {total} employees (from row {start_index})")
+
+    pdf_doc = SimpleDocTemplate(
+        output,
+        pagesize=ctx.pagesize,
+        rightMargin=ctx.margin,
+        leftMargin=ctx.margin,
+        topMargin=ctx.margin,
+        bottomMargin=ctx.margin
+    )
+
+    # Вибираємо переклади для поточної мови
+    t = ctx.translations(language)
+    status_map = t['status_map']
+    cell_style = ctx.cell_style
+
+    # Функція для обрізання тексту
+    def truncate(text, max_len):
+        return text[:max_len] + '...' if len(text) > max_len else text
+
+    # Функція для створення Paragraph (для переносу слів)
+    def make_paragraph(text):
+        if not text:
+            return ''
+        return Paragraph(text.replace('\n', '<br/>'), cell_style)
+
+    def employee_row(idx, emp):
+        # Період роботи (короткий формат дат)
+        periods = []
+        for period in emp.employment_period.all():
+            start = period.start_date.strftime('%d.%m.%y') if period.start_date else ''
+            end = period.end_date.strftime('%d.%m.%y') if period.end_date else ''
+            if start or end:
+                periods.append(f"{start}-{end}")
+        period_text = '\n'.join(periods[:2]) if periods else ''  # Макс 2 періоди
+
+        # Документи (скорочено)
+        docs = []
+        for doc in emp.documents.all():
+            doc_text = doc.doc_type or ''
+            if doc.valid_until:
+                doc_text += f"({doc.valid_until.strftime('%d.%m.%y')})"
+            if doc_text:
+                docs.append(truncate(doc_text, 20))
+        docs_text = '\n'.join(docs[:2]) if docs else ''  # Макс 2 документи
+
+        # Дозволи (з переносом слів через Paragraph)
+        permits = []
+        for permit in emp.work_permits.all():
+            permit_text = permit.doc_type or ''
+            if permit.end_date:
+                permit_text += f" ({permit.end_date.strftime('%d.%m.%y')})"
+            if permit_text:
+                permits.append(permit_text)
+        permits_text = '<br/>'.join(permits[:3]) if permits else ''  # Макс 3 дозволи
+
+        # Контракти (скорочено)
+        contracts = []
+        for contract in emp.contracts.all():
+            if contract.contract_type:
+                contracts.append(truncate(contract.contract_type, 20))
+        contracts_text = '\n'.join(contracts[:2]) if contracts else ''  # Макс 2 контракти
+
+        # Контакти (з переносом слів)
+        contacts = []
+        for contact in emp.contacts.all():
+            if contact.value:
+                contacts.append(contact.value)
+        contacts_text = '<br/>'.join(contacts[:2]) if contacts else ''  # Макс 2 контакти
+
+        return [
+            str(idx),
+            truncate(emp.last_name or '', 12),
+            truncate(emp.first_name or '', 10),
+            str(emp.age) if emp.age else '',
+            make_paragraph(emp.workplace or ''),  # Paragraph для переносу
+            make_paragraph(status_map.get(emp.working_status, emp.working_status or '')),  # Paragraph для переносу
+            emp.pesel or '',
+            t['yes'] if emp.is_student else t['no'],
+            period_text,
+            docs_text,
+            make_paragraph(permits_text),  # Paragraph для переносу
+            contracts_text,
+            make_paragraph(contacts_text)  # Paragraph для переносу
+        ]
+
+    def chunks():
+        chunk_iter = iter_employee_chunks(employees, chunk_size)
+        while True:
+            with timings.stage("query"):
+                chunk = next(chunk_iter, None)
+            if chunk is None:
+                return
+            yield chunk
+
+    def flowables():
+        # Заголовок і мета-інформація (лише на початку документа)
+        if start_index == 1:
+            yield Paragraph(t['title'] + filter_title(filter_params, language), ctx.title_style)
+            meta_text = f"{t['date_label']}: {timezone.now().strftime('%d.%m.%Y %H:%M')} | {t['total_label']}: {total}"
+            yield Paragraph(meta_text, ctx.meta_style)
+            yield Spacer(1, ctx.spacer_height)
+
+        # Одна таблиця на пачку: рядки попередньої пачки вже намальовані й звільнені
+        idx = start_index - 1
+        for chunk in chunks():
+            with timings.stage("layout"):
+                data = [t['headers']]
+                for emp in chunk:
+                    idx += 1
+                    data.append(employee_row(idx, emp))
+
+                table = Table(data, colWidths=ctx.col_widths, repeatRows=1)
+                table.setStyle(ctx.table_style)
+            yield table
+
+    def on_page(canvas, doc):
+        if page_numbers:
+            draw_page_number(canvas, doc.page)
+
+    # Генеруємо PDF; flowables() виконується всередині build(), тому її час віднімається
+    before = timings.get("query", 0.0) + timings.get("layout", 0.0)
+    started = time.perf_counter()
+    pdf_doc.build(FlowableStream(flowables()), onFirstPage=on_page, onLaterPages=on_page)
+    elapsed = time.perf_counter() - started
+    timings["build"] = timings.get("build", 0.0) + elapsed - (
+        timings.get("query", 0.0) + timings.get("layout", 0.0) - before
+    )
+
+    logger.info(f"PDF stages: {timings}")
+
+    return total
+
+
+def merge_pdf_parts(part_paths, output):
+    """
+    Зливає частини в один PDF і проставляє наскрізні номери сторінок.
+    Повертає кількість сторінок.
+    """
+    from io import BytesIO
+    from reportlab.pdfgen.canvas import Canvas
+    from pypdf import PdfReader, PdfWriter
+
+    writer = PdfWriter()
+    for path in part_paths:
+        writer.append(path)
+
+    # Окремий PDF лише з номерами сторінок, який накладається на злиті сторінки
+    numbers = BytesIO()
+    canvas = Canvas(numbers, pagesize=get_render_context().pagesize)
+    for number in range(1, len(writer.pages) + 1):
+        draw_page_number(canvas, number)
+        canvas.showPage()
+    canvas.save()
+
+    for page, number_page in zip(writer.pages, PdfReader(numbers).pages):
+        page.merge_page(number_page)
+        # merge_page розпаковує вміст сторінки — без стиснення файл роздувається ~в 8 разів
+        page.compress_content_streams()
+
+    writer.write(output)
+    return len(writer.pages)
+
+
+def _render_part(args):
+    filter_params, path, (first_id, last_id, start_index), total, chunk_size, using = args
+    build_employees_pdf(
+        filter_params, path, chunk_size=chunk_size,
+        id_range=(first_id, last_id), start_index=start_index, total=total, page_numbers=False,
+        using=using,
+    )
+    return path
+
+
+def build_employees_pdf_parallel(filter_params, output, parallelism, chunk_size=PDF_CHUNK_SIZE, using=None):
+    """
+    Рендер частин у пулі процесів і злиття. Для запуску поза Celery (команди,
+    бенчмарк): процеси prefork-воркера Celery — демонічні й не можуть мати
+    дочірніх процесів, тому там ті ж частини рендеряться через chord.
+    """
+    import multiprocessing
+    import os
+    import tempfile
+    from concurrent.futures import ProcessPoolExecutor
+    from django.db import connections
+
+    total, ranges = split_employee_ranges(filter_params, parallelism, using=using)
+    if len(ranges) <= 1:
+        return build_employees_pdf(filter_params, output, chunk_size=chunk_size, total=total, using=using)
+
+    # Дочірні процеси відкривають власні з'єднання з БД
+    connections.close_all()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        jobs = [
+            (filter_params, os.path.join(tmp, f"part_{n:03d}.pdf"), id_range, total, chunk_size, using)
+            for n, id_range in enumerate(ranges)
+        ]
+        with ProcessPoolExecutor(len(jobs), mp_context=multiprocessing.get_context("fork")) as pool:
+            paths = list(pool.map(_render_part, jobs))
+        merge_pdf_parts(paths, output)
+
+    return total
@@ -0,0 +1,92 @@
+"""
+Метрики черг Celery: глибина (скільки повідомлень чекає) і затримка
+(від публікації задачі до її старту на воркері).
+
+Час публікації додається заголовком published_at (before_task_publish у
+процесі, що ставить задачу), затримка рахується в task_prerun на воркері і
+зберігається в спільному кеші: остання, ковзне середнє і максимум по черзі.
+"""
+import time
+
+from celery.signals import before_task_publish, task_prerun
+from django.conf import settings
+from django.core.cache import cache
+
+
+LATENCY_KEY = "celery:latency:{queue}"
+LATENCY_TIMEOUT = 24 * 60 * 60
+# Вага нового значення в ковзному середньому
+LATENCY_SMOOTHING = 0.2
+
+
+@before_task_publish.connect(dispatch_uid="queues_stamp_published_at")
+def stamp_published_at(headers=None, **kwargs):
+    if headers is not None:
+        headers.setdefault("published_at", time.time())
+
+
+def request_queue(request):
+    return ((getattr(request, "delivery_info", None) or {}).get("routing_key")
+            or settings.CELERY_TASK_DEFAULT_QUEUE)
+
+
+def request_wait(request):
+    """Секунди від публікації задачі до цього моменту, None без заголовка"""
+    published_at = getattr(request, "published_at", None)
+    if not published_at:
+        return None
+    return max(time.time() - published_at, 0.0)
+
+
+@task_prerun.connect(dispatch_uid="queues_record_latency")
+def record_latency(task=None, **kwargs):
+    request = task.request if task is not None else None
+    wait = request_wait(request)
+    if wait is not None:
+        record_queue_latency(request_queue(request), wait)
+
+
+def record_queue_latency(queue, seconds):
+    key = LATENCY_KEY.format(queue=queue)
+    stats = cache.get(key)
+    if stats is None:
+        stats = {"last": seconds, "avg": seconds, "max": seconds, "count": 1}
+    else:
+        stats = {
+            "last": seconds,
+            "avg": stats["avg"] + LATENCY_SMOOTHING * (seconds - stats["avg"]),
+            "max": max(stats["max"], seconds),
+            "count": stats["count"] + 1,
+        }
+    stats["updated_at"] = time.time()
+    cache.set(key, stats, LATENCY_TIMEOUT)
+
+
+def queue_latency(queue):
+    return cache.get(LATENCY_KEY.format(queue=queue))
+
+
+def queue_depths(app=None):
+    """{черга: кількість повідомлень, що чекають} через брокер (пасивний declare)"""
+    if app is None:
+        from core.celery import app
+
+    depths = {}
+    with app.connection_for_read() as connection:
+        channel = connection.default_channel
+        for queue in settings.WORKER_QUEUES:
+            try:
+                depths[queue] = channel.queue_declare(queue=queue, passive=True).message_count
+            except Exception:
+                # Черга ще не створена — в ній нічого не чекає
+                depths[queue] = 0
+    return depths
+
+
+def queue_stats(app=None):
+    """[{queue, depth, latency}] для всіх черг з settings.WORKER_QUEUES"""
+    depths = queue_depths(app)
+    return [
+        {"queue": queue, "depth": depths.get(queue, 0), "latency": queue_latency(queue)}
+        for queue in settings.WORKER_QUEUES
+    ]
@@ -0,0 +1,97 @@
+"""
+Звіти-пресети (settings.REPORT_PRESETS), які Celery beat рендерить уночі.
+
+Останній рендер кожного пресету зберігається як ReportArtifact і показується
+на сторінці "Звіти". Той самий файл кладеться в кеш експортів, тому ранковий
+експорт зі списку з такими ж фільтрами теж віддається одразу.
+Якщо з минулого рендеру дані не змінились (DataVersion), звіт не перерендерюється.
+Пресети з фільтрами відносно сьогоднішньої дати (термін дозволу спливає за N
+днів) додатково перерендерюються, якщо останній рендер був не сьогодні.
+"""
+import logging
+import os
+from datetime import date
+
+from django.conf import settings
+from django.utils import timezone
+
+from apps.main.export_cache import export_cache_key, is_date_relative, store_export
+from apps.main.exports import build_employees_xlsx
+from apps.main.models import DataVersion, ReportArtifact
+from apps.main.pdf import build_employees_pdf
+
+
+logger = logging.getLogger(__name__)
+
+REPORTS_DIR = 'reports'
+
+REPORT_BUILDERS = {
+    'pdf': build_employees_pdf,
+    'xlsx': build_employees_xlsx,
+}
+
+
+def report_filter_params(preset, language):
+    params = {name: list(values) for name, values in preset['filters'].items()}
+    params['language'] = language
+    return params
+
+
+def report_full_path(artifact):
+    return os.path.join(settings.PRIVATE_MEDIA_ROOT, artifact.path)
+
+
+def is_report_outdated(artifact, version=None):
+    """Дані змінились після рендеру або рендер відносно дати зроблено не сьогодні"""
+    if artifact.data_version != (DataVersion.current() if version is None else version):
+        return True
+    preset = settings.REPORT_PRESETS.get(artifact.preset)
+    return (preset is not None and is_date_relative(preset['filters'])
+            and artifact.rendered_on != date.today())
+
+
+def render_report(name, fmt, language, force=False):
+    """Рендерить пресет у файл і оновлює його ReportArtifact. Повертає ReportArtifact"""
+    preset = settings.REPORT_PRESETS[name]
+    version = DataVersion.current()
+
+    artifact = ReportArtifact.objects.filter(preset=name, format=fmt, language=language).first()
+    if (artifact and not force and not is_report_outdated(artifact, version)
+            and os.path.exists(report_full_path(artifact))):
+        logger.info(f"Report {name} ({fmt}, {language}) is up to date")
+        return artifact
+
+    params = report_filter_params(preset, language)
+    relative_path = os.path.join(REPORTS_DIR, f"{name}_{language}.{fmt}")
+    path = os.path.join(settings.PRIVATE_MEDIA_ROOT, relative_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    # Спочатку у .part, щоб сторінка звітів ніколи не віддала недописаний файл
+    rows = REPORT_BUILDERS[fmt](params, path + '.part')
+    os.replace(path + '.part', path)
+
+    generated_at = timezone.now()
+    filename = f"{name}_{language}_{generated_at.strftime('%Y%m%d')}.{fmt}"
+
+    artifact, _ = ReportArtifact.objects.update_or_create(
+        preset=name,
+        format=fmt,
+        language=language,
+        defaults={
+            'path': relative_path,
+            'filename': filename,
+            'size': os.path.getsize(path),
+            'rows': rows,
+            'data_version': version,
+            'generated_at': generated_at,
+            'rendered_on': date.today(),
+        },
+    )
+
+    try:
+        store_export(export_cache_key(params, fmt, version), path, filename)
+    except Exception as e:
+        logger.warning(f"Could not cache report {name} ({fmt}, {language}): {e}")
+
+    logger.info(f"Report {name} ({fmt}, {language}) rendered: {rows} rows, {artifact.size} bytes")
+    return artifact
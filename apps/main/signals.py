@@ -1,11 +1,25 @@
-from django.utils.timezone import now
-from dateutil.relativedelta import relativedelta
-from django.db.models.signals import post_save, post_delete
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
 from django.contrib.contenttypes.models import ContentType
-from django.core.cache import cache
-from .models import Employee, History, Document, WorkPermit
+from .models import (
+    Employee, History, Document, WorkPermit, EmploymentPeriod, Contract, Contact, DataVersion, Task,
+)
+from .employee_cache import invalidate_employee_list
+from .expiry import (
+    EXPIRY_SOURCES,
+    DISMISSED_STATUS,
+    sync_expiry_entry,
+    delete_expiry_entry,
+    set_employees_dismissed,
+)
+from apps.notification.events import notifications_changed, publish_task_changed
 from apps.notification.models import Notification
+from apps.notification.utils import (
+    sync_document_notification,
+    sync_work_permit_notification,
+    sync_employee_notifications,
+)
 from .utils import get_change_user
 
 
@@ -40,37 +54,100 @@ def log_post_delete(sender, instance, **kwargs):
 
 @receiver([post_save, post_delete], sender=Employee)
 def invalidate_employee_cache(sender, instance, **kwargs):
-    cache.clear()
+    invalidate_employee_list()
 
 
-@receiver([post_save], sender=Employee)
-def delete_notification_working_status(sender, instance, **kwargs):
-    if instance.working_status == "Zwolniony":
-        notifications = Notification.objects.filter(employee=instance)
-        notifications.delete()
+# Моделі, з яких складаються експорти: будь-яка зміна робить кешовані файли застарілими
+EXPORTED_MODELS = (Employee, EmploymentPeriod, Document, WorkPermit, Contract, Contact)
 
 
-@receiver(post_save, sender=Document)
-def delete_notifications_if_document_valid(sender, instance, **kwargs):
-    today = now().date()
-    limit_date = today + relativedelta(months=2)
+def bump_data_version(sender, **kwargs):
+    DataVersion.bump()
+
+
+for _model in EXPORTED_MODELS:
+    post_save.connect(bump_data_version, sender=_model, dispatch_uid=f"bump_data_version_{_model.__name__}")
+    post_delete.connect(bump_data_version, sender=_model, dispatch_uid=f"bump_data_version_delete_{_model.__name__}")
+
 
-    if not instance.valid_until or instance.employee.working_status == "Zwolniony":
-        Notification.objects.filter(document=instance).delete()
+# Сповіщення про закінчення документів оновлюються одразу після коміту зміни
+# (один upsert або delete на об'єкт), а не лише нічною перевіркою
+
+@receiver(post_save, sender=Employee)
+def sync_notifications_on_employee_save(sender, instance, created, **kwargs):
+    # У нового співробітника ще немає документів — їх сповіщення прийдуть з їх власних save()
+    if created:
         return
+    employee_id = instance.pk
+    transaction.on_commit(lambda: sync_employee_notifications(employee_id))
 
-    if instance.valid_until.date() > limit_date:
-        Notification.objects.filter(document=instance).delete()
+
+@receiver(post_save, sender=Document)
+def sync_notification_on_document_save(sender, instance, **kwargs):
+    document_id = instance.pk
+    transaction.on_commit(lambda: sync_document_notification(document_id))
 
 
 @receiver(post_save, sender=WorkPermit)
-def delete_notifications_if_permit_valid(sender, instance, **kwargs):
-    today = now().date()
-    limit_date = today + relativedelta(months=2)
+def sync_notification_on_permit_save(sender, instance, **kwargs):
+    permit_id = instance.pk
+    transaction.on_commit(lambda: sync_work_permit_notification(permit_id))
+
+
+# Календар дат закінчення (ExpiryEntry) оновлюється в тій самій транзакції, що й джерело
+
+def sync_expiry_on_save(sender, instance, **kwargs):
+    sync_expiry_entry(instance)
+    if sender is Employee:
+        set_employees_dismissed([instance.pk], instance.working_status == DISMISSED_STATUS)
+
+
+def delete_expiry_on_delete(sender, instance, **kwargs):
+    if sender is not Employee:
+        delete_expiry_entry(instance)
+
+
+for _model in EXPIRY_SOURCES:
+    post_save.connect(sync_expiry_on_save, sender=_model, dispatch_uid=f"sync_expiry_{_model.__name__}")
+    post_delete.connect(delete_expiry_on_delete, sender=_model, dispatch_uid=f"delete_expiry_{_model.__name__}")
+
+
+# Лічильники бейджів (apps.main.badges) скидаються після коміту зміни, а нові
+# значення розсилаються відкритим вкладкам (apps.notification.events).
+# Масові зміни сповіщень (bulk_create, queryset.delete()) повідомляють самі;
+# каскадне видалення разом з документом чи співробітником ловиться тут.
+
+def invalidate_notification_badge_on_change(sender, **kwargs):
+    notifications_changed()
+
+
+@receiver(pre_save, sender=Task)
+def remember_task_assignment(sender, instance, **kwargs):
+    # Попередній виконавець теж має отримати новий лічильник
+    previous = None
+    if instance.pk:
+        previous = sender.objects.filter(pk=instance.pk).values("assigned_to_id", "status").first()
+    instance._previous_assignment = previous or {}
+
+
+@receiver(post_save, sender=Task)
+def publish_task_on_save(sender, instance, created, **kwargs):
+    previous = getattr(instance, "_previous_assignment", {})
+    transaction.on_commit(lambda: publish_task_changed(
+        instance,
+        "created" if created else "updated",
+        previous_assignee_id=previous.get("assigned_to_id"),
+        previous_status=previous.get("status"),
+    ))
+
+
+@receiver(post_delete, sender=Task)
+def publish_task_on_delete(sender, instance, **kwargs):
+    transaction.on_commit(lambda: publish_task_changed(instance, "deleted"))
 
-    if not instance.end_date or instance.employee.working_status == "Zwolniony":
-        Notification.objects.filter(work_permit=instance).delete()
-        return
 
-    if instance.end_date.date() > limit_date:
-        Notification.objects.filter(work_permit=instance).delete()
+post_save.connect(invalidate_notification_badge_on_change, sender=Notification,
+                  dispatch_uid="badge_notification_save")
+for _model in (Employee, Document, WorkPermit):
+    post_delete.connect(invalidate_notification_badge_on_change, sender=_model,
+                        dispatch_uid=f"badge_notification_cascade_{_model.__name__}")
@@ -1,400 +1,425 @@
-from datetime import date, datetime
+from datetime import date, timedelta
 import os
-import subprocess
 from celery import shared_task
+from celery.exceptions import Ignore
+from celery.signals import worker_process_init
 from django.template.loader import render_to_string
 from django.utils import timezone
-from django.db.models import Min, Max
 from django.contrib.contenttypes.models import ContentType
-from io import BytesIO
+from django.db import connection, transaction
 import logging
 
-from apps.main.models import Employee, EmploymentPeriod, History
-from apps.users.models import User
-from apps.main.filters import EmployeeMultiFilter
+from apps.main.models import Employee, EmploymentPeriod, History, DataVersion, TaskExecution
+from apps.main.jobs import single_run
+from apps.main.backups import create_backup, prune_backups
+from apps.main.expiry import DISMISSED_STATUS, rebuild_expiry_entries, set_employees_dismissed
+from apps.main.employee_cache import invalidate_employee_list
+from apps.notification.events import notifications_changed
+from apps.notification.models import Notification
+from apps.notification.utils import check_and_create_notifications_bulk
+from apps.main.utils import get_system_user
+from apps.main.pdf import (
+    build_employees_pdf,
+    split_employee_ranges,
+    merge_pdf_parts,
+    get_render_context,
+    StageTimings,
+    PDF_CHUNK_SIZE,
+)
 
 
 logger = logging.getLogger(__name__)
 
 
+# Один оператор: вибірка з блокуванням рядків, UPDATE і INSERT ... SELECT історії.
+# FOR UPDATE змушує паралельний запуск дочекатися коміту і перевірити умову
+# заново — вже звільнені рядки він пропустить, тож повторний запуск нічого не змінює.
+MARK_DISMISSED_SQL = """
+WITH due AS (
+    SELECT e.id, e.working_status AS old_status
+    FROM {employee} e
+    WHERE e.working_status IS DISTINCT FROM %(status)s
+      AND EXISTS (
+          SELECT 1 FROM {period} p
+          WHERE p.employee_id = e.id AND p.end_date < %(today)s
+      )
+    FOR UPDATE OF e
+), updated AS (
+    UPDATE {employee} e
+    SET working_status = %(status)s
+    FROM due
+    WHERE e.id = due.id
+    RETURNING e.id, due.old_status
+), logged AS (
+    INSERT INTO {history} (content_type_id, object_id, field_name, old_value, new_value, action, changed_by_id, changed_at)
+    SELECT %(content_type)s, id, 'working_status', COALESCE(TRIM(old_status), ''), %(status)s, 'updated', %(user)s, NOW()
+    FROM updated
+)
+SELECT id FROM updated
+"""
+
+
 @shared_task
+@single_run()
 def mark_working_status():
-    today = date.today()
-    
-    employee_ids = EmploymentPeriod.objects.filter(
-        end_date__isnull=False,
-        end_date__lt=today
-    ).values_list("employee_id", flat=True).distinct()
-
-    employees_to_update = Employee.objects.filter(
-        id__in=employee_ids
-    ).exclude(working_status="Zwolniony")
-
-    employees_data = []
-    for emp in employees_to_update:
-        old_value = emp._prepare_value(emp.working_status) if hasattr(emp, '_prepare_value') else (emp.working_status or '')
-        employees_data.append({
-            'id': emp.id,
-            'old_value': old_value
-        })
-
-    employees_to_update.update(working_status="Zwolniony")
-
-    user = User.objects.get(id=1)
-  
-    if employees_data:
-        ct = ContentType.objects.get_for_model(Employee)
-        
-        history_entries = [
-            History(
-                content_type=ct,
-                object_id=emp_data['id'],
-                field_name='working_status',
-                old_value=emp_data['old_value'],
-                new_value='Zwolniony',
-                changed_by=user,
-                action="updated"
-            )
-            for emp_data in employees_data
-        ]
-        
-        History.objects.bulk_create(history_entries)
+    """
+    Звільняє співробітників із завершеним періодом роботи одним оператором
+    (UPDATE ... RETURNING + запис історії в тому ж запиті). Повертає кількість
+    звільнених.
+    """
+    sql = MARK_DISMISSED_SQL.format(
+        employee=Employee._meta.db_table,
+        period=EmploymentPeriod._meta.db_table,
+        history=History._meta.db_table,
+    )
+    system_user = get_system_user()
+    params = {
+        "status": DISMISSED_STATUS,
+        "today": date.today(),
+        "content_type": ContentType.objects.get_for_model(Employee).pk,
+        "user": system_user.pk if system_user else None,
+    }
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            dismissed_ids = [row[0] for row in cursor.fetchall()]
+
+        if not dismissed_ids:
+            return 0
+
+        # UPDATE не викликає post_save — сповіщення і календар звільнених оновлюємо тут
+        if Notification.objects.filter(employee_id__in=dismissed_ids).delete()[0]:
+            notifications_changed()
+        set_employees_dismissed(dismissed_ids)
+        DataVersion.bump()
+        invalidate_employee_list()
+
+    return len(dismissed_ids)
+
+
+@worker_process_init.connect
+def warm_pdf_render_context(**kwargs):
+    """Шрифти і стилі PDF завантажуються один раз на процес воркера, а не на кожен експорт"""
+    get_render_context()
+
+
+def export_path(name):
+    """Шлях до файлу експорту у приватному сховищі (не віддається nginx через /media/)"""
+    from django.conf import settings
+
+    directory = os.path.join(settings.PRIVATE_MEDIA_ROOT, "exports")
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, name)
+
+
+def _export_metadata(file_name, path, user_id, timings=None):
+    return {
+        "path": os.path.join("exports", file_name),
+        "filename": f"employees_{timezone.now().strftime('%Y%m%d_%H%M%S')}.pdf",
+        "size": os.path.getsize(path),
+        "user_id": user_id,
+        "timings": timings or {},
+    }
+
+
+def _cache_export(cache_key, path, meta):
+    """Кладе готовий експорт у кеш; збій кешу не повинен ламати сам експорт"""
+    from apps.main.export_cache import store_export
+
+    if not cache_key:
+        return
+    try:
+        store_export(cache_key, path, meta["filename"])
+    except Exception as e:
+        logger.warning(f"Could not cache export {meta['path']}: {e}")
 
 
-@shared_task
-def generate_employees_pdf_task(filter_params):
+@shared_task(bind=True)
+def generate_employees_pdf_task(self, filter_params, user_id=None, chunk_size=PDF_CHUNK_SIZE, parallelism=None,
+                                cache_key=None):
     """
-    Celery task для генерації PDF зі списком співробітників
+    Celery task для генерації PDF зі списком співробітників.
+
+    PDF пишеться у файл, а в result backend повертаються лише метадані
+    (шлях, ім'я для завантаження, розмір, користувач).
+
+    При parallelism > 1 (за замовчуванням settings.EMPLOYEES_PDF_PARALLELISM)
+    великий список ділиться на діапазони, які рендерять окремі підзадачі,
+    а задача замінюється chord-ом зі злиттям — результат під тим самим task id.
+
+    cache_key — ключ кешу експортів (apps.main.export_cache), під яким зберегти результат.
     """
-    from reportlab.lib import colors
-    from reportlab.lib.pagesizes import A4, landscape
-    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.lib.units import cm
-    from reportlab.pdfbase import pdfmetrics
-    from reportlab.pdfbase.ttfonts import TTFont
-    from reportlab.lib.enums import TA_CENTER
+    from django.conf import settings
+    from celery import chord
 
     try:
         logger.info("Starting PDF generation task")
 
+        file_name = f"{self.request.id or 'local'}.pdf"
+        path = export_path(file_name)
+
+        parallelism = parallelism or settings.EMPLOYEES_PDF_PARALLELISM
+        if parallelism > 1:
+            total, ranges = split_employee_ranges(filter_params, parallelism)
+            if len(ranges) > 1:
+                logger.info(f"Rendering PDF for {total} employees in {len(ranges)} parts")
+                parts = [
+                    render_employees_pdf_part.s(filter_params, file_name, n, id_range, total, chunk_size)
+                    for n, id_range in enumerate(ranges)
+                ]
+                return self.replace(chord(parts, merge_employees_pdf_parts.s(file_name, user_id, cache_key)))
+
+        # Створюємо PDF (спочатку у .part, щоб незавершений файл ніхто не віддав)
+        timings = StageTimings()
+        build_employees_pdf(filter_params, path + ".part", chunk_size=chunk_size, timings=timings)
+        os.replace(path + ".part", path)
 
-        # Визначаємо мову з параметрів (за замовчуванням українська)
-        language = filter_params.get('language', 'uk')
-        
-        employee_status_map = {
-            'uk': {
-                "pracujący": "'Працевлаштовані'",
-                "zwolniony": "'Звільнені'",
-                "umowa_o_prace": "'Трудовий договір'",
-                "zmiana_stanowiska": "'Зміна посади'",
-                "student": "'Студенти'",
-                "pit": "'PIT-2'",
-            },
-            'pl': {
-                "pracujący": "'Pracujący'",
-                "zwolniony": "'Zwolniony'",
-                "umowa_o_prace": "'Umowa o prace'",
-                "zmiana_stanowiska": "'Zmiana_stanowiska'",
-                "student": "'Studenci'",
-                "pit": "'PIT-2'",
-            }
-        }
-
-        employees_filter = filter_params.get('status', '')
-
-        if isinstance(employees_filter, list):
-            employees_filter_title = ", ".join(
-                employee_status_map.get(language, {}).get(item, item)
-                for item in employees_filter
-            )
-        else:
-            employees_filter_title = employee_status_map.get(
-                language, {}).get(employees_filter, '')
-        
-        # Реєструємо шрифт DejaVu Sans для підтримки кирилиці
-        try:
-            pdfmetrics.registerFont(TTFont('DejaVuSans', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'))
-            pdfmetrics.registerFont(TTFont('DejaVuSans-Bold', '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf'))
-        except Exception as e:
-            logger.warning(f"Could not register DejaVu fonts: {e}")
-        
-        # Отримуємо відфільтрований queryset
-        queryset = Employee.objects.all().select_related().prefetch_related(
-            'employment_period',
-            'documents',
-            'work_permits',
-            'contracts',
-            'contacts'
-        ).annotate(
-            earliest_start_date=Min('employment_period__start_date'),
-            latest_end_date=Max('employment_period__end_date')
-        ).order_by('id')  # Сортуємо за ID для збереження порядку з бази
-        
-        # Застосовуємо фільтри
-        filterset = EmployeeMultiFilter(filter_params, queryset=queryset)
-        employees = filterset.qs.order_by('id')  # Зберігаємо сортування після фільтрації
-        
-        logger.info(f"Generating PDF for {employees.count()} employees")
-        
-        # Створюємо PDF
-        buffer = BytesIO()
-        pdf_doc = SimpleDocTemplate(
-            buffer,
-            pagesize=landscape(A4),
-            rightMargin=1*cm,
-            leftMargin=1*cm,
-            topMargin=1*cm,
-            bottomMargin=1*cm
-        )
-        
-        # Стилі
-        styles = getSampleStyleSheet()
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontName='DejaVuSans-Bold',
-            fontSize=14,
-            textColor=colors.HexColor('#333333'),
-            alignment=TA_CENTER,
-            spaceAfter=10
-        )
-        
-        # Переклади
-        translations = {
-            'uk': {
-                'title': 'Список співробітників ' + employees_filter_title,
-                'date_label': 'Дата формування',
-                'total_label': 'Всього співробітників',
-                'headers': ['№', 'Прізвище', "Ім'я", 'Вік', 'Місце роботи', 'Статус',
-                           'PESEL', 'Студент', 'Період роботи', 'Документи',
-                           'Дозвіл на роботу', 'Контракт', 'Контакти'],
-                'yes': 'Так',
-                'no': 'Ні',
-                'status_map': {
-                    'Pracujący': 'Працевлаштований',
-                    'Zwolniony': 'Звільнений',
-                    'Umowa o prace': 'Трудовий договір',
-                    'Zmiana stanowiska': 'Зміна посади'
-                }
-            },
-            'pl': {
-                'title': 'Lista pracowników ' + employees_filter_title,
-                'date_label': 'Data utworzenia',
-                'total_label': 'Łącznie pracowników',
-                'headers': ['№', 'Nazwisko', 'Imię', 'Wiek', 'Miejsce pracy', 'Status',
-                           'PESEL', 'Student', 'Okres pracy', 'Dokumenty',
-                           'Zezwolenie na pracę', 'Umowa', 'Kontakty'],
-                'yes': 'Tak',
-                'no': 'Nie',
-                'status_map': {
-                    'Pracujący': 'Pracujący',
-                    'Zwolniony': 'Zwolniony',
-                    'Umowa o prace': 'Umowa o prace',
-                    'Zmiana stanowiska': 'Zmiana stanowiska'
-                }
-            }
-        }
-
-        # Вибираємо переклади для поточної мови
-        t = translations.get(language, translations['uk'])
-
-        # Елементи документа
-        elements = []
-
-        # Заголовок
-        title = Paragraph(t['title'], title_style)
-        elements.append(title)
-
-        # Мета-інформація
-        meta_style = ParagraphStyle(
-            'Meta',
-            parent=styles['Normal'],
-            fontName='DejaVuSans',
-            fontSize=7,
-            textColor=colors.HexColor('#666666'),
-            alignment=TA_CENTER
-        )
-        meta_text = f"{t['date_label']}: {timezone.now().strftime('%d.%m.%Y %H:%M')} | {t['total_label']}: {employees.count()}"
-        elements.append(Paragraph(meta_text, meta_style))
-        elements.append(Spacer(1, 0.3*cm))
-
-        # Стиль для тексту в комірках з переносом
-        cell_style = ParagraphStyle(
-            'CellText',
-            parent=styles['Normal'],
-            fontName='DejaVuSans',
-            fontSize=5,
-            leading=6,
-            wordWrap='CJK'
-        )
-
-        # Функція для обрізання тексту
-        def truncate(text, max_len):
-            return text[:max_len] + '...' if len(text) > max_len else text
-
-        # Функція для створення Paragraph (для переносу слів)
-        def make_paragraph(text):
-            if not text:
-                return ''
-            return Paragraph(text.replace('\n', '<br/>'), cell_style)
-
-        # Дані таблиці
-        data = [t['headers']]
-
-        # Мапінг статусів
-        status_map = t['status_map']
-
-        for idx, emp in enumerate(employees, 1):
-            # Період роботи (короткий формат дат)
-            periods = []
-            for period in emp.employment_period.all():
-                start = period.start_date.strftime('%d.%m.%y') if period.start_date else ''
-                end = period.end_date.strftime('%d.%m.%y') if period.end_date else ''
-                if start or end:
-                    periods.append(f"{start}-{end}")
-            period_text = '\n'.join(periods[:2]) if periods else ''  # Макс 2 періоди
-
-            # Документи (скорочено)
-            docs = []
-            for doc in emp.documents.all():
-                doc_text = doc.doc_type or ''
-                if doc.valid_until:
-                    doc_text += f"({doc.valid_until.strftime('%d.%m.%y')})"
-                if doc_text:
-                    docs.append(truncate(doc_text, 20))
-            docs_text = '\n'.join(docs[:2]) if docs else ''  # Макс 2 документи
-
-            # Дозволи (з переносом слів через Paragraph)
-            permits = []
-            for permit in emp.work_permits.all():
-                permit_text = permit.doc_type or ''
-                if permit.end_date:
-                    permit_text += f" ({permit.end_date.strftime('%d.%m.%y')})"
-                if permit_text:
-                    permits.append(permit_text)
-            permits_text = '<br/>'.join(permits[:3]) if permits else ''  # Макс 3 дозволи
-
-            # Контракти (скорочено)
-            contracts = []
-            for contract in emp.contracts.all():
-                if contract.contract_type:
-                    contracts.append(truncate(contract.contract_type, 20))
-            contracts_text = '\n'.join(contracts[:2]) if contracts else ''  # Макс 2 контракти
-
-            # Контакти (з переносом слів)
-            contacts = []
-            for contact in emp.contacts.all():
-                if contact.value:
-                    contacts.append(contact.value)
-            contacts_text = '<br/>'.join(contacts[:2]) if contacts else ''  # Макс 2 контакти
-
-            row = [
-                str(idx),
-                truncate(emp.last_name or '', 12),
-                truncate(emp.first_name or '', 10),
-                str(emp.age) if emp.age else '',
-                make_paragraph(emp.workplace or ''),  # Paragraph для переносу
-                make_paragraph(status_map.get(emp.working_status, emp.working_status or '')),  # Paragraph для переносу
-                emp.pesel or '',
-                t['yes'] if emp.is_student else t['no'],
-                period_text,
-                docs_text,
-                make_paragraph(permits_text),  # Paragraph для переносу
-                contracts_text,
-                make_paragraph(contacts_text)  # Paragraph для переносу
-            ]
-            data.append(row)
-        
-        # Створюємо таблицю з оптимізованими розмірами
-        table = Table(data, colWidths=[
-            0.5*cm,   # №
-            1.9*cm,   # Прізвище
-            1.5*cm,   # Ім'я
-            0.5*cm,   # Вік
-            1.7*cm,   # Місце роботи
-            2.4*cm,   # Статус
-            1.7*cm,   # PESEL
-            1.0*cm,   # Студент
-            2.2*cm,   # Період роботи
-            2.1*cm,   # Документи
-            3.7*cm,   # Дозвіл на роботу
-            1.3*cm,   # Контракт
-            2.2*cm    # Контакти
-        ])
-
-        # Стиль таблиці
-        table.setStyle(TableStyle([
-            # Заголовок
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4A90E2')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, 0), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'DejaVuSans-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 5.5),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 3),
-            ('TOPPADDING', (0, 0), (-1, 0), 3),
-            ('LEFTPADDING', (0, 0), (-1, 0), 2),
-            ('RIGHTPADDING', (0, 0), (-1, 0), 2),
-
-            # Дані
-            ('FONTNAME', (0, 1), (-1, -1), 'DejaVuSans'),
-            ('FONTSIZE', (0, 1), (-1, -1), 5),
-            ('ALIGN', (0, 1), (-1, -1), 'LEFT'),
-            ('VALIGN', (0, 1), (-1, -1), 'TOP'),
-            ('TOPPADDING', (0, 1), (-1, -1), 1.5),
-            ('BOTTOMPADDING', (0, 1), (-1, -1), 1.5),
-            ('LEFTPADDING', (0, 1), (-1, -1), 2),
-            ('RIGHTPADDING', (0, 1), (-1, -1), 2),
-            ('WORDWRAP', (0, 1), (-1, -1), True),
-
-            # Сітка
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-
-            # Чергування кольорів рядків
-            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f9f9f9')]),
-        ]))
-        
-        elements.append(table)
-        
-        # Генеруємо PDF
-        pdf_doc.build(elements)
-        
         logger.info("PDF generated successfully")
-        
-        return buffer.getvalue()
-        
+
+        meta = _export_metadata(file_name, path, user_id, timings)
+        _cache_export(cache_key, path, meta)
+        return meta
+
+    except Ignore:
+        # self.replace() завершує задачу через Ignore — це не помилка
+        raise
+
     except Exception as e:
         logger.error(f"Error generating PDF: {str(e)}", exc_info=True)
         raise
 
 
+@shared_task
+def render_employees_pdf_part(filter_params, file_name, number, id_range, total, chunk_size=PDF_CHUNK_SIZE):
+    """Рендер одного діапазону співробітників у частковий PDF (без номерів сторінок)"""
+    first_id, last_id, start_index = id_range
+    path = export_path(f"{file_name}.{number:03d}.part")
+
+    build_employees_pdf(
+        filter_params, path, chunk_size=chunk_size,
+        id_range=(first_id, last_id), start_index=start_index, total=total, page_numbers=False,
+    )
+    return path
+
+
+@shared_task
+def merge_employees_pdf_parts(part_paths, file_name, user_id=None, cache_key=None):
+    """Злиття частин (у порядку діапазонів) з наскрізною нумерацією сторінок"""
+    path = export_path(file_name)
+    timings = StageTimings()
+
+    try:
+        with timings.stage("merge"):
+            pages = merge_pdf_parts(part_paths, path + ".part")
+        os.replace(path + ".part", path)
+    finally:
+        for part in part_paths:
+            if os.path.exists(part):
+                os.remove(part)
+
+    logger.info(f"PDF merged successfully ({len(part_paths)} parts, {pages} pages, {timings})")
+
+    meta = _export_metadata(file_name, path, user_id, timings)
+    _cache_export(cache_key, path, meta)
+    return meta
+
+
+@shared_task
+def render_report_presets(force=False):
+    """Нічний рендер звітів-пресетів; збій одного звіту не зупиняє решту"""
+    from django.conf import settings
+    from apps.main.reports import render_report
+
+    rendered = 0
+    for name, preset in settings.REPORT_PRESETS.items():
+        for fmt in preset["formats"]:
+            for language in settings.REPORT_LANGUAGES:
+                try:
+                    render_report(name, fmt, language, force=force)
+                    rendered += 1
+                except Exception as e:
+                    logger.error(f"Error rendering report {name} ({fmt}, {language}): {e}", exc_info=True)
+
+    return rendered
+
+
 @shared_task(bind=True, autoretry_for=(Exception,), retry_kwargs={"countdown": 60, "max_retries": 3})
+@single_run(lease=30 * 60)
 def backup_postgres(self):
-    timestamp = datetime.utcnow().strftime("%Y-%m-%d_%H-%M")
-    filename = f"/backups/db_backup_{timestamp}.dump"
+    """Паралельний дамп з контрольними сумами і перевіркою (apps.main.backups)"""
+    backup = create_backup()
+    return f"Backup created: {backup.path} ({backup.size} bytes, {backup.dump_duration:.1f}s)"
 
-    cmd = [
-        "pg_dump",
-        "-h", os.getenv("POSTGRES_HOST", "db"),
-        "-U", os.getenv("POSTGRES_USER"),
-        "-d", os.getenv("POSTGRES_DB"),
-        "-F", "c",      # custom format
-        "-f", filename,
-    ]
 
-    env = os.environ.copy()
-    env["PGPASSWORD"] = os.getenv("POSTGRES_PASSWORD")
+@shared_task(bind=True, autoretry_for=(OSError,), retry_backoff=60, max_retries=5)
+def send_invitation_email_task(self, invite_id, registration_url, language=None):
+    """
+    Лист із запрошенням (черга email). Помилки SMTP (OSError) повторюються з backoff.
+    Результат пишеться в InviteToken.email_status, щоб збій після всіх спроб
+    було видно у списку запрошень, а не лише в логах воркера.
+    """
+    from django.utils import translation
+    from apps.users.models import InviteToken
+    from apps.main.emails import send_invitation_email
+
+    invite = InviteToken.objects.filter(pk=invite_id).first()
+    if invite is None:
+        return False
 
-    subprocess.run(cmd, check=True, env=env)
+    try:
+        with translation.override(language):
+            send_invitation_email(invite, registration_url)
+    except Exception as e:
+        # Помилка SMTP ще буде повторена — статус лишається "в черзі"
+        if not isinstance(e, OSError) or self.request.retries >= self.max_retries:
+            InviteToken.objects.filter(pk=invite_id).update(
+                email_status=InviteToken.EMAIL_FAILED, email_error=str(e)
+            )
+        raise
 
-    return f"Backup created: {filename}"
+    InviteToken.objects.filter(pk=invite_id).update(
+        email_status=InviteToken.EMAIL_SENT, email_error='', email_sent_at=timezone.now()
+    )
+    return True
 
 
 @shared_task
-def cleanup_old_backups(days=14):
+def cleanup_old_exports(hours=24):
+    """Видаляє згенеровані файли експорту, посилання на які вже давно протерміновані"""
     import glob, time
 
     now = time.time()
-    for f in glob.glob("/backups/db_backup_*.dump"):
-        if os.stat(f).st_mtime < now - days * 86400:
+    for f in glob.glob(export_path("*")):
+        if os.stat(f).st_mtime < now - hours * 3600:
             os.remove(f)
+
+
+@shared_task
+def cleanup_old_backups(days=None):
+    """Ретенція копій БД за кількістю, віком і сумарним розміром (settings.BACKUP_*)"""
+    return prune_backups(max_age_days=days)
+
+
+@shared_task
+def cleanup_task_executions(days=None):
+    """Видаляє старі записи метрик виконання задач"""
+    from django.conf import settings
+
+    days = settings.TASK_METRICS_RETENTION_DAYS if days is None else days
+    deleted, _ = TaskExecution.objects.filter(started_at__lt=timezone.now() - timedelta(days=days)).delete()
+    return deleted
+
+
+def _update_import_job(job_id, **fields):
+    """Прогрес пишеться окремим UPDATE, щоб HTMX-поллінг бачив його одразу"""
+    from apps.main.models import ImportJob
+
+    ImportJob.objects.filter(pk=job_id).update(updated_at=timezone.now(), **fields)
+
+
+def _import_job_counters(report):
+    return {
+        "created_count": report["created"],
+        "updated_count": report["updated"],
+        "unchanged_count": report["unchanged"],
+    }
+
+
+@shared_task
+def validate_import_job(job_id):
+    """
+    Перша фаза імпорту: розбір і валідація файлу + пробний прогон запису
+    (транзакції відкочуються). Розібрані пачки зберігаються для commit_import_job.
+    """
+    from apps.main.models import ImportJob
+    from utils.csv_to_objects import iter_csv_frames, spool_frames, iter_spooled_frames, import_typed_frames
+    from utils.xlsx_to_objects import iter_xlsx_frames
+
+    job = ImportJob.objects.select_related("created_by").get(pk=job_id)
+    _update_import_job(job_id, status="validating")
+
+    def parse_progress(report):
+        _update_import_job(
+            job_id,
+            rows=report["rows"],
+            valid=report["valid"],
+            duplicates=report["duplicates"],
+            errors_count=len(report["errors"]),
+        )
+
+    def dry_run_progress(report):
+        _update_import_job(job_id, **_import_job_counters(report))
+
+    try:
+        logger.info(f"Validating import job {job_id} ({job.file_name})")
+
+        with job.file.open("rb") as f:
+            frames = iter_xlsx_frames(f) if job.is_xlsx else iter_csv_frames(f)
+            report = spool_frames(frames, job.spool_dir, on_progress=parse_progress)
+
+        dry_run = import_typed_frames(
+            iter_spooled_frames(job.spool_dir),
+            update=job.update_existing,
+            changed_by=job.created_by,
+            dry_run=True,
+            on_progress=dry_run_progress,
+        )
+
+        _update_import_job(
+            job_id,
+            status="validated",
+            rows=report["rows"],
+            valid=report["valid"],
+            duplicates=report["duplicates"],
+            errors_count=len(report["errors"]),
+            errors=report["errors"][:ImportJob.MAX_STORED_ERRORS],
+            **_import_job_counters(dry_run),
+        )
+
+    except Exception as e:
+        logger.error(f"Error validating import job {job_id}: {str(e)}", exc_info=True)
+        _update_import_job(job_id, status="failed", error_message=str(e))
+        job.cleanup_files()
+
+
+@shared_task
+def commit_import_job(job_id):
+    """
+    Друга фаза імпорту (після підтвердження): запис уже розібраних пачок,
+    без повторного розбору CSV/XLSX.
+    """
+    from apps.main.models import ImportJob
+    from utils.csv_to_objects import iter_spooled_frames, import_typed_frames
+
+    # Захоплення задачі: повторний запуск для того ж job нічого не робить
+    if not ImportJob.objects.filter(pk=job_id, status="confirmed").update(status="importing"):
+        logger.warning(f"Import job {job_id} is not confirmed, skipping")
+        return
+
+    job = ImportJob.objects.select_related("created_by").get(pk=job_id)
+
+    try:
+        logger.info(f"Committing import job {job_id} ({job.file_name})")
+
+        started = timezone.now()
+        report = import_typed_frames(
+            iter_spooled_frames(job.spool_dir),
+            update=job.update_existing,
+            changed_by=job.created_by,
+            on_progress=lambda report: _update_import_job(job_id, **_import_job_counters(report)),
+        )
+        # bulk_create/bulk_update не викликають post_save — сповіщення для всіх
+        # створених і змінених співробітників одним пакетним проходом
+        imported = Employee.objects.filter(updated_at__gte=started)
+        rebuild_expiry_entries(imported)
+        check_and_create_notifications_bulk(imported)
+
+        _update_import_job(job_id, status="done", **_import_job_counters(report))
+
+    except Exception as e:
+        logger.error(f"Error committing import job {job_id}: {str(e)}", exc_info=True)
+        _update_import_job(job_id, status="failed", error_message=str(e))
+
+    finally:
+        job.cleanup_files()
@@ -1,3 +1,1202 @@
-from django.test import TestCase
+"""Unit tests for the employee import pipeline."""
+from datetime import date, datetime, timedelta
+from io import BytesIO
+import os
+import shutil
+import subprocess
+import tempfile
+from unittest import skipUnless
+from unittest.mock import ANY, patch
+
+import fakeredis
+import pandas as pd
+from celery import shared_task
+from celery.signals import worker_process_init
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from openpyxl import Workbook, load_workbook
+from pypdf import PdfReader
+
+from apps.main.models import (
+    Employee, Document, WorkPermit, Contact, EmploymentPeriod, History, ImportJob, DataVersion, ExportArtifact,
+    ReportArtifact, ExpiryEntry, Sanepid, Task, JobRun, TaskExecution, DatabaseBackup,
+)
+from apps.main.badges import notification_count, task_count
+from apps.main.edit_locks import lock_holder, set_lock
+from apps.main.employee_cache import employee_list_key
+from apps.main.jobs import LeaseLock, single_run
+from apps.main.queues import queue_latency, record_latency, stamp_published_at
+from apps.main.instrumentation import prometheus_metrics, task_summary
+from apps.main.backups import (
+    BackupError, backup_stats, create_backup, prune_backups, verify_checksums, write_checksums,
+)
+from apps.main.expiry import expiring_between, rebuild_expiry_entries
+from apps.main.export_cache import export_cache_key, store_export, get_cached_export, evict_exports
+from apps.main.exports import iter_export_rows
+from apps.main.filters import EmployeeMultiFilter
+from apps.main.pdf import (
+    build_employees_pdf,
+    employees_pdf_queryset,
+    iter_employee_chunks,
+    split_employee_ranges,
+    get_render_context,
+    reset_render_context,
+    StageTimings,
+)
+from apps.main.tasks import (
+    validate_import_job,
+    commit_import_job,
+    generate_employees_pdf_task,
+    render_employees_pdf_part,
+    merge_employees_pdf_parts,
+    render_report_presets,
+    mark_working_status,
+    backup_postgres,
+    send_invitation_email_task,
+    cleanup_task_executions,
+)
+from apps.users.models import User, InviteToken
+from core.celery import app as celery_app
+from utils.csv_to_objects import (
+    normalize_raw_frame,
+    preprocess_frame,
+    bulk_create_from_frame,
+    upsert_from_frame,
+    import_frames,
+    import_typed_frames,
+    ImportIndex,
+)
+from utils.xlsx_to_objects import iter_xlsx_frames
+
+
+def make_raw_frame(rows):
+    """Build a raw import frame with the CSV column names."""
+    columns = [
+        "Призвіще", "Вік", "Студент", "Пит-2", "Місце затруднення", "Від", "До",
+        "Підстава", "Термін документу", "Дозвіл на роботу", "Песель", "UKR",
+        "Подача на карту", "Дата", "Вид умови", "Sanepid", "Контакт", "Информація",
+    ]
+    return normalize_raw_frame(pd.DataFrame(rows, columns=columns, dtype=str))
+
+
+class PreprocessFrameTests(TestCase):
+    """Tests for the vectorized preprocessing stage."""
+
+    def setUp(self):
+        self.raw = make_raw_frame([
+            {
+                "Призвіще": "1. Bylavytskyi Dmytro ",
+                "Вік": "24",
+                "Студент": "stud",
+                "Від": "1/1/2025",
+                "До": "09.09.2025",
+                "Підстава": "karta RS5480565 ",
+                "Термін документу": "31/12/2027",
+                "Дозвіл на роботу": "zez WRP-II.8671.91044.2024  do 21.01.2026",
+                "Песель": "95110912398",
+                "Вид умови": "o prace",
+                "Sanepid": "PAKOWACZ",
+                "Контакт": "viber +48453172686",
+            },
+            {
+                "Призвіще": "Solo",
+                "Підстава": " wiza",
+                "Термін документу": "2026-03-01",
+                "Дозвіл на роботу": "PZC.4390.16778.PSZ.2025",
+                "Дата": "7/22/2025",
+                "Контакт": "someone@example.com",
+            },
+        ])
+
+    def test_names_are_split(self):
+        frame = preprocess_frame(self.raw)
+        self.assertEqual(list(frame["last_name"]), ["Bylavytskyi", ""])
+        self.assertEqual(list(frame["first_name"]), ["Dmytro", "Solo"])
+
+    def test_dates_parsed_with_all_formats(self):
+        frame = preprocess_frame(self.raw)
+        self.assertEqual(frame.loc[0, "start_date"].date(), date(2025, 1, 1))
+        self.assertEqual(frame.loc[0, "end_date"].date(), date(2025, 9, 9))
+        self.assertEqual(frame.loc[0, "doc_valid_until"].date(), date(2027, 12, 31))
+        self.assertEqual(frame.loc[1, "doc_valid_until"].date(), date(2026, 3, 1))
+        self.assertEqual(frame.loc[1, "submission_date"].date(), date(2025, 7, 22))
+        self.assertTrue(pd.isna(frame.loc[1, "start_date"]))
+
+    def test_karta_and_permit_splitting(self):
+        frame = preprocess_frame(self.raw)
+        self.assertEqual(frame.loc[0, "doc_type"], "karta")
+        self.assertEqual(frame.loc[0, "doc_number"], "RS5480565")
+        self.assertEqual(frame.loc[1, "doc_type"], "wiza")
+        self.assertTrue(pd.isna(frame.loc[1, "doc_number"]))
+
+        self.assertEqual(frame.loc[0, "permit_doc"], "zez WRP-II.8671.91044.2024")
+        self.assertEqual(frame.loc[0, "permit_end_date"].date(), date(2026, 1, 21))
+        self.assertEqual(frame.loc[1, "permit_doc"], "PZC.4390.16778.PSZ.2025")
+        self.assertTrue(pd.isna(frame.loc[1, "permit_end_date"]))
+
+    def test_flags_and_contacts(self):
+        frame = preprocess_frame(self.raw)
+        self.assertEqual(list(frame["is_student"]), [True, False])
+        self.assertEqual(frame.loc[0, "age"], 24)
+        self.assertEqual(frame.loc[0, "contract_type"], "o_prace")
+        self.assertEqual(frame.loc[0, "sanepid"], "pakowacz")
+        self.assertEqual(
+            (frame.loc[0, "contact_type"], frame.loc[0, "contact_value"]),
+            ("viber", "+48453172686"),
+        )
+        self.assertEqual(
+            (frame.loc[1, "contact_type"], frame.loc[1, "contact_value"]),
+            ("email", "someone@example.com"),
+        )
+
+    def test_bulk_create_from_frame(self):
+        created = bulk_create_from_frame(preprocess_frame(self.raw), batch_size=1)
+
+        self.assertEqual(created, 2)
+        self.assertEqual(Employee.objects.count(), 2)
+        self.assertEqual(Document.objects.count(), 2)
+        self.assertEqual(WorkPermit.objects.count(), 2)
+        self.assertEqual(Contact.objects.count(), 2)
+        self.assertEqual(EmploymentPeriod.objects.count(), 1)
+        self.assertEqual(History.objects.filter(action="created").count(), 2)
+
+        employee = Employee.objects.get(pesel="95110912398")
+        self.assertEqual(employee.documents.get().valid_until, date(2027, 12, 31))
+
+
+class UpsertFromFrameTests(TestCase):
+    """Tests for the incremental (PESEL-keyed) import."""
+
+    def setUp(self):
+        self.rows = [
+            {
+                "Призвіще": "Tkach Valeriia",
+                "Від": "1/1/2025",
+                "Підстава": "karta RS8676174",
+                "Термін документу": "31/12/2027",
+                "Песель": "99050713400",
+                "Вид умови": "zlecenia",
+            },
+            {
+                "Призвіще": "Hadomska Diana",
+                "Вік": "24",
+                "Підстава": "wiza",
+            },
+        ]
+
+    def test_reimport_is_idempotent(self):
+        first = upsert_from_frame(preprocess_frame(make_raw_frame(self.rows)))
+        second = upsert_from_frame(preprocess_frame(make_raw_frame(self.rows)))
+
+        self.assertEqual(first, {"created": 2, "updated": 0, "unchanged": 0})
+        self.assertEqual(second, {"created": 0, "updated": 0, "unchanged": 2})
+        self.assertEqual(Employee.objects.count(), 2)
+        self.assertEqual(Document.objects.count(), 2)
+
+    def test_changed_rows_update_only_changed_fields(self):
+        upsert_from_frame(preprocess_frame(make_raw_frame(self.rows)))
+
+        self.rows[0]["Термін документу"] = "01.06.2028"
+        self.rows[1]["Призвіще"] = " hadomska   DIANA "
+        self.rows[1]["Вік"] = "25"
+        result = upsert_from_frame(preprocess_frame(make_raw_frame(self.rows)))
+
+        self.assertEqual(result, {"created": 0, "updated": 2, "unchanged": 0})
+        self.assertEqual(Employee.objects.count(), 2)
+
+        document = Document.objects.get(employee__pesel="99050713400")
+        self.assertEqual(document.valid_until, date(2028, 6, 1))
+
+        updates = History.objects.filter(action="updated")
+        self.assertEqual(
+            sorted(updates.values_list("field_name", flat=True)),
+            ["age", "first_name", "last_name", "valid_until"],
+        )
+
+
+    def test_only_rows_with_real_changes_count_as_updated(self):
+        upsert_from_frame(preprocess_frame(make_raw_frame(self.rows)))
+        updated_at = Employee.objects.get(pesel="99050713400").updated_at
+
+        # Очищенное поле меняет хеш строки, но связанный объект импорт не удаляет
+        self.rows[0]["Вид умови"] = None
+        self.rows[1]["Вік"] = "25"
+        result = upsert_from_frame(preprocess_frame(make_raw_frame(self.rows)))
+
+        self.assertEqual(result, {"created": 0, "updated": 1, "unchanged": 1})
+        employee = Employee.objects.get(pesel="99050713400")
+        self.assertEqual(employee.updated_at, updated_at)
+        self.assertEqual(employee.contracts.get().contract_type, "zlecenia")
+        self.assertEqual(
+            upsert_from_frame(preprocess_frame(make_raw_frame(self.rows))),
+            {"created": 0, "updated": 0, "unchanged": 2},
+        )
+
+    def test_dry_run_keeps_cache_and_index(self):
+        upsert_from_frame(preprocess_frame(make_raw_frame(self.rows[:1])))
+        cache.set("unrelated", 1)
+        list_key = employee_list_key("count", "")
+        index = ImportIndex.load()
+        ids = dict(index.ids)
+
+        self.rows[0]["Термін документу"] = "01.06.2028"
+        frame = preprocess_frame(make_raw_frame(self.rows))
+        with patch("utils.csv_to_objects.ImportIndex.load", return_value=index):
+            report = import_typed_frames([frame], update=True, dry_run=True)
+
+        self.assertEqual(report, {"created": 1, "updated": 1, "unchanged": 0})
+        self.assertEqual(Employee.objects.count(), 1)
+        self.assertEqual(cache.get("unrelated"), 1)
+        self.assertEqual(employee_list_key("count", ""), list_key)
+        self.assertEqual(index.ids, ids)
+
+    def test_dry_run_counts_keys_repeated_across_chunks_like_a_real_run(self):
+        first = preprocess_frame(make_raw_frame(self.rows))
+        self.rows[1]["Вік"] = "25"
+        second = preprocess_frame(make_raw_frame(self.rows))
+
+        dry = import_typed_frames([first, second], update=True, dry_run=True)
+        self.assertEqual(Employee.objects.count(), 0)
+
+        real = import_typed_frames([first, second], update=True)
+        self.assertEqual(real, {"created": 2, "updated": 1, "unchanged": 1})
+        self.assertEqual(dry, real)
+
+
+class XlsxImportTests(TestCase):
+    """Tests for the streaming XLSX import path."""
+
+    def make_workbook(self):
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.title = "HR"
+        sheet.append(["Призвіще, ім'я", "Вік", "Від", "До", "Підстава", "Термін документу", "Песель", "Вид умови "])
+        sheet.append(["1. Tkach Valeriia ", 24, datetime(2025, 1, 1), None, "karta RS1", datetime(2027, 12, 31), 323109004, "zlecenia"])
+        sheet.append([None, None, None, None, None, None, None, None])
+        sheet.append(["2. Kravets Anastasiia", None, "1/1/2025", "KARTA", "wiza", "31.12.26", "97011911281", "o prace"])
+        sheet.append(["", "abc", None, None, None, None, None, None])
+        workbook.create_sheet("Empty")
+
+        buffer = BytesIO()
+        workbook.save(buffer)
+        buffer.seek(0)
+        return buffer
+
+    def test_frames_use_csv_columns_and_row_numbers(self):
+        frames = list(iter_xlsx_frames(self.make_workbook(), chunk_size=2))
+
+        self.assertEqual([len(frame) for frame in frames], [2, 1])
+        first = frames[0]
+        self.assertEqual(list(first.index), ["HR!2", "HR!4"])
+        self.assertEqual(first.loc["HR!2", "Призвіще"], "Tkach Valeriia")
+        self.assertEqual(first.loc["HR!2", "Вік"], "24")
+        self.assertEqual(first.loc["HR!2", "Від"], "2025-01-01")
+        self.assertEqual(first.loc["HR!2", "Песель"], "00323109004")
+        self.assertIn("Вид умови", first.columns)
+
+    def test_import_reports_row_errors(self):
+        report = import_frames(iter_xlsx_frames(self.make_workbook(), chunk_size=2), update=True)
+
+        self.assertEqual(report["rows"], 3)
+        self.assertEqual(report["valid"], 1)
+        self.assertEqual(report["created"], 1)
+        self.assertEqual(
+            sorted((error["row"], error["column"]) for error in report["errors"]),
+            [("HR!4", "До"), ("HR!5", "Вік"), ("HR!5", "Призвіще")],
+        )
+
+        employee = Employee.objects.get()
+        self.assertEqual(employee.pesel, "00323109004")
+        self.assertEqual(employee.documents.get().valid_until, date(2027, 12, 31))
+
+    def test_upload_runs_dry_run_then_commits_on_confirmation(self):
+        user = User.objects.create_user(email="hr@example.com", password="pass12345")
+        self.client.force_login(user)
+
+        upload = SimpleUploadedFile("employees.xlsx", self.make_workbook().read())
+        with patch("apps.main.tasks.validate_import_job.delay") as validate_delay, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse("main:import_employees"), {"file": upload, "update": "on"})
+
+        self.assertEqual(response.status_code, 200)
+        job = ImportJob.objects.get()
+        validate_delay.assert_called_once_with(job.pk)
+        self.assertContains(response, reverse("main:import_job_status", args=[job.pk]))
+
+        validate_import_job(job.pk)
+        job.refresh_from_db()
+
+        self.assertEqual(job.status, "validated")
+        self.assertEqual((job.rows, job.valid, job.created_count, job.errors_count), (3, 1, 1, 3))
+        self.assertFalse(Employee.objects.exists())
+
+        with patch("apps.main.tasks.commit_import_job.delay") as commit_delay, \
+                self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("main:import_job_confirm", args=[job.pk]))
+            self.client.post(reverse("main:import_job_confirm", args=[job.pk]))
+        commit_delay.assert_called_once_with(job.pk)
+
+        # The confirmed import reuses the spooled frames instead of re-parsing
+        with patch("utils.csv_to_objects.preprocess_frame") as preprocess:
+            commit_import_job(job.pk)
+        preprocess.assert_not_called()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, "done")
+        self.assertEqual(job.created_count, 1)
+        self.assertEqual(History.objects.get(action="created").changed_by, user)
+        self.assertFalse(os.path.exists(job.spool_dir))
+
+        response = self.client.get(reverse("main:import_job_status", args=[job.pk]))
+        self.assertEqual(response["HX-Trigger"], "employeesImported")
+
+    def test_duplicates_are_counted(self):
+        user = User.objects.create_user(email="hr@example.com", password="pass12345")
+        job = ImportJob.objects.create(
+            file=SimpleUploadedFile("employees.csv", b"\xd0\x9f\xd1\x80\xd0\xb8\xd0\xb7\xd0\xb2\xd1\x96\xd1\x89\xd0\xb5,\xd0\x9f\xd0\xb5\xd1\x81\xd0\xb5\xd0\xbb\xd1\x8c\nA B,1\nC D,1\nE F,2\n"),
+            file_name="employees.csv",
+            update_existing=True,
+            created_by=user,
+        )
+        self.addCleanup(job.cleanup_files)
+
+        validate_import_job(job.pk)
+        job.refresh_from_db()
+
+        self.assertEqual((job.status, job.rows, job.valid, job.duplicates), ("validated", 3, 3, 1))
+        self.assertEqual(job.created_count, 2)
+        self.assertFalse(Employee.objects.exists())
+
+    def test_upload_endpoint_rejects_other_formats(self):
+        user = User.objects.create_user(email="hr@example.com", password="pass12345")
+        self.client.force_login(user)
+
+        upload = SimpleUploadedFile("employees.pdf", b"%PDF")
+        response = self.client.post(reverse("main:import_employees"), {"file": upload})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("error", response.context)
+        self.assertFalse(Employee.objects.exists())
+
+
+@override_settings(PRIVATE_MEDIA_ROOT=tempfile.mkdtemp())
+class PdfExportTests(TestCase):
+    """Tests for the non-blocking PDF export."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email="hr@example.com", password="pass12345")
+        self.client.force_login(self.user)
+        Employee.objects.create(first_name="Valeriia", last_name="Tkach", pesel="99050713400")
+
+    def test_task_writes_file_and_returns_metadata(self):
+        meta = generate_employees_pdf_task.apply(args=[{"language": "uk"}], kwargs={"user_id": self.user.pk}).get()
+
+        self.assertEqual(meta["user_id"], self.user.pk)
+        path = os.path.join(settings.PRIVATE_MEDIA_ROOT, meta["path"])
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(4), b"%PDF")
+        self.assertEqual(meta["size"], os.path.getsize(path))
+
+    def test_request_does_not_wait_for_the_task(self):
+        with patch("apps.main.tasks.generate_employees_pdf_task.delay") as delay:
+            delay.return_value.id = "task-1"
+            response = self.client.get(reverse("main:export_pdf"), {"status": "student"})
+
+        self.assertEqual(response.status_code, 200)
+        delay.assert_called_once_with(
+            {"status": ["student"], "language": "uk"}, user_id=self.user.pk, cache_key=ANY
+        )
+        self.assertContains(response, reverse("main:export_pdf_status", args=["task-1"]))
+
+    def test_download_url_is_signed_per_user(self):
+        meta = generate_employees_pdf_task.apply(args=[{"language": "uk"}], kwargs={"user_id": self.user.pk}).get()
+
+        with patch("celery.result.AsyncResult") as async_result:
+            async_result.return_value.successful.return_value = True
+            async_result.return_value.result = meta
+            response = self.client.get(reverse("main:export_pdf_status", args=["task-1"]))
+
+        download_url = response.context["download_url"]
+        response = self.client.get(download_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content)[:4], b"%PDF")
+
+        other = User.objects.create_user(email="other@example.com", password="pass12345")
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(download_url).status_code, 404)
+        self.assertEqual(self.client.get(reverse("main:download_export", args=["forged"])).status_code, 404)
+
+    def test_streaming_prefetches_per_chunk(self):
+        Employee.objects.create(first_name="Diana", last_name="Hadomska")
+        Employee.objects.create(first_name="Anastasiia", last_name="Kravets")
+
+        chunks = list(iter_employee_chunks(employees_pdf_queryset({}), chunk_size=2))
+
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 1])
+        self.assertEqual([e.last_name for chunk in chunks for e in chunk], ["Tkach", "Hadomska", "Kravets"])
+        self.assertIn("documents", chunks[1][0]._prefetched_objects_cache)
+
+    def test_streaming_and_single_table_modes_build(self):
+        Employee.objects.create(first_name="Diana", last_name="Hadomska")
+
+        for chunk_size in (1, None):
+            output = BytesIO()
+            total = build_employees_pdf({"language": "pl"}, output, chunk_size=chunk_size)
+            self.assertEqual(total, 2)
+            self.assertTrue(output.getvalue().startswith(b"%PDF"))
+
+    @patch("apps.main.pdf.PDF_MIN_PART_ROWS", 1)
+    def test_parallel_export_merges_parts_with_continuous_numbering(self):
+        for n in range(4):
+            Employee.objects.create(first_name=f"Name{n}", last_name=f"Surname{n}")
+
+        total, ranges = split_employee_ranges({}, 2)
+        self.assertEqual(total, 5)
+        self.assertEqual([start for _, _, start in ranges], [1, 4])
+
+        with patch.object(generate_employees_pdf_task, "replace") as replace:
+            generate_employees_pdf_task.apply(
+                args=[{"language": "uk"}], kwargs={"user_id": self.user.pk, "parallelism": 2}
+            )
+        replaced_with = replace.call_args.args[0]
+        self.assertEqual(len(replaced_with.tasks), 2)
+        self.assertEqual(replaced_with.body.name, merge_employees_pdf_parts.name)
+
+        parts = [
+            render_employees_pdf_part({"language": "uk"}, "merged.pdf", n, id_range, total, chunk_size=1)
+            for n, id_range in enumerate(ranges)
+        ]
+        meta = merge_employees_pdf_parts(parts, "merged.pdf", self.user.pk)
+
+        path = os.path.join(settings.PRIVATE_MEDIA_ROOT, meta["path"])
+        pages = PdfReader(path).pages
+        self.assertEqual(meta["user_id"], self.user.pk)
+        self.assertIn("Surname3", pages[-1].extract_text())
+        self.assertEqual(pages[-1].extract_text().split()[-1], str(len(pages)))
+        self.assertFalse(any(os.path.exists(part) for part in parts))
+
+    def test_render_context_is_warmed_once_per_worker_process(self):
+        reset_render_context()
+        worker_process_init.send(sender=None)
+        context = get_render_context()
+
+        timings = StageTimings()
+        build_employees_pdf({"language": "uk"}, BytesIO(), timings=timings)
+
+        self.assertIs(get_render_context(), context)
+        self.assertEqual(list(timings), ["setup", "query", "layout", "build"])
+        self.assertTrue(all(seconds >= 0 for seconds in timings.values()))
+
+
+@override_settings(PRIVATE_MEDIA_ROOT=tempfile.mkdtemp())
+class TabularExportTests(TestCase):
+    """Tests for the streaming CSV / XLSX export of the filtered list."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email="hr@example.com", password="pass12345")
+        self.client.force_login(self.user)
+        self.student = Employee.objects.create(
+            first_name="Valeriia", last_name="Tkach", pesel="99050713400", is_student=True
+        )
+        EmploymentPeriod.objects.create(employee=self.student, start_date=date(2025, 1, 1))
+        Contact.objects.create(employee=self.student, contact_type="phone", value="+48111")
+        Contact.objects.create(employee=self.student, contact_type="email", value="v@example.com")
+        Employee.objects.create(first_name="Ivan", last_name="Koval")
+
+    def test_csv_is_streamed_with_filters_applied(self):
+        response = self.client.get(reverse("main:export_employees", args=["csv"]), {"status": "student"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertIn("attachment;", response["Content-Disposition"])
+        lines = b"".join(response.streaming_content).decode("utf-8-sig").splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertIn("Tkach", lines[1])
+        self.assertIn("01.01.2025-", lines[1])
+        self.assertIn("+48111; v@example.com", lines[1])
+
+    def test_xlsx_contains_every_filtered_row(self):
+        response = self.client.get(reverse("main:export_employees", args=["xlsx"]))
+
+        self.assertEqual(response.status_code, 200)
+        workbook = load_workbook(BytesIO(b"".join(response.streaming_content)), read_only=True)
+        rows = list(workbook.active.values)
+        self.assertEqual(len(rows), 3)
+        self.assertEqual([row[1] for row in rows[1:]], ["Tkach", "Koval"])
+
+    def test_formulas_are_exported_as_text(self):
+        self.student.additional_information = "=HYPERLINK(\"http://evil\")"
+        self.student.save()
+
+        response = self.client.get(reverse("main:export_employees", args=["csv"]), {"status": "student"})
+        lines = b"".join(response.streaming_content).decode("utf-8-sig").splitlines()
+        self.assertIn("'+48111; v@example.com", lines[1])
+        self.assertTrue(lines[1].endswith('"\'=HYPERLINK(""http://evil"")"'))
+
+        response = self.client.get(reverse("main:export_employees", args=["xlsx"]), {"status": "student"})
+        workbook = load_workbook(BytesIO(b"".join(response.streaming_content)))
+        cell = workbook.active.cell(row=2, column=16)
+        self.assertEqual((cell.value, cell.data_type), ('=HYPERLINK("http://evil")', "s"))
+
+    def test_rows_are_read_in_chunks(self):
+        rows = list(iter_export_rows({"language": "pl"}, chunk_size=1))
+
+        self.assertEqual(rows[0][1], "Nazwisko")
+        self.assertEqual([row[0] for row in rows[1:]], [self.student.pk, self.student.pk + 1])
+        self.assertEqual(rows[1][8], "Tak")
+
+    def test_unknown_format_is_404(self):
+        response = self.client.get(reverse("main:export_employees", args=["ods"]))
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(PRIVATE_MEDIA_ROOT=tempfile.mkdtemp())
+class ExportCacheTests(TestCase):
+    """Tests for the export artifact cache."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email="hr@example.com", password="pass12345")
+        self.client.force_login(self.user)
+        self.employee = Employee.objects.create(first_name="Valeriia", last_name="Tkach")
+
+    def make_file(self, size):
+        fd, path = tempfile.mkstemp(dir=settings.PRIVATE_MEDIA_ROOT)
+        with os.fdopen(fd, "wb") as f:
+            f.write(b"x" * size)
+        return path
+
+    def test_key_ignores_filter_noise_but_not_language_format_or_data(self):
+        key = export_cache_key({"status": ["student", "pit"], "page": ["2"], "language": "uk"}, "pdf")
+
+        self.assertEqual(key, export_cache_key({"status": ["pit", "student", ""], "language": "uk"}, "pdf"))
+        self.assertNotEqual(key, export_cache_key({"status": ["pit", "student"], "language": "pl"}, "pdf"))
+        self.assertNotEqual(key, export_cache_key({"status": ["pit", "student"], "language": "uk"}, "xlsx"))
+
+        self.employee.workplace = "Magazyn"
+        self.employee.save()
+        self.assertNotEqual(key, export_cache_key({"status": ["pit", "student"], "language": "uk"}, "pdf"))
+
+    def test_bulk_import_bumps_data_version(self):
+        version = DataVersion.current()
+        import_frames([make_raw_frame([[
+            "Koval Ivan", "30", "", "", "", "", "", "", "", "", "", "", "", "", "", "", "", "",
+        ]])])
+        self.assertGreater(DataVersion.current(), version)
+
+    def test_repeated_pdf_export_is_served_from_cache(self):
+        params = {"language": "uk"}
+        key = export_cache_key(params, "pdf")
+        generate_employees_pdf_task.apply(args=[params], kwargs={"user_id": self.user.pk, "cache_key": key}).get()
+
+        with patch("apps.main.tasks.generate_employees_pdf_task.delay") as delay:
+            response = self.client.get(reverse("main:export_pdf"))
+
+        delay.assert_not_called()
+        response = self.client.get(response.context["download_url"])
+        self.assertEqual(b"".join(response.streaming_content)[:4], b"%PDF")
+        self.assertEqual(ExportArtifact.objects.get(key=key).hits, 1)
+
+    def test_repeated_xlsx_export_is_served_from_cache(self):
+        url = reverse("main:export_employees", args=["xlsx"])
+        first = b"".join(self.client.get(url).streaming_content)
+
+        with patch("apps.main.exports.build_employees_xlsx") as build:
+            second = b"".join(self.client.get(url).streaming_content)
+
+        build.assert_not_called()
+        self.assertEqual(first, second)
+
+    def test_least_recently_used_files_are_evicted_by_total_size(self):
+        for key in ("a", "b", "c"):
+            store_export(key, self.make_file(100), f"{key}.pdf")
+        get_cached_export("a")
+
+        evicted = evict_exports(max_bytes=200)
+
+        self.assertEqual(evicted, 1)
+        self.assertEqual(sorted(ExportArtifact.objects.values_list("key", flat=True)), ["a", "c"])
+        self.assertFalse(os.path.exists(os.path.join(settings.PRIVATE_MEDIA_ROOT, "export_cache", "b.pdf")))
+
+
+REPORT_PRESETS = {
+    "students": {"title": "Студенти", "filters": {"status": ["student"]}, "formats": ["pdf", "xlsx"]},
+    "expiring_permits": {"title": "Дозволи", "filters": {"permit_expires_within": ["60"]}, "formats": ["xlsx"]},
+}
+
+
+@override_settings(PRIVATE_MEDIA_ROOT=tempfile.mkdtemp(), REPORT_PRESETS=REPORT_PRESETS, REPORT_LANGUAGES=["uk"])
+class ReportPresetTests(TestCase):
+    """Tests for the nightly pre-rendered report presets."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email="hr@example.com", password="pass12345")
+        self.client.force_login(self.user)
+        self.student = Employee.objects.create(first_name="Valeriia", last_name="Tkach", is_student=True)
+        Employee.objects.create(first_name="Ivan", last_name="Koval")
+
+    def test_presets_are_rendered_and_listed(self):
+        self.assertEqual(render_report_presets.apply().get(), 3)
+
+        report = ReportArtifact.objects.get(preset="students", format="xlsx", language="uk")
+        self.assertEqual(report.rows, 1)
+
+        response = self.client.get(reverse("main:reports"))
+        self.assertContains(response, reverse("main:download_report", args=["students", "pdf"]))
+        self.assertNotContains(response, "Дані змінились")
+
+        response = self.client.get(reverse("main:download_report", args=["students", "pdf"]))
+        self.assertEqual(b"".join(response.streaming_content)[:4], b"%PDF")
+
+    def test_unchanged_data_is_not_rendered_again(self):
+        render_report_presets()
+        generated_at = ReportArtifact.objects.get(preset="students", format="pdf").generated_at
+
+        render_report_presets()
+        self.assertEqual(ReportArtifact.objects.get(preset="students", format="pdf").generated_at, generated_at)
+
+        self.student.age = 21
+        self.student.save()
+        response = self.client.get(reverse("main:reports"))
+        self.assertContains(response, "Дані змінились")
+
+        render_report_presets()
+        self.assertGreater(ReportArtifact.objects.get(preset="students", format="pdf").generated_at, generated_at)
+
+    def test_date_relative_preset_is_rendered_again_next_day(self):
+        render_report_presets()
+        yesterday = date.today() - timedelta(days=1)
+        ReportArtifact.objects.update(rendered_on=yesterday)
+        students = ReportArtifact.objects.get(preset="students", format="pdf").generated_at
+
+        response = self.client.get(reverse("main:reports"))
+        self.assertContains(response, "Дані змінились")
+
+        render_report_presets()
+        self.assertEqual(ReportArtifact.objects.get(preset="students", format="pdf").generated_at, students)
+        self.assertEqual(
+            ReportArtifact.objects.get(preset="expiring_permits", format="xlsx").rendered_on, date.today()
+        )
+
+    def test_date_relative_export_key_changes_daily(self):
+        params = {"permit_expires_within": ["60"], "language": "uk"}
+        key = export_cache_key(params, "xlsx", 1)
+        self.assertEqual(key, export_cache_key(params, "xlsx", 1))
+
+        with patch("apps.main.export_cache.date") as mock_date:
+            mock_date.today.return_value = date.today() + timedelta(days=1)
+            self.assertNotEqual(key, export_cache_key(params, "xlsx", 1))
+            self.assertEqual(
+                export_cache_key({"status": ["student"], "language": "uk"}, "xlsx", 1),
+                export_cache_key({"status": ["student"], "language": "uk"}, "xlsx", 1),
+            )
+
+    def test_morning_export_with_preset_filters_hits_the_cache(self):
+        render_report_presets()
+
+        with patch("apps.main.tasks.generate_employees_pdf_task.delay") as delay:
+            response = self.client.get(reverse("main:export_pdf"), {"status": "student"})
+
+        delay.assert_not_called()
+        self.assertIn("download_url", response.context)
+
+    def test_expiring_permits_filter(self):
+        soon = Employee.objects.create(first_name="Oleh", last_name="Bondar")
+        WorkPermit.objects.create(employee=soon, end_date=date.today() + timedelta(days=30))
+        WorkPermit.objects.create(employee=self.student, end_date=date.today() - timedelta(days=1))
+        dismissed = Employee.objects.create(first_name="Petro", last_name="Lys", working_status="Zwolniony")
+        WorkPermit.objects.create(employee=dismissed, end_date=date.today() + timedelta(days=30))
+
+        qs = EmployeeMultiFilter({"permit_expires_within": "60"}, queryset=Employee.objects.all()).qs
+        self.assertEqual(list(qs), [soon])
+
+
+class ExpiryEntryTests(TestCase):
+    """Tests for the unified expiry calendar."""
+
+    def setUp(self):
+        self.employee = Employee.objects.create(first_name="Valeriia", last_name="Tkach")
+        self.today = date.today()
+
+    def entries(self):
+        return set(ExpiryEntry.objects.values_list("source", "expires_on", "employee_dismissed"))
+
+    def test_every_dated_record_is_indexed_on_save(self):
+        Document.objects.create(employee=self.employee, doc_type="Paszport", valid_until=self.today)
+        WorkPermit.objects.create(employee=self.employee, end_date=self.today + timedelta(days=1))
+        Sanepid.objects.create(employee=self.employee, end_date=self.today + timedelta(days=2))
+        EmploymentPeriod.objects.create(
+            employee=self.employee, start_date=self.today, end_date=self.today + timedelta(days=3)
+        )
+        self.employee.student_end_date = self.today + timedelta(days=4)
+        self.employee.save()
+
+        self.assertEqual(self.entries(), {
+            ("document", self.today, False),
+            ("work_permit", self.today + timedelta(days=1), False),
+            ("sanepid", self.today + timedelta(days=2), False),
+            ("employment_period", self.today + timedelta(days=3), False),
+            ("student", self.today + timedelta(days=4), False),
+        })
+        self.assertEqual(ExpiryEntry.objects.get(source="document").label, "Paszport")
+
+    def test_date_changes_deletes_and_dismissal_are_reflected(self):
+        permit = WorkPermit.objects.create(employee=self.employee, end_date=self.today)
+        document = Document.objects.create(employee=self.employee, valid_until=self.today)
+
+        permit.end_date = self.today + timedelta(days=9)
+        permit.save()
+        document.delete()
+        self.assertEqual(self.entries(), {("work_permit", self.today + timedelta(days=9), False)})
+
+        self.employee.working_status = "Zwolniony"
+        self.employee.save()
+        self.assertEqual(self.entries(), {("work_permit", self.today + timedelta(days=9), True)})
+        self.assertFalse(expiring_between(self.today, self.today + timedelta(days=30)).exists())
+
+        permit.end_date = None
+        permit.save()
+        self.assertEqual(self.entries(), set())
+
+    def test_rebuild_after_bulk_writes(self):
+        WorkPermit.objects.bulk_create([WorkPermit(employee=self.employee, end_date=self.today)])
+        Employee.objects.filter(pk=self.employee.pk).update(student_end_date=self.today)
+        self.assertEqual(self.entries(), set())
+
+        self.assertEqual(rebuild_expiry_entries([self.employee.pk]), 2)
+        self.assertEqual(self.entries(), {("work_permit", self.today, False), ("student", self.today, False)})
+
+
+class BadgeCounterTests(TestCase):
+    """Tests for the cached header badge counters."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email="hr@example.com", password="pass12345")
+        self.other = User.objects.create_user(email="ops@example.com", password="pass12345")
+        self.admin = User.objects.create_superuser(email="admin@example.com", password="pass12345")
+
+    def create_task(self, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Task.objects.create(title="Check documents", created_by=self.admin, **kwargs)
+
+    def test_counts_are_read_from_cache_until_a_task_changes(self):
+        task = self.create_task(assigned_to=self.user)
+        self.assertEqual(task_count(self.user), 1)
+        self.assertEqual(task_count(self.admin), 0)
+        with self.assertNumQueries(0):
+            self.assertEqual(task_count(self.user), 1)
+
+        # Перепризначення змінює лічильники обох користувачів
+        task.assigned_to = self.other
+        task.status = "completed"
+        with self.captureOnCommitCallbacks(execute=True):
+            task.save()
+        self.assertEqual(task_count(self.user), 0)
+        self.assertEqual(task_count(self.other), 1)
+        self.assertEqual(task_count(self.admin), 1)
+
+    @patch("apps.main.edit_locks.publish_lock_changed")
+    def test_lock_and_badges_survive_employee_save(self, mock_publish):
+        employee = Employee.objects.create(first_name="Ivan", last_name="Koval")
+        self.create_task(assigned_to=self.user)
+        set_lock(employee.pk, self.other.pk)
+        self.assertEqual(task_count(self.user), 1)
+        notification_count()
+        list_key = employee_list_key("count", "")
+
+        employee.age = 30
+        employee.save()
+
+        self.assertEqual(lock_holder(employee.pk), self.other.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(task_count(self.user), 1)
+            self.assertEqual(notification_count(), 0)
+        self.assertNotEqual(employee_list_key("count", ""), list_key)
+
+    def test_notification_count_follows_document_changes(self):
+        employee = Employee.objects.create(first_name="Ivan", last_name="Koval")
+        self.assertEqual(notification_count(), 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            document = Document.objects.create(employee=employee, valid_until=date.today() + timedelta(days=10))
+        self.assertEqual(notification_count(), 1)
+        with self.assertNumQueries(0):
+            notification_count()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            document.delete()
+        self.assertEqual(notification_count(), 0)
+
+    def test_badges_endpoint_and_lazy_context(self):
+        self.create_task(assigned_to=self.user)
+        self.client.force_login(self.user)
+
+        response = self.client.get(reverse("main:badges"))
+        self.assertContains(response, 'id="badge-tasks" hx-swap-oob="true">1<')
+        self.assertTrue(callable(response.context["available_tasks_count"]))
+
+
+class MarkWorkingStatusTests(TestCase):
+    """Tests for the set-based nightly dismissal of employees."""
+
+    def setUp(self):
+        self.system = User.objects.create_user(email="system@example.com", password="pass12345")
+        yesterday = date.today() - timedelta(days=1)
+
+        self.ended = Employee.objects.create(first_name="Ivan", last_name="Koval", working_status="Pracujący")
+        EmploymentPeriod.objects.create(employee=self.ended, start_date=date(2024, 1, 1), end_date=yesterday)
+        WorkPermit.objects.create(employee=self.ended, end_date=date.today() + timedelta(days=10))
+
+        self.current = Employee.objects.create(first_name="Olena", last_name="Bondar", working_status="Pracujący")
+        EmploymentPeriod.objects.create(employee=self.current, start_date=date(2024, 1, 1), end_date=date.today())
+
+        self.dismissed = Employee.objects.create(first_name="Petro", last_name="Lys", working_status="Zwolniony")
+        EmploymentPeriod.objects.create(employee=self.dismissed, start_date=date(2024, 1, 1), end_date=yesterday)
+
+    def status_history(self):
+        return list(History.objects.filter(field_name="working_status").values_list(
+            "object_id", "old_value", "new_value", "changed_by_id"
+        ))
+
+    @override_settings(SYSTEM_USER_EMAIL="system@example.com")
+    def test_dismisses_once_and_logs_previous_status(self):
+        self.assertEqual(mark_working_status(), 1)
+        self.assertEqual(mark_working_status(), 0)
+
+        self.assertEqual(
+            dict(Employee.objects.values_list("id", "working_status")),
+            {self.ended.id: "Zwolniony", self.current.id: "Pracujący", self.dismissed.id: "Zwolniony"},
+        )
+        self.assertEqual(self.status_history(), [(self.ended.id, "Pracujący", "Zwolniony", self.system.id)])
+        self.assertTrue(ExpiryEntry.objects.get(employee=self.ended, source="work_permit").employee_dismissed)
+
+    @override_settings(SYSTEM_USER_EMAIL="missing@example.com")
+    def test_missing_system_user_is_not_fatal(self):
+        self.assertEqual(mark_working_status(), 1)
+        self.assertEqual(self.status_history(), [(self.ended.id, "Pracujący", "Zwolniony", None)])
+
+
+SAMPLE_JOB_CALLS = []
+
+
+@shared_task
+@single_run(name="tests.sample_job", lease=60)
+def sample_job(fail=False):
+    SAMPLE_JOB_CALLS.append(fail)
+    if fail:
+        raise RuntimeError("boom")
+    return len(SAMPLE_JOB_CALLS)
+
+
+class SingleRunJobTests(TestCase):
+    """Tests for the single-run lease lock and per-slot dedupe of beat jobs."""
+
+    def setUp(self):
+        SAMPLE_JOB_CALLS.clear()
+        self.redis = fakeredis.FakeRedis()
+        patcher = patch("apps.main.jobs.lock_client", return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_same_slot_runs_once(self):
+        self.assertEqual(sample_job.apply().get(), 1)
+        self.assertIsNone(sample_job.apply().get())
+
+        run = JobRun.objects.get(name="tests.sample_job")
+        self.assertEqual((run.status, run.result, run.skipped), (JobRun.SUCCEEDED, "1", 1))
+        self.assertEqual(run.slot, date.today().isoformat())
+        self.assertIsNotNone(run.duration)
+        self.assertEqual(SAMPLE_JOB_CALLS, [False])
+        self.assertEqual(self.redis.keys(), [])
+
+    def test_held_lease_skips_the_run(self):
+        self.assertTrue(LeaseLock(self.redis, "tests.sample_job").acquire())
+
+        self.assertIsNone(sample_job.apply().get())
+        self.assertEqual(SAMPLE_JOB_CALLS, [])
+        self.assertFalse(JobRun.objects.exists())
+
+    def test_failed_or_abandoned_run_is_taken_over(self):
+        self.assertIsInstance(sample_job.apply(kwargs={"fail": True}).result, RuntimeError)
+        self.assertEqual(JobRun.objects.get().status, JobRun.FAILED)
+
+        self.assertEqual(sample_job.apply().get(), 2)
+        self.assertEqual(JobRun.objects.get().status, JobRun.SUCCEEDED)
+
+        # Воркер помер посеред запуску: рядок "running", але оренди в Redis вже немає
+        JobRun.objects.update(status=JobRun.RUNNING)
+        self.assertEqual(sample_job.apply().get(), 3)
+
+    def test_lease_is_owned_by_its_token(self):
+        first = LeaseLock(self.redis, "job", lease=60)
+        second = LeaseLock(self.redis, "job", lease=60)
+        self.assertTrue(first.acquire())
+        self.assertFalse(second.acquire())
+        self.assertFalse(second.release())
+        self.assertTrue(first.renew())
+        self.assertTrue(first.release())
+        self.assertTrue(second.acquire())
+
+    def test_direct_call_bypasses_locking(self):
+        self.assertEqual(sample_job(), 1)
+        self.assertFalse(JobRun.objects.exists())
+
+
+class QueueRoutingTests(TestCase):
+    """Tests for task routing, per-queue limits and queue latency metrics."""
+
+    def setUp(self):
+        cache.clear()
+
+    def routed_queue(self, task_name):
+        return celery_app.amqp.router.route({}, task_name)["queue"].name
+
+    def test_tasks_are_routed_to_their_queues(self):
+        self.assertEqual(self.routed_queue(generate_employees_pdf_task.name), "exports")
+        self.assertEqual(self.routed_queue(mark_working_status.name), "maintenance")
+        self.assertEqual(self.routed_queue(send_invitation_email_task.name), "email")
+        self.assertEqual(self.routed_queue(backup_postgres.name), "backups")
+        self.assertEqual(self.routed_queue("apps.unknown.task"), settings.CELERY_TASK_DEFAULT_QUEUE)
+
+        limits = settings.WORKER_QUEUES["exports"]
+        self.assertEqual(generate_employees_pdf_task.soft_time_limit, limits["soft_time_limit"])
+        self.assertEqual(generate_employees_pdf_task.time_limit, limits["time_limit"])
+
+    def test_latency_is_measured_from_publish_to_start(self):
+        headers = {}
+        stamp_published_at(headers=headers)
+
+        class FakeTask:
+            class request:
+                published_at = headers["published_at"] - 5
+                delivery_info = {"routing_key": "exports"}
+
+        record_latency(task=FakeTask)
+        record_latency(task=FakeTask)
+
+        stats = queue_latency("exports")
+        self.assertEqual(stats["count"], 2)
+        self.assertGreaterEqual(stats["last"], 5)
+        self.assertIsNone(queue_latency("email"))
+
+    def test_invitation_is_queued_after_commit(self):
+        user = User.objects.create_user(email="hr@example.com", password="pass12345")
+        self.client.force_login(user)
+
+        with patch.object(send_invitation_email_task, "delay") as delay, \
+                self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("main:invites"), {"email": "new@example.com"})
+
+        invite = InviteToken.objects.get(email="new@example.com")
+        delay.assert_called_once_with(invite.pk, ANY, "uk")
+        self.assertIn(str(invite.token), delay.call_args.args[1])
+        self.assertEqual(invite.email_status, InviteToken.EMAIL_QUEUED)
+
+    def test_invitation_outcome_is_recorded(self):
+        invite = InviteToken.objects.create(email="new@example.com", expires_at=timezone.now() + timedelta(days=7))
+
+        with patch("apps.main.emails.send_invitation_email"):
+            send_invitation_email_task.apply(args=[invite.pk, "http://testserver/register/"])
+        invite.refresh_from_db()
+        self.assertEqual(invite.email_status, InviteToken.EMAIL_SENT)
+        self.assertIsNotNone(invite.email_sent_at)
+
+        # Збій SMTP після всіх повторів
+        with patch("apps.main.emails.send_invitation_email", side_effect=ConnectionRefusedError("smtp down")), \
+                patch.object(send_invitation_email_task, "max_retries", 0):
+            send_invitation_email_task.apply(args=[invite.pk, "http://testserver/register/"])
+        invite.refresh_from_db()
+        self.assertEqual(invite.email_status, InviteToken.EMAIL_FAILED)
+        self.assertEqual(invite.email_error, "smtp down")
+
+
+@shared_task(bind=True, max_retries=1)
+def rename_employees_task(self, retry=False, fail=False):
+    updated = Employee.objects.update(workplace="Warehouse")
+    if fail:
+        raise RuntimeError("boom")
+    if retry and not self.request.retries:
+        raise self.retry(countdown=0)
+    return updated
+
+
+class TaskInstrumentationTests(TestCase):
+    """Tests for per-execution task metrics, the metrics endpoint and the dashboard."""
+
+    def setUp(self):
+        for n in range(3):
+            Employee.objects.create(first_name=f"Name{n}", last_name=f"Surname{n}")
+        self.admin = User.objects.create_user(email="admin@example.com", password="pass12345", is_superuser=True)
+
+    def test_execution_is_recorded_with_rows_and_runtime(self):
+        self.assertEqual(rename_employees_task.apply().get(), 3)
+
+        execution = TaskExecution.objects.get()
+        self.assertEqual(execution.name, rename_employees_task.name)
+        self.assertEqual(execution.state, TaskExecution.SUCCEEDED)
+        self.assertEqual(execution.rows, 3)
+        self.assertGreaterEqual(execution.queries, 1)
+        self.assertGreaterEqual(execution.runtime, 0)
+        self.assertGreaterEqual(execution.rss_delta, 0)
+
+    def test_retries_and_failures_are_recorded(self):
+        rename_employees_task.apply(kwargs={"retry": True})
+        self.assertEqual(
+            list(TaskExecution.objects.order_by("retries").values_list("state", "retries")),
+            [(TaskExecution.RETRY, 0), (TaskExecution.SUCCEEDED, 1)],
+        )
+
+        rename_employees_task.apply(kwargs={"fail": True}, task_id="failing-run")
+        failed = TaskExecution.objects.get(task_id="failing-run")
+        self.assertEqual(failed.state, TaskExecution.FAILED)
+        self.assertIn("boom", failed.error)
+
+        summary = {row["name"]: row for row in task_summary(timezone.now() - timedelta(hours=1))}
+        self.assertEqual(summary[rename_employees_task.name]["runs"], 3)
+        self.assertEqual(summary[rename_employees_task.name]["retries"], 1)
+        self.assertEqual(summary[rename_employees_task.name]["failures"], 1)
+
+    @patch("apps.main.queues.queue_depths", return_value={})
+    def test_metrics_endpoint_requires_superuser_or_token(self, queue_depths):
+        rename_employees_task.apply()
+        url = reverse("main:metrics")
+
+        self.assertEqual(self.client.get(url).status_code, 403)
+        with override_settings(METRICS_TOKEN="secret"):
+            response = self.client.get(url, HTTP_AUTHORIZATION="Bearer secret")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(f'celery_task_runs{{task="{rename_employees_task.name}"}} 1', response.content.decode())
+
+        self.client.force_login(self.admin)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_prometheus_metrics_include_queues(self):
+        text = prometheus_metrics([], [{"queue": "email", "depth": 4, "latency": {"avg": 1.5}}])
+        self.assertIn('celery_queue_depth{queue="email"} 4', text)
+        self.assertIn('celery_queue_latency_seconds{queue="email"} 1.5', text)
+
+    def test_dashboard_is_superuser_only(self):
+        rename_employees_task.apply()
+        user = User.objects.create_user(email="hr@example.com", password="pass12345")
+        self.client.force_login(user)
+        self.assertEqual(self.client.get(reverse("main:task_metrics")).status_code, 403)
+
+        self.client.force_login(self.admin)
+        with patch("apps.main.queues.queue_depths", side_effect=OSError("no broker")):
+            response = self.client.get(reverse("main:task_metrics"))
+        self.assertContains(response, rename_employees_task.name)
+
+    def test_old_executions_are_cleaned_up(self):
+        rename_employees_task.apply()
+        TaskExecution.objects.update(started_at=timezone.now() - timedelta(days=40))
+        rename_employees_task.apply()
+
+        self.assertEqual(cleanup_task_executions(), 1)
+        self.assertEqual(TaskExecution.objects.count(), 1)
+
+
+def fake_pg_tools(cmd, **kwargs):
+    """Stands in for pg_dump / pg_restore: writes a tiny directory-format dump."""
+    if cmd[0] == "pg_dump":
+        target = cmd[cmd.index("-f") + 1]
+        os.makedirs(target)
+        for name, content in (("toc.dat", b"toc"), ("3001.dat.gz", b"rows" * 100)):
+            with open(os.path.join(target, name), "wb") as f:
+                f.write(content)
+        return subprocess.CompletedProcess(cmd, 0, stdout="", stderr="")
+    return subprocess.CompletedProcess(
+        cmd, 0, stdout=";\n; Archive created\n;\n3001; 0 16386 TABLE DATA public employee postgres\n", stderr=""
+    )
+
+
+class DatabaseBackupTests(TestCase):
+    """Tests for the verified backup pipeline, retention and backup metrics."""
+
+    def setUp(self):
+        self.backup_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.backup_dir, ignore_errors=True)
+        override = override_settings(BACKUP_DIR=self.backup_dir)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def make_backup(self, name, days_ago=0, size=100, status=DatabaseBackup.VERIFIED):
+        path = os.path.join(self.backup_dir, name)
+        os.makedirs(path)
+        return DatabaseBackup.objects.create(
+            name=name, path=path, status=status, size=size,
+            started_at=timezone.now() - timedelta(days=days_ago),
+        )
+
+    def test_checksums_detect_changed_files(self):
+        with open(os.path.join(self.backup_dir, "toc.dat"), "wb") as f:
+            f.write(b"toc")
+        self.assertEqual(write_checksums(self.backup_dir), (3, 1))
+        self.assertEqual(verify_checksums(self.backup_dir), [])
+
+        with open(os.path.join(self.backup_dir, "toc.dat"), "ab") as f:
+            f.write(b"!")
+        self.assertEqual(verify_checksums(self.backup_dir), ["toc.dat"])
+
+    @patch("apps.main.backups.subprocess.run", side_effect=fake_pg_tools)
+    def test_backup_is_dumped_in_parallel_and_verified(self, run):
+        backup = create_backup(jobs=4)
+
+        dump_cmd = run.call_args_list[0].args[0]
+        self.assertEqual(dump_cmd[dump_cmd.index("-F") + 1], "d")
+        self.assertEqual(dump_cmd[dump_cmd.index("-j") + 1], "4")
+        self.assertEqual(run.call_args_list[1].args[0][:2], ["pg_restore", "--list"])
+
+        self.assertEqual(backup.status, DatabaseBackup.VERIFIED)
+        self.assertEqual((backup.files, backup.size, backup.toc_entries), (2, 403, 1))
+        self.assertIsNotNone(backup.dump_duration)
+        self.assertEqual(os.listdir(self.backup_dir), [backup.name])
+        self.assertEqual(verify_checksums(backup.path), [])
+
+    @patch("apps.main.backups.subprocess.run",
+           side_effect=subprocess.CalledProcessError(1, "pg_dump", stderr="connection refused"))
+    def test_failed_dump_is_recorded_and_cleaned_up(self, run):
+        with self.assertRaisesMessage(BackupError, "connection refused"):
+            create_backup()
+
+        backup = DatabaseBackup.objects.get()
+        self.assertEqual(backup.status, DatabaseBackup.FAILED)
+        self.assertEqual(os.listdir(self.backup_dir), [])
+        self.assertEqual(backup_stats()["failures"], 1)
+
+    def test_retention_respects_count_age_and_size(self):
+        backups = [self.make_backup(f"db_backup_{n}", days_ago=n) for n in range(6)]
+
+        self.assertEqual(prune_backups(keep_min=2, keep_max=4, max_age_days=30, max_bytes=10 ** 6), 2)
+        self.assertEqual(
+            list(DatabaseBackup.objects.values_list("name", flat=True)),
+            [backup.name for backup in backups[:4]],
+        )
+        self.assertFalse(os.path.exists(backups[5].path))
+
+        # Older than max_age or over the size budget, but within keep_min
+        self.assertEqual(prune_backups(keep_min=2, keep_max=10, max_age_days=0, max_bytes=150), 2)
+        self.assertEqual(DatabaseBackup.objects.count(), 2)
+
+    def test_metrics_report_latest_backup(self):
+        backup = self.make_backup("db_backup_latest", size=2048)
+        DatabaseBackup.objects.filter(pk=backup.pk).update(
+            dump_duration=12.5, verify_duration=1.0, finished_at=timezone.now()
+        )
+
+        text = prometheus_metrics([], backups=backup_stats())
+        self.assertIn("db_backup_count 1", text)
+        self.assertIn("db_backup_last_size_bytes 2048", text)
+        self.assertIn("db_backup_last_dump_seconds 12.5", text)
+
+    @skipUnless(shutil.which("pg_dump") and shutil.which("pg_restore"), "PostgreSQL client tools are not installed")
+    def test_backup_of_the_test_database(self):
+        backup = create_backup(jobs=2)
+
+        self.assertEqual(backup.status, DatabaseBackup.VERIFIED)
+        self.assertGreater(backup.toc_entries, 0)
+        self.assertEqual(verify_checksums(backup.path), [])
 
-# Create your tests here.
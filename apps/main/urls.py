@@ -14,8 +14,20 @@ urlpatterns = [
     path('invites/', views.invites_for_register, name='invites'),
     path('tasks/', views.TasksBoardView.as_view(), name='tasks_board'),
     path('expired-docs/', views.expired_docs, name='expired_docs'),
+    path('badges/', views.badges, name='badges'),
     path('export-pdf/', views.export_employees_pdf, name='export_pdf'),
+    path('export-pdf/<str:task_id>/', views.export_pdf_status, name='export_pdf_status'),
+    path('export/<str:fmt>/', views.export_employees, name='export_employees'),
+    path('exports/<str:token>/', views.download_export, name='download_export'),
+    path('reports/', views.reports, name='reports'),
+    path('reports/<str:preset>/<str:fmt>/', views.download_report, name='download_report'),
+    path('import/', views.import_employees, name='import_employees'),
+    path('import/<int:job_id>/', views.import_job_status, name='import_job_status'),
+    path('import/<int:job_id>/confirm/', views.import_job_confirm, name='import_job_confirm'),
+    path('import/<int:job_id>/cancel/', views.import_job_cancel, name='import_job_cancel'),
     path('lock-employee/', views.lock_employee, name='lock_employee'),
     path('unlock-employee/', views.unlock_employee, name='unlock_employee'),
     path('history/', views.HistoryListView.as_view(), name='history_list'),
+    path('task-metrics/', views.task_metrics, name='task_metrics'),
+    path('metrics/', views.metrics, name='metrics'),
 ]
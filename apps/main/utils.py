@@ -27,4 +27,27 @@ def set_change_user(user):
     _user.value = user
 
 def get_change_user():
-    return getattr(_user, "value", None)
\ No newline at end of file
+    return getattr(_user, "value", None)
+
+
+def get_system_user():
+    """
+    Автор змін, які робить не людина (нічні задачі): користувач з
+    settings.SYSTEM_USER_EMAIL. Якщо не налаштований або не існує — None,
+    і історія пишеться без автора замість падіння задачі.
+    """
+    from django.conf import settings
+    from apps.users.models import User
+
+    email = getattr(settings, "SYSTEM_USER_EMAIL", "")
+    if not email:
+        return None
+    return User.objects.filter(email=email).first()
+
+
+def private_storage():
+    """Сховище для файлів, які не можна віддавати публічно через /media/"""
+    from django.conf import settings
+    from django.core.files.storage import FileSystemStorage
+
+    return FileSystemStorage(location=settings.PRIVATE_MEDIA_ROOT)
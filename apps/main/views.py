@@ -5,17 +5,17 @@ from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.core.paginator import Paginator, PageNotAnInteger, EmptyPage
-from django.http import HttpResponseRedirect, HttpResponse
+from django.http import HttpResponseRedirect, HttpResponse, FileResponse, Http404
+from django.core.exceptions import PermissionDenied
+from django.utils.crypto import constant_time_compare
 from django.shortcuts import render, get_object_or_404, redirect
 from django.urls import reverse_lazy, reverse
 from django.utils import timezone
 from django.contrib import messages
 from django.contrib.contenttypes.models import ContentType
 from django.core.cache import cache
+from django.core import signing
 from django.utils.translation import gettext as _
-from django.core.mail import EmailMultiAlternatives
-from email.mime.image import MIMEImage
-from django.template.loader import render_to_string
 from django.views.generic import TemplateView, ListView
 from django.db import transaction
 from django.db.models import Case, When, IntegerField
@@ -29,6 +29,9 @@ from datetime import timedelta
 from .forms import EmployeeCompleteForm, ContactFormSet
 from .filters import EmployeeMultiFilter
 from .utils import set_change_user
+from .badges import notification_count, user_badges
+from .employee_cache import employee_list_key
+from .edit_locks import active_locks, add_lock, lock_holder, release_lock, set_lock
 
 
 class DashboardView(LoginRequiredMixin, TemplateView):
@@ -149,8 +152,7 @@ class DashboardView(LoginRequiredMixin, TemplateView):
         employee = get_object_or_404(Employee, id=employee_id)
 
         # Check lock
-        lock_key = f"employee_edit_lock:{employee_id}"
-        locked_by = cache.get(lock_key)
+        locked_by = lock_holder(employee_id)
 
         if locked_by and locked_by != request.user.id:
             messages.warning(request, "Цей співробітник зараз редагується іншим користувачем")
@@ -174,7 +176,7 @@ class DashboardView(LoginRequiredMixin, TemplateView):
                 contact_formset.save()
 
                 # Unlock employee
-                cache.delete(lock_key)
+                release_lock(employee_id)
 
                 messages.success(request, "Дані співробітника оновлено")
 
@@ -210,7 +212,6 @@ class DashboardView(LoginRequiredMixin, TemplateView):
             request.GET,
             queryset=self.base_queryset
         )
-        context['employees'] = self.get_paginated_employees(request)
 
         return render(request, 'main/partials/employees_table.html', context)
 
@@ -218,8 +219,7 @@ class DashboardView(LoginRequiredMixin, TemplateView):
         """Render employee form modal"""
         if mode == 'edit' and employee_id:
             # Check and set lock
-            lock_key = f"employee_edit_lock:{employee_id}"
-            locked_by = cache.get(lock_key)
+            locked_by = lock_holder(employee_id)
 
             if locked_by and locked_by != request.user.id:
                 return render(request, 'main/partials/error_message.html', {
@@ -227,7 +227,7 @@ class DashboardView(LoginRequiredMixin, TemplateView):
                 })
 
             # Set lock
-            cache.set(lock_key, request.user.id, timeout=300)
+            set_lock(employee_id, request.user.id)
 
             employee = get_object_or_404(Employee, id=employee_id)
 
@@ -335,7 +335,7 @@ class DashboardView(LoginRequiredMixin, TemplateView):
         """Get filtered employees with caching"""
         params = request.GET.copy()
         params.pop("page", None)
-        cache_key = "filtered:" + params.urlencode()
+        cache_key = employee_list_key("filtered", params.urlencode())
 
         ids = cache.get(cache_key)
         if ids is None:
@@ -412,7 +412,7 @@ class DashboardView(LoginRequiredMixin, TemplateView):
                 request.GET, queryset=self.base_queryset
             )
 
-        count_key = "count:" + params.urlencode()
+        count_key = employee_list_key("count", params.urlencode())
         total_count = cache.get(count_key)
 
         if total_count is None:
@@ -426,6 +426,8 @@ class DashboardView(LoginRequiredMixin, TemplateView):
             "current_ordering": current_ordering,
             "ordering_info": ordering_info,
             "total_count": total_count,
+            # Блокування, взяті до завантаження сторінки (події lock їх вже не покажуть)
+            "edit_locks": active_locks([employee.id for employee in paginated]),
         }
 
     def get_context_data(self, **kwargs):
@@ -451,6 +453,8 @@ class DashboardView(LoginRequiredMixin, TemplateView):
 @login_required
 def invites_for_register(request):
     """Головна сторінка (захищена)"""
+    from apps.main.tasks import send_invitation_email_task
+
     if request.method == "POST":
         email = request.POST.get("email")
         if not email:
@@ -466,10 +470,14 @@ def invites_for_register(request):
 
         expires_at = timezone.now() + timedelta(days=7)
         invite = InviteToken.objects.create(email=email, expires_at=expires_at)
-        if send_invitation_email(invite, request):
-            messages.success(request, _("Запрошення успішно відправлено!"))
-        else:
-            messages.error(request, _("Помилка відправки запрошення"))
+        registration_url = request.build_absolute_uri(
+            reverse('accounts:register_page') + f'?invite={invite.token}'
+        )
+        # Лист надсилає воркер черги email (з повторами при збоях SMTP)
+        transaction.on_commit(lambda: send_invitation_email_task.delay(
+            invite.pk, registration_url, request.LANGUAGE_CODE
+        ))
+        messages.success(request, _("Запрошення поставлено в чергу на відправку"))
 
         return redirect("main:invites")
 
@@ -527,8 +535,11 @@ def tasks_board(request):
 @login_required
 def expired_docs(request):
     """Сторінка з документами, термін дії яких закінчується"""
-    notifications = Notification.objects.select_related("document", "work_permit").order_by('days_left')
-    notifications_count = notifications.count()
+    # days_left рахується з expires_on, тож сортування йде по індексу (expires_on, id)
+    notifications = Notification.objects.select_related(
+        "employee", "document", "work_permit"
+    ).order_by('expires_on', 'id')
+    notifications_count = notification_count()
     
     return render(request, 'main/expired_docs.html', {
         'user': request.user,
@@ -537,75 +548,12 @@ def expired_docs(request):
     })
 
 
-def send_invitation_email(invite, request):
-    try:
-        registration_url = request.build_absolute_uri(
-            reverse('accounts:register_page') + f'?invite={invite.token}'
-        )
-
-        context = {
-            'email': invite.email,
-            'registration_url': registration_url,
-            'expires_at': invite.expires_at,
-            'days_valid': 7,
-        }
-
-        subject = _("Посилання на реєстрацію Akorasp")
-        from_email = settings.DEFAULT_FROM_EMAIL
-        to = [invite.email]
-
-        text_content = _(
-            "Вітаємо!\n\n"
-            "Вас запросили зареєструватися на Akorasp.\n\n"
-            "Посилання для реєстрації: {url}\n\n"
-            "Це запрошення дійсне протягом {days} днів.\n\n"
-            "З найкращими побажаннями,\n"
-            "Команда Akorasp"
-        ).format(url=registration_url, days=7)
-
-        html_content = render_to_string("email/invitation_email.html", context)
-
-        msg = EmailMultiAlternatives(
-            subject,
-            text_content,
-            from_email,
-            to,
-            headers={
-                'X-Priority': '3',
-                'X-MSMail-Priority': 'Normal',
-                'Importance': 'Normal',
-                'List-Unsubscribe': f'<mailto:{from_email}?subject=unsubscribe>',
-                'Precedence': 'bulk',
-            }
-        )
-        msg.attach_alternative(html_content, "text/html")
-
-        attach_logo_to_email(msg)
-
-        msg.send()
-        return True
-
-    except Exception as e:
-        import logging
-        logger = logging.getLogger(__name__)
-        logger.error(f"Failed to send invitation email to {invite.email}: {str(e)}")
-        return False
-
-
-def attach_logo_to_email(msg):
-    logo_path = os.path.join(settings.BASE_DIR, "static/images/logo.png")
-
-    if os.path.exists(logo_path):
-        try:
-            with open(logo_path, "rb") as f:
-                logo = MIMEImage(f.read())
-                logo.add_header("Content-ID", "<logo>")
-                logo.add_header("Content-Disposition", "inline", filename="logo.png")
-                msg.attach(logo)
-        except Exception as e:
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.warning(f"Failed to attach logo to email: {str(e)}")
+@login_required
+def badges(request):
+    """Лічильники бейджів з кешу (out-of-band swap, без COUNT-запитів)"""
+    return render(request, 'main/includes/badges.html', {
+        'badges': user_badges(request.user),
+    })
 
 
 @login_required
@@ -623,15 +571,13 @@ def lock_employee(request):
                 f"Lock request: employee_id={employee_id}, user={request.user.id}")
 
             if employee_id:
-                lock_key = f"employee_edit_lock:{employee_id}"
-
                 # Перевіряємо поточний стан блокування
-                locked_by = cache.get(lock_key)
+                locked_by = lock_holder(employee_id)
                 logger.info(f"Current lock status: locked_by={locked_by}")
 
                 # Якщо блокування вже встановлене НАМИ - оновлюємо час
                 if locked_by == request.user.id:
-                    cache.set(lock_key, request.user.id, timeout=300)
+                    set_lock(employee_id, request.user.id)
                     logger.info(f"Lock refreshed for employee {employee_id}")
                     return HttpResponse(json.dumps({"success": True}), content_type="application/json", status=200)
 
@@ -647,14 +593,14 @@ def lock_employee(request):
                     )
 
                 # ✅ АТОМАРНА ОПЕРАЦІЯ: встановлюємо блокування тільки якщо його немає
-                was_added = cache.add(lock_key, request.user.id, timeout=300)
+                was_added = add_lock(employee_id, request.user.id)
 
                 if was_added:
                     logger.info(f"Lock set for employee {employee_id}")
                     return HttpResponse(json.dumps({"success": True}), content_type="application/json", status=200)
                 else:
                     # Хтось встиг встановити блокування між нашою перевіркою і спробою встановити
-                    locked_by = cache.get(lock_key)
+                    locked_by = lock_holder(employee_id)
                     logger.warning(
                         f"Race condition: employee {employee_id} was locked by user {locked_by}")
                     return HttpResponse(
@@ -684,13 +630,12 @@ def unlock_employee(request):
             logger.info(f"Unlock request: employee_id={employee_id}, user={request.user.id}")
             
             if employee_id:
-                lock_key = f"employee_edit_lock:{employee_id}"
-                locked_by = cache.get(lock_key)
+                locked_by = lock_holder(employee_id)
                 logger.info(f"Lock status: locked_by={locked_by}")
                 
                 # Знімаємо блокування тільки якщо воно встановлене поточним користувачем
                 if locked_by and locked_by == request.user.id:
-                    cache.delete(lock_key)
+                    release_lock(employee_id)
                     logger.info(f"Lock removed for employee {employee_id}")
                     return HttpResponse(json.dumps({"success": True}), content_type="application/json", status=200)
                 elif not locked_by:
@@ -709,38 +654,315 @@ def unlock_employee(request):
     return HttpResponse(status=400)
 
 
+EXPORT_SIGNING_SALT = "main.export-download"
+
+
 @login_required
 def export_employees_pdf(request):
-    """Експорт співробітників у PDF через Celery"""
+    """
+    Ставить генерацію PDF у чергу Celery і одразу повертає фрагмент статусу.
+    Якщо такий самий PDF (ті ж фільтри, мова і версія даних) уже є в кеші — одразу посилання.
+    """
     from apps.main.tasks import generate_employees_pdf_task
-    import logging
-
-    logger = logging.getLogger(__name__)
-    logger.info("Starting PDF export via Celery")
+    from apps.main.export_cache import export_cache_key, get_cached_export
 
     # Додаємо мову до параметрів
     params = dict(request.GET)
     params['language'] = request.LANGUAGE_CODE
 
-    # Запускаємо задачу в Celery
-    task = generate_employees_pdf_task.delay(params)
-    
-    # Чекаємо на результат (з таймаутом 120 секунд)
+    cache_key = export_cache_key(params, 'pdf')
+    artifact = get_cached_export(cache_key)
+    if artifact:
+        return render(request, 'main/partials/export_status.html', {
+            'download_url': export_download_url(request.user, artifact.path, artifact.filename),
+        })
+
+    task = generate_employees_pdf_task.delay(params, user_id=request.user.pk, cache_key=cache_key)
+
+    return render(request, 'main/partials/export_status.html', {'task_id': task.id})
+
+
+@login_required
+def export_pdf_status(request, task_id):
+    """Фрагмент статусу генерації PDF для HTMX-поллінгу"""
+    from celery.result import AsyncResult
+    import logging
+
+    logger = logging.getLogger(__name__)
+
+    result = AsyncResult(task_id)
+    context = {'task_id': task_id}
+
+    if result.successful():
+        meta = result.result
+        if meta.get('user_id') != request.user.pk:
+            return HttpResponse(status=404)
+
+        context['download_url'] = export_download_url(request.user, meta['path'], meta['filename'])
+
+    elif result.failed():
+        logger.error(f"Error generating PDF: {result.result}")
+        context['error'] = _('Помилка генерації PDF. Спробуйте пізніше.')
+
+    return render(request, 'main/partials/export_status.html', context)
+
+
+def export_download_url(user, path, filename):
+    """Короткоживуче підписане посилання на файл у PRIVATE_MEDIA_ROOT для конкретного користувача"""
+    token = signing.dumps(
+        {'path': path, 'filename': filename, 'user_id': user.pk},
+        salt=EXPORT_SIGNING_SALT,
+    )
+    return reverse('main:download_export', args=[token])
+
+
+@login_required
+def download_export(request, token):
+    """Віддає готовий файл експорту за короткоживучим підписаним посиланням"""
     try:
-        pdf_content = task.get(timeout=120)
-        
-        logger.info("PDF generated successfully via Celery")
-        
-        # Повертаємо PDF як відповідь
-        response = HttpResponse(pdf_content, content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="employees_{timezone.now().strftime("%Y%m%d_%H%M%S")}.pdf"'
-        
+        data = signing.loads(token, salt=EXPORT_SIGNING_SALT, max_age=settings.EXPORT_DOWNLOAD_MAX_AGE)
+    except signing.BadSignature:
+        raise Http404
+
+    path = os.path.join(settings.PRIVATE_MEDIA_ROOT, data['path'])
+    if data['user_id'] != request.user.pk or not os.path.exists(path):
+        raise Http404
+
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=data['filename'])
+
+
+@login_required
+def export_employees(request, fmt):
+    """
+    Потоковий CSV / XLSX експорт поточного відфільтрованого списку.
+    CSV починає віддаватися одразу, XLSX — після збирання у тимчасовому файлі
+    (готовий XLSX кешується, повторний такий самий експорт віддається з кешу).
+    """
+    from django.http import StreamingHttpResponse
+    from apps.main.exports import EXPORT_FORMATS, iter_employees_csv, employees_xlsx_file
+    from apps.main.export_cache import export_cache_key, get_cached_export, store_export
+
+    if fmt not in EXPORT_FORMATS:
+        raise Http404
+
+    params = request.GET.copy()
+    params['language'] = request.LANGUAGE_CODE
+
+    content_type, extension = EXPORT_FORMATS[fmt]
+    filename = f"employees_{timezone.now().strftime('%Y%m%d_%H%M%S')}.{extension}"
+
+    if fmt == 'csv':
+        response = StreamingHttpResponse(iter_employees_csv(params), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
         return response
-        
+
+    cache_key = export_cache_key(params, fmt)
+    artifact = get_cached_export(cache_key)
+    if artifact is None:
+        output = employees_xlsx_file(params)
+        try:
+            artifact = store_export(cache_key, output.name, filename)
+        finally:
+            output.close()
+
+    return FileResponse(
+        open(os.path.join(settings.PRIVATE_MEDIA_ROOT, artifact.path), 'rb'),
+        as_attachment=True,
+        filename=artifact.filename,
+        content_type=content_type,
+    )
+
+
+@login_required
+def reports(request):
+    """Сторінка звітів-пресетів: останні нічні рендери в мові інтерфейсу"""
+    from apps.main.models import DataVersion, ReportArtifact
+    from apps.main.reports import is_report_outdated
+
+    artifacts = {
+        (artifact.preset, artifact.format): artifact
+        for artifact in ReportArtifact.objects.filter(language=request.LANGUAGE_CODE)
+    }
+    version = DataVersion.current()
+
+    presets = []
+    for name, preset in settings.REPORT_PRESETS.items():
+        files = []
+        for fmt in preset['formats']:
+            artifact = artifacts.get((name, fmt))
+            files.append({
+                'format': fmt,
+                'artifact': artifact,
+                'outdated': artifact is not None and is_report_outdated(artifact, version),
+            })
+        presets.append({'name': name, 'title': preset['title'], 'files': files})
+
+    return render(request, 'main/reports.html', {'presets': presets})
+
+
+@login_required
+def download_report(request, preset, fmt):
+    """Віддає останній нічний рендер пресету"""
+    from apps.main.models import ReportArtifact
+    from apps.main.reports import report_full_path
+
+    artifact = get_object_or_404(ReportArtifact, preset=preset, format=fmt, language=request.LANGUAGE_CODE)
+    path = report_full_path(artifact)
+    if not os.path.exists(path):
+        raise Http404
+
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=artifact.filename)
+
+
+IMPORT_REPORT_MAX_ERRORS = 200
+
+
+@login_required
+def import_employees(request):
+    """
+    Імпорт співробітників з CSV/XLSX у два кроки: файл перевіряється у фоні
+    (пробний прогон), запис відбувається лише після підтвердження.
+    """
+    from apps.main.models import ImportJob
+    from apps.main.tasks import validate_import_job
+
+    if request.method != "POST":
+        return render(request, 'main/partials/import_modal.html')
+
+    upload = request.FILES.get("file")
+    extension = os.path.splitext(upload.name)[1].lower() if upload else ""
+
+    if extension not in (".csv", ".xlsx"):
+        return render(request, 'main/partials/import_modal.html', {
+            'error': _('Підтримуються лише файли CSV та XLSX'),
+        })
+
+    job = ImportJob.objects.create(
+        file=upload,
+        file_name=upload.name,
+        update_existing=request.POST.get("update") == "on",
+        created_by=request.user,
+    )
+    transaction.on_commit(lambda: validate_import_job.delay(job.pk))
+
+    return render_import_job(request, job)
+
+
+def render_import_job(request, job):
+    response = render(request, 'main/partials/import_job.html', {
+        'job': job,
+        'errors': job.errors[:IMPORT_REPORT_MAX_ERRORS],
+    })
+    if job.status == 'done':
+        response['HX-Trigger'] = 'employeesImported'
+    return response
+
+
+@login_required
+def import_job_status(request, job_id):
+    """Фрагмент прогресу імпорту для HTMX-поллінгу"""
+    from apps.main.models import ImportJob
+
+    job = get_object_or_404(ImportJob, pk=job_id, created_by=request.user)
+    return render_import_job(request, job)
+
+
+@login_required
+def import_job_confirm(request, job_id):
+    """Підтвердження імпорту: запис уже розібраних даних у фоні"""
+    from apps.main.models import ImportJob
+    from apps.main.tasks import commit_import_job
+
+    if request.method != "POST":
+        return HttpResponse(status=405)
+
+    job = get_object_or_404(ImportJob, pk=job_id, created_by=request.user)
+
+    # Повторне натискання не ставить задачу вдруге
+    if ImportJob.objects.filter(pk=job.pk, status='validated').update(status='confirmed'):
+        transaction.on_commit(lambda: commit_import_job.delay(job.pk))
+        job.refresh_from_db()
+
+    return render_import_job(request, job)
+
+
+@login_required
+def import_job_cancel(request, job_id):
+    """Скасування перевіреного імпорту: видаляє завантажений файл і розібрані дані"""
+    from apps.main.models import ImportJob
+
+    if request.method != "POST":
+        return HttpResponse(status=405)
+
+    job = get_object_or_404(ImportJob, pk=job_id, created_by=request.user, status='validated')
+    job.cleanup_files()
+    job.delete()
+
+    return HttpResponse("")
+
+
+def _metrics_window(request):
+    try:
+        hours = min(max(int(request.GET.get('hours', 24)), 1), 24 * 30)
+    except ValueError:
+        hours = 24
+    return hours, timezone.now() - timedelta(hours=hours)
+
+
+def _safe_queue_stats():
+    """Метрики черг, якщо брокер доступний; інакше порожньо"""
+    import logging
+    from apps.main.queues import queue_stats
+
+    try:
+        return queue_stats()
     except Exception as e:
-        logger.error(f"Error generating PDF: {str(e)}")
-        messages.error(request, _('Помилка генерації PDF. Спробуйте пізніше.'))
-        return redirect('main:dashboard')
+        logging.getLogger(__name__).warning(f"Queue stats unavailable: {e}")
+        return []
+
+
+@login_required
+def task_metrics(request):
+    """Сторінка метрик задач Celery (лише для суперкористувачів)"""
+    from apps.main.instrumentation import task_summary
+    from apps.main.models import DatabaseBackup, JobRun, TaskExecution
+
+    if not request.user.is_superuser:
+        raise PermissionDenied
+
+    hours, since = _metrics_window(request)
+    return render(request, 'main/task_metrics.html', {
+        'hours': hours,
+        'summary': task_summary(since),
+        'queues': _safe_queue_stats(),
+        'failures': TaskExecution.objects.filter(
+            started_at__gte=since, state=TaskExecution.FAILED
+        )[:20],
+        'job_runs': JobRun.objects.all()[:20],
+        'backups': DatabaseBackup.objects.all()[:10],
+    })
+
+
+def metrics(request):
+    """
+    Метрики задач і черг у форматі Prometheus. Доступ — сесія суперкористувача
+    або заголовок Authorization: Bearer <settings.METRICS_TOKEN>.
+    """
+    from apps.main.backups import backup_stats
+    from apps.main.instrumentation import prometheus_metrics, task_summary
+
+    token = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+    authorized = request.user.is_superuser or (
+        settings.METRICS_TOKEN and constant_time_compare(token, settings.METRICS_TOKEN)
+    )
+    if not authorized:
+        raise PermissionDenied
+
+    _, since = _metrics_window(request)
+    return HttpResponse(
+        prometheus_metrics(task_summary(since), _safe_queue_stats(), backup_stats()),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
 
 
 class HistoryListView(ListView):
@@ -768,4 +990,4 @@ class HistoryListView(ListView):
             id__in=History.objects.values_list("changed_by", flat=True).distinct()
         ).order_by('first_name', 'last_name')
         
-        return ctx
\ No newline at end of file
+        return ctx
@@ -0,0 +1,56 @@
+import logging
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from apps.main.badges import user_badges
+from apps.main.edit_locks import active_locks
+from .events import BROADCAST_GROUP, SUPERUSERS_GROUP, user_group
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Per-user stream of badge counts, task changes and employee lock events.
+    The current counts are sent right after connecting, then only deltas.
+    Current edit locks of the rows a tab shows are sent on request
+    ({"type": "locks", "employee_ids": [...]}), which tabs do on every connect.
+    """
+
+    MAX_LOCK_IDS = 500
+
+    async def connect(self):
+        user = self.scope.get("user")
+        if not user or not user.is_authenticated:
+            await self.close()
+            return
+
+        self.notification_groups = [BROADCAST_GROUP, user_group(user.id)]
+        if user.is_superuser:
+            self.notification_groups.append(SUPERUSERS_GROUP)
+
+        for group in self.notification_groups:
+            await self.channel_layer.group_add(group, self.channel_name)
+        await self.accept()
+
+        badges = await database_sync_to_async(user_badges)(user)
+        await self.send_json({"event": "badges", **badges})
+
+    async def disconnect(self, close_code):
+        for group in getattr(self, "notification_groups", []):
+            await self.channel_layer.group_discard(group, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        if content.get("type") == "ping":
+            await self.send_json({"type": "pong", "timestamp": content.get("timestamp")})
+        elif content.get("type") == "locks":
+            employee_ids = [
+                employee_id for employee_id in content.get("employee_ids") or []
+                if isinstance(employee_id, int)
+            ][:self.MAX_LOCK_IDS]
+            locks = await database_sync_to_async(active_locks)(employee_ids)
+            await self.send_json({"event": "locks", "employee_ids": employee_ids, "locks": locks})
+
+    async def notify_event(self, event):
+        await self.send_json({key: value for key, value in event.items() if key != "type"})
@@ -0,0 +1,94 @@
+"""
+Real-time events for open tabs, delivered over the channel layer.
+
+Every connected tab (apps.notification.consumers.NotificationConsumer) joins
+the broadcast group, its user's group and, for superusers, the superusers
+group. Events are published after the surrounding transaction commits and
+carry the new badge counts, so clients never have to re-query them.
+"""
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+from apps.main.badges import (
+    completed_task_count,
+    invalidate_notification_badge,
+    invalidate_task_badges,
+    notification_count,
+    task_count,
+)
+from apps.users.models import User
+
+logger = logging.getLogger(__name__)
+
+
+BROADCAST_GROUP = "notifications"
+SUPERUSERS_GROUP = "notifications_superusers"
+
+COMPLETED_STATUS = "completed"
+
+
+def user_group(user_id):
+    return f"notifications_user_{user_id}"
+
+
+def send_event(group, event, **payload):
+    """
+    Send an event to a group. A missing or unreachable channel layer is logged
+    and ignored: the write that triggered the event has already been committed.
+    """
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        async_to_sync(channel_layer.group_send)(
+            group, {"type": "notify.event", "event": event, **payload}
+        )
+    except Exception as e:
+        logger.warning(f"Failed to publish {event} event to {group}: {e}")
+
+
+def _publish_notifications_changed():
+    invalidate_notification_badge()
+    send_event(BROADCAST_GROUP, "badges", notifications=notification_count())
+
+
+def notifications_changed():
+    """
+    Call after creating, updating or deleting notifications (including bulk
+    operations that bypass signals). Drops the cached total and pushes the new
+    one to every tab once the transaction commits.
+    """
+    transaction.on_commit(_publish_notifications_changed)
+
+
+def _task_payload(task):
+    return {"id": task.pk, "title": task.title, "status": task.status}
+
+
+def publish_task_changed(task, action, previous_assignee_id=None, previous_status=None):
+    """
+    Push a task change to everyone whose task badge it affects: the current
+    and previous assignee, and superusers when the task enters or leaves the
+    completed state.
+    """
+    invalidate_task_badges()
+    payload = _task_payload(task)
+
+    user_ids = {task.assigned_to_id, previous_assignee_id} - {None}
+    for user in User.objects.filter(pk__in=user_ids):
+        send_event(user_group(user.pk), "task", action=action, task=payload, tasks=task_count(user))
+
+    if COMPLETED_STATUS in (task.status, previous_status):
+        send_event(SUPERUSERS_GROUP, "task", action=action, task=payload, tasks=completed_task_count())
+
+
+def publish_lock_changed(employee_id, locked_by=None, expires_in=None):
+    """
+    Employee edit lock taken or refreshed (locked_by = user id) or released
+    (None). expires_in lets tabs clear the lock themselves if it lapses
+    without an unlock (closed tab, cache timeout).
+    """
+    send_event(BROADCAST_GROUP, "lock", employee_id=employee_id, locked_by=locked_by, expires_in=expires_in)
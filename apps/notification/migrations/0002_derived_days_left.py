@@ -0,0 +1,48 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:10
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def fill_expires_on(apps, schema_editor):
+    Notification = apps.get_model("notification", "Notification")
+    Document = apps.get_model("main", "Document")
+    WorkPermit = apps.get_model("main", "WorkPermit")
+
+    Notification.objects.filter(document__isnull=False).update(
+        expires_on=Subquery(Document.objects.filter(pk=OuterRef("document_id")).values("valid_until")[:1])
+    )
+    Notification.objects.filter(document__isnull=True, work_permit__isnull=False).update(
+        expires_on=Subquery(WorkPermit.objects.filter(pk=OuterRef("work_permit_id")).values("end_date")[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0010_reportartifact"),
+        ("notification", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="notification",
+            name="expires_on",
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.RunPython(fill_expires_on, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name="notification",
+            name="days_left",
+        ),
+        migrations.RemoveField(
+            model_name="notification",
+            name="message",
+        ),
+        migrations.AddIndex(
+            model_name="notification",
+            index=models.Index(
+                fields=["expires_on", "id"], name="notificatio_expires_0f3b02_idx"
+            ),
+        ),
+    ]
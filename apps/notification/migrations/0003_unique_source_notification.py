@@ -0,0 +1,42 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:13
+
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def delete_duplicates(apps, schema_editor):
+    """Залишає по одному (найстарішому) сповіщенню на документ/дозвіл"""
+    Notification = apps.get_model("notification", "Notification")
+
+    for field in ("document", "work_permit"):
+        keep = (
+            Notification.objects.filter(**{f"{field}__isnull": False})
+            .values(field)
+            .annotate(keep_id=Min("id"))
+            .values("keep_id")
+        )
+        Notification.objects.filter(**{f"{field}__isnull": False}).exclude(id__in=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0011_workpermit_end_date_index"),
+        ("notification", "0002_derived_days_left"),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="notification",
+            constraint=models.UniqueConstraint(
+                fields=("document",), name="unique_document_notification"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="notification",
+            constraint=models.UniqueConstraint(
+                fields=("work_permit",), name="unique_work_permit_notification"
+            ),
+        ),
+    ]
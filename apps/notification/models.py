@@ -1,4 +1,7 @@
+from datetime import date
+
 from django.db import models
+from django.template.loader import render_to_string
 from apps.main.models import Employee, Document, WorkPermit
 
 
@@ -30,10 +33,30 @@ class Notification(models.Model):
         related_name="notifications",
     )
 
-    message = models.CharField(max_length=255, null=True, blank=True)
-    days_left = models.PositiveSmallIntegerField(null=True, blank=True)
+    # Дата закінчення документа/дозволу; days_left і message рахуються з неї при читанні
+    expires_on = models.DateField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['expires_on', 'id']),
+        ]
+        # Одне сповіщення на документ/дозвіл — по ним робиться upsert (NULL-и не конфліктують)
+        constraints = [
+            models.UniqueConstraint(fields=['document'], name='unique_document_notification'),
+            models.UniqueConstraint(fields=['work_permit'], name='unique_work_permit_notification'),
+        ]
+
     def __str__(self):
         return (f"У працівника {self.employee.get_full_name}, закінчується термін дії документу "
                 f"{self.document if self.document else self.work_permit} через {self.days_left} днів")
+
+    @property
+    def days_left(self):
+        if self.expires_on is None:
+            return None
+        return (self.expires_on - date.today()).days
+
+    @property
+    def message(self):
+        return render_to_string("notification/message.txt", {"notification": self}).strip()
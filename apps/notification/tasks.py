@@ -1,98 +1,62 @@
-from datetime import date
-
-from dateutil.relativedelta import relativedelta
-from django.db.models import Exists, OuterRef
+from datetime import date, timedelta
 
 from celery import shared_task
 
-from apps.main.models import Document, WorkPermit
+from apps.main.expiry import expiring_between
+from apps.main.jobs import single_run
+from apps.notification.events import notifications_changed
 from apps.notification.models import Notification
+from apps.notification.utils import NOTIFICATION_WINDOW
+
+
+# Скільки днів назад перевіряти межу вікна (щоб пропущений запуск beat не загубив документи)
+RECONCILE_LOOKBACK_DAYS = 2
 
 
 @shared_task
-def check_expiring_documents():
+@single_run()
+def check_expiring_documents(lookback_days=RECONCILE_LOOKBACK_DAYS):
+    """
+    Нічна звірка. Сповіщення створюються і оновлюються одразу при збереженні
+    документів (apps.main.signals), тож тут лише ті, що увійшли у вікно через
+    зсув дати: закінчуються в (today - lookback_days + 2 місяці, today + 2 місяці].
+    Дати беруться з календаря ExpiryEntry, а не з таблиць документів і дозволів.
+    Повна перевірка всієї таблиці — manage.py notification.
+    """
     today = date.today()
-    target_date = today + relativedelta(months=2)
-
-    documents = Document.objects.filter(
-        valid_until__isnull=False,
-        valid_until__gte=today,
-        valid_until__lte=target_date
-    ).exclude(
-        Exists(Notification.objects.filter(document=OuterRef('pk')))
-    ).exclude(
-            employee__working_status="Zwolniony"
-    ).select_related("employee")
+    target_date = today + NOTIFICATION_WINDOW
+    since = today - timedelta(days=lookback_days) + NOTIFICATION_WINDOW
 
-    work_permits = WorkPermit.objects.filter(
-        end_date__isnull=False,
-        end_date__gte=today,
-        end_date__lte=target_date
-    ).exclude(
-        Exists(Notification.objects.filter(work_permit=OuterRef('pk')))
-    ).exclude(
-            employee__working_status="Zwolniony"
-    ).select_related("employee")
+    # Один range scan по календарю дат (частковий індекс лише активних співробітників)
+    entries = expiring_between(
+        since + timedelta(days=1), target_date, sources=["document", "work_permit"]
+    ).values_list("source", "source_id", "employee_id", "expires_on")
 
-    doc_notifications = [
+    notifications = [
         Notification(
-            notification_type="document",
-            employee=doc.employee,
-            document=doc,
-            days_left=(doc.valid_until - today).days,
-            message=(
-                f"Документ {doc.doc_type or 'Невідомий'} №{doc.number or 'Не вказано'} "
-                f"закінчується через {(doc.valid_until - today).days} днів (до {doc.valid_until})."
-            ),
+            notification_type=source,
+            employee_id=employee_id,
+            expires_on=expires_on,
+            **{f"{source}_id": source_id},
         )
-        for doc in documents
+        for source, source_id, employee_id, expires_on in entries
     ]
 
-    permit_notifications = [
-        Notification(
-            notification_type="work_permit",
-            employee=permit.employee,
-            work_permit=permit,
-            days_left=(permit.end_date - today).days,
-            message=(
-                f"Документ {permit.doc_type or 'Невідомий'} "
-                f"закінчується через {(permit.end_date - today).days} днів (до {permit.end_date})."
-            ),
-        )
-        for permit in work_permits
-    ]
+    if notifications:
+        Notification.objects.bulk_create(notifications, ignore_conflicts=True)
+        notifications_changed()
 
-    if doc_notifications or permit_notifications:
-        Notification.objects.bulk_create(
-            doc_notifications + permit_notifications)
+    return len(notifications)
 
 
 @shared_task
-def decrease_days_left():
-    notifications = Notification.objects.select_related("document", "work_permit")
-
-    to_update = []
-    to_delete = []
-
-    for n in notifications:
-        if n.days_left > 1:
-            n.days_left -= 1
-            doc_type = "Невідомий"
-            doc_number = "Не вказано"
-
-            if n.document:
-                doc_type = n.document.doc_type or "Невідомий"
-                doc_number = n.document.number or "Не вказано"
-            elif n.work_permit:
-                doc_type = n.work_permit.doc_type or "Невідомий"
-
-            n.message = f"Документ {doc_type} № {doc_number} мине через {n.days_left} днів."
-            to_update.append(n)
-        else:
-            to_delete.append(n.id)
-
-    if to_update:
-        Notification.objects.bulk_update(to_update, ['days_left', 'message'])
-
-    if to_delete:
-        Notification.objects.filter(id__in=to_delete).delete()
\ No newline at end of file
+@single_run()
+def delete_expired_notifications():
+    """
+    days_left і message рахуються з expires_on при читанні, тож щоночі нічого
+    не перераховується — лише один DELETE по індексу expires_on.
+    """
+    deleted, _ = Notification.objects.filter(expires_on__lt=date.today()).delete()
+    if deleted:
+        notifications_changed()
+    return deleted
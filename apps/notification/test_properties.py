@@ -5,13 +5,24 @@ from datetime import date, timedelta
 from dateutil.relativedelta import relativedelta
 from hypothesis import given, strategies as st, settings
 from hypothesis.extra.django import TestCase
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 from apps.main.models import Employee, Document, WorkPermit
 from apps.notification.models import Notification
-from apps.notification.utils import check_and_create_notifications
+from apps.notification.utils import check_and_create_notifications, check_and_create_notifications_bulk
 
 
 # Custom strategies for generating test data
+
+# Postgres text columns cannot store NUL characters (or unpaired surrogates)
+document_text = st.text(
+    min_size=1,
+    max_size=50,
+    alphabet=st.characters(blacklist_categories=("Cs",), blacklist_characters="\x00"),
+)
+
+
 @st.composite
 def date_in_range(draw, start_offset_days=0, end_offset_days=60):
     """Generate a date within a specific range from today."""
@@ -50,8 +61,8 @@ def employee_with_expiring_documents(draw):
     for _ in range(num_docs):
         Document.objects.create(
             employee=employee,
-            doc_type=draw(st.text(min_size=1, max_size=50) | st.none()),
-            number=draw(st.text(min_size=1, max_size=50) | st.none()),
+            doc_type=draw(document_text | st.none()),
+            number=draw(document_text | st.none()),
             valid_until=draw(date_in_range())
         )
     
@@ -60,7 +71,7 @@ def employee_with_expiring_documents(draw):
     for _ in range(num_permits):
         WorkPermit.objects.create(
             employee=employee,
-            doc_type=draw(st.text(min_size=1, max_size=50) | st.none()),
+            doc_type=draw(document_text | st.none()),
             end_date=draw(date_in_range())
         )
     
@@ -81,8 +92,8 @@ def employee_with_out_of_range_documents(draw):
     for _ in range(num_docs):
         Document.objects.create(
             employee=employee,
-            doc_type=draw(st.text(min_size=1, max_size=50) | st.none()),
-            number=draw(st.text(min_size=1, max_size=50) | st.none()),
+            doc_type=draw(document_text | st.none()),
+            number=draw(document_text | st.none()),
             valid_until=draw(date_out_of_range())
         )
     
@@ -91,7 +102,7 @@ def employee_with_out_of_range_documents(draw):
     for _ in range(num_permits):
         WorkPermit.objects.create(
             employee=employee,
-            doc_type=draw(st.text(min_size=1, max_size=50) | st.none()),
+            doc_type=draw(document_text | st.none()),
             end_date=draw(date_out_of_range())
         )
     
@@ -112,8 +123,8 @@ def employee_with_null_dates(draw):
     for _ in range(num_docs):
         Document.objects.create(
             employee=employee,
-            doc_type=draw(st.text(min_size=1, max_size=50) | st.none()),
-            number=draw(st.text(min_size=1, max_size=50) | st.none()),
+            doc_type=draw(document_text | st.none()),
+            number=draw(document_text | st.none()),
             valid_until=None
         )
     
@@ -122,13 +133,52 @@ def employee_with_null_dates(draw):
     for _ in range(num_permits):
         WorkPermit.objects.create(
             employee=employee,
-            doc_type=draw(st.text(min_size=1, max_size=50) | st.none()),
+            doc_type=draw(document_text | st.none()),
             end_date=None
         )
     
     return employee
 
 
+@st.composite
+def employees_with_mixed_documents(draw):
+    """Generate 1-4 employees with in-range, out-of-range or null dates; some dismissed."""
+    employees = draw(st.lists(
+        st.one_of(employee_with_expiring_documents(), employee_with_out_of_range_documents(), employee_with_null_dates()),
+        min_size=1,
+        max_size=4,
+    ))
+    for employee in employees:
+        if draw(st.booleans()) and draw(st.booleans()):
+            # update() bypasses post_save, like bulk status changes do
+            Employee.objects.filter(pk=employee.pk).update(working_status="Zwolniony")
+    return employees
+
+
+def expected_notification_keys(employees):
+    """(type, source id) pairs that should have notifications."""
+    today = date.today()
+    target_date = today + relativedelta(months=2)
+    ids = [e.pk for e in employees]
+    active = Employee.objects.filter(pk__in=ids).exclude(working_status="Zwolniony")
+    return {
+        ("document", pk) for pk in Document.objects.filter(
+            employee__in=active, valid_until__gte=today, valid_until__lte=target_date
+        ).values_list("pk", flat=True)
+    } | {
+        ("work_permit", pk) for pk in WorkPermit.objects.filter(
+            employee__in=active, end_date__gte=today, end_date__lte=target_date
+        ).values_list("pk", flat=True)
+    }
+
+
+def actual_notification_keys():
+    return {
+        (n.notification_type, n.document_id or n.work_permit_id)
+        for n in Notification.objects.all()
+    }
+
+
 class NotificationPropertyTests(TestCase):
     """Property-based tests for notification creation."""
     
@@ -365,3 +415,37 @@ class NotificationPropertyTests(TestCase):
             0,
             f"Expected 0 notifications for null dates, got {notification_count}"
         )
+
+    @settings(max_examples=100, deadline=None)
+    @given(employees_with_mixed_documents())
+    def test_property_7_batch_matches_expected_notifications(self, employees):
+        """
+        Property 7: Batch creation correctness
+
+        For any set of employees, one batch call should create exactly one notification
+        per in-range document and work permit of non-dismissed employees, and repeating
+        the call (or following it with per-employee calls) should create nothing new.
+        """
+        check_and_create_notifications_bulk([e.pk for e in employees])
+        expected = expected_notification_keys(employees)
+        self.assertEqual(actual_notification_keys(), expected)
+
+        self.assertEqual(check_and_create_notifications_bulk(Employee.objects.all()), 0)
+        for employee in employees:
+            employee.refresh_from_db()
+            check_and_create_notifications(employee)
+        self.assertEqual(actual_notification_keys(), expected)
+
+    @settings(max_examples=50, deadline=None)
+    @given(employees_with_mixed_documents())
+    def test_property_8_batch_query_count_is_constant(self, employees):
+        """
+        Property 8: Batch query count
+
+        For any number of employees and documents, the batch call should issue at most
+        five queries: one DELETE, and one anti-join and one upsert per source type.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            check_and_create_notifications_bulk(Employee.objects.filter(pk__in=[e.pk for e in employees]))
+
+        self.assertLessEqual(len(queries), 5)
@@ -1,11 +1,22 @@
 """Unit tests for notification utility functions."""
 from datetime import date, timedelta
+from unittest.mock import ANY, patch
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
 from dateutil.relativedelta import relativedelta
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase, override_settings
 
-from apps.main.models import Employee, Document, WorkPermit
+from apps.main.edit_locks import EDIT_LOCK_TIMEOUT, set_lock
+from apps.main.models import Employee, Document, WorkPermit, Task
+from apps.notification.consumers import NotificationConsumer
+from apps.notification.events import BROADCAST_GROUP, SUPERUSERS_GROUP, send_event, user_group
 from apps.notification.models import Notification
-from apps.notification.utils import check_and_create_notifications
+from apps.notification.tasks import delete_expired_notifications, check_expiring_documents
+from apps.notification.utils import check_and_create_notifications, check_and_create_notifications_bulk
+from apps.users.models import User
 
 
 class NotificationUtilityTests(TestCase):
@@ -162,3 +173,254 @@ class NotificationUtilityTests(TestCase):
 
         permit_notifications = notifications.filter(notification_type="work_permit")
         self.assertEqual(permit_notifications.count(), 1)
+
+    def test_bulk_check_updates_and_prunes_notifications_of_updated_employees(self):
+        """Test the batch check after an import changed dates and statuses without signals."""
+        moved = Document.objects.create(employee=self.employee, valid_until=date.today() + timedelta(days=10))
+        left = Document.objects.create(employee=self.employee, valid_until=date.today() + timedelta(days=20))
+        dismissed = Employee.objects.create(first_name="Dismissed", last_name="Employee")
+        WorkPermit.objects.create(employee=dismissed, end_date=date.today() + timedelta(days=5))
+        employees = [self.employee.pk, dismissed.pk]
+        self.assertEqual(check_and_create_notifications_bulk(employees), 3)
+
+        # bulk_update in the import does not send post_save
+        Document.objects.filter(pk=moved.pk).update(valid_until=date.today() + timedelta(days=40))
+        Document.objects.filter(pk=left.pk).update(valid_until=date.today() + timedelta(days=365))
+        Employee.objects.filter(pk=dismissed.pk).update(working_status="Zwolniony")
+
+        self.assertEqual(check_and_create_notifications_bulk(employees), 1)
+        self.assertEqual(
+            list(Notification.objects.values_list("document", "expires_on")),
+            [(moved.pk, date.today() + timedelta(days=40))],
+        )
+        self.assertEqual(check_and_create_notifications_bulk(employees), 0)
+
+
+class NotificationExpiryTests(TestCase):
+    """Tests for days_left and message derived from the expiry date."""
+
+    def setUp(self):
+        """Set up an employee."""
+        self.employee = Employee.objects.create(first_name="Test", last_name="Employee")
+
+    def make_notification(self, days):
+        expires_on = date.today() + timedelta(days=days)
+        document = Document.objects.create(
+            employee=self.employee, doc_type="Passport", number="AB1", valid_until=expires_on
+        )
+        return Notification.objects.create(
+            notification_type="document",
+            employee=self.employee,
+            document=document,
+            expires_on=expires_on,
+        )
+
+    def test_days_left_and_message_are_computed_at_read_time(self):
+        notification = self.make_notification(10)
+
+        self.assertEqual(notification.days_left, 10)
+        self.assertEqual(
+            notification.message,
+            f"Документ Passport №AB1 закінчується через 10 днів (до {notification.expires_on}).",
+        )
+
+        Notification.objects.filter(pk=notification.pk).update(expires_on=date.today() + timedelta(days=3))
+        notification.refresh_from_db()
+        self.assertEqual(notification.days_left, 3)
+        self.assertIn("через 3 днів", notification.message)
+
+    def test_nightly_task_deletes_only_expired_rows_in_one_query(self):
+        expired = self.make_notification(-1)
+        current = self.make_notification(0)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(delete_expired_notifications(), 1)
+
+        self.assertFalse(Notification.objects.filter(pk=expired.pk).exists())
+        self.assertTrue(Notification.objects.filter(pk=current.pk).exists())
+
+
+class NotificationSyncTests(TestCase):
+    """Tests for notifications maintained on commit of document and employee changes."""
+
+    def setUp(self):
+        """Set up an active employee."""
+        self.employee = Employee.objects.create(first_name="Test", last_name="Employee")
+
+    def test_new_permit_gets_notification_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            permit = WorkPermit.objects.create(
+                employee=self.employee, doc_type="Karta", end_date=date.today() + timedelta(days=7)
+            )
+
+        notification = Notification.objects.get(work_permit=permit)
+        self.assertEqual(notification.days_left, 7)
+
+    def test_date_change_updates_or_deletes_the_notification(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            document = Document.objects.create(
+                employee=self.employee, doc_type="Passport", valid_until=date.today() + timedelta(days=20)
+            )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            document.valid_until = date.today() + timedelta(days=5)
+            document.save()
+        self.assertEqual(Notification.objects.get(document=document).days_left, 5)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            document.valid_until = date.today() + timedelta(days=365)
+            document.save()
+        self.assertFalse(Notification.objects.filter(document=document).exists())
+
+    def test_employee_status_change_removes_and_restores_notifications(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Document.objects.create(
+                employee=self.employee, doc_type="Passport", valid_until=date.today() + timedelta(days=20)
+            )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.employee.working_status = "Zwolniony"
+            self.employee.save()
+        self.assertEqual(Notification.objects.count(), 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.employee.working_status = "Pracujący"
+            self.employee.save()
+        self.assertEqual(Notification.objects.count(), 1)
+
+    def test_reconciliation_only_picks_up_documents_entering_the_window(self):
+        today = date.today()
+        entering = Document.objects.create(employee=self.employee, valid_until=today + relativedelta(months=2))
+        Document.objects.create(employee=self.employee, valid_until=today + timedelta(days=10))
+
+        self.assertEqual(check_expiring_documents(), 1)
+        self.assertEqual(check_expiring_documents(), 1)
+
+        self.assertEqual(list(Notification.objects.values_list("document", flat=True)), [entering.pk])
+
+
+IN_MEMORY_CHANNEL_LAYERS = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS)
+class NotificationEventTests(TestCase):
+    """Tests for real-time notification, task and lock events."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email="hr@example.com", password="pass12345")
+        self.other = User.objects.create_user(email="ops@example.com", password="pass12345")
+        self.admin = User.objects.create_superuser(email="admin@example.com", password="pass12345")
+        self.employee = Employee.objects.create(first_name="Ivan", last_name="Koval")
+
+    def sent(self, mock_send):
+        return [(call.args[0], call.args[1], call.kwargs) for call in mock_send.call_args_list]
+
+    @patch("apps.notification.events.send_event")
+    def test_notification_changes_push_the_new_total(self, mock_send):
+        with self.captureOnCommitCallbacks(execute=True):
+            document = Document.objects.create(employee=self.employee, valid_until=date.today() + timedelta(days=5))
+        self.assertEqual(self.sent(mock_send)[-1], (BROADCAST_GROUP, "badges", {"notifications": 1}))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            document.delete()
+        self.assertEqual(self.sent(mock_send)[-1], (BROADCAST_GROUP, "badges", {"notifications": 0}))
+
+    @patch("apps.notification.events.send_event")
+    def test_reassigned_task_updates_both_users_and_superusers(self, mock_send):
+        with self.captureOnCommitCallbacks(execute=True):
+            task = Task.objects.create(title="Check documents", created_by=self.admin, assigned_to=self.user)
+        self.assertEqual([(group, kwargs["tasks"]) for group, _, kwargs in self.sent(mock_send)],
+                         [(user_group(self.user.id), 1)])
+
+        mock_send.reset_mock()
+        task.assigned_to = self.other
+        task.status = "completed"
+        with self.captureOnCommitCallbacks(execute=True):
+            task.save()
+
+        self.assertEqual(
+            sorted((group, kwargs["tasks"]) for group, _, kwargs in self.sent(mock_send)),
+            sorted([(user_group(self.user.id), 0), (user_group(self.other.id), 1), (SUPERUSERS_GROUP, 1)]),
+        )
+
+    @patch("apps.notification.events.send_event")
+    def test_lock_and_unlock_are_broadcast(self, mock_send):
+        self.client.force_login(self.user)
+        self.client.post("/uk/lock-employee/", {"employee_id": self.employee.id}, content_type="application/json")
+        self.client.post("/uk/unlock-employee/", {"employee_id": self.employee.id}, content_type="application/json")
+
+        self.assertEqual(self.sent(mock_send), [
+            (BROADCAST_GROUP, "lock",
+             {"employee_id": self.employee.id, "locked_by": self.user.id, "expires_in": EDIT_LOCK_TIMEOUT}),
+            (BROADCAST_GROUP, "lock", {"employee_id": self.employee.id, "locked_by": None, "expires_in": None}),
+        ])
+
+    @patch("apps.notification.events.send_event")
+    def test_locks_taken_before_page_load_are_rendered(self, mock_send):
+        self.client.force_login(self.other)
+        self.client.post("/uk/lock-employee/", {"employee_id": self.employee.id}, content_type="application/json")
+
+        self.client.force_login(self.user)
+        response = self.client.get("/uk/")
+        self.assertEqual(response.context["edit_locks"], {
+            self.employee.id: {"locked_by": self.other.id, "expires_in": ANY},
+        })
+        self.assertContains(response, 'id="employee-edit-locks"')
+
+    @override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels_redis.core.RedisChannelLayer",
+                                                   "CONFIG": {"hosts": [("127.0.0.1", 1)]}}})
+    def test_unreachable_layer_does_not_break_writes(self):
+        send_event(BROADCAST_GROUP, "badges", notifications=0)
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS)
+class NotificationConsumerTests(TransactionTestCase):
+    """
+    Tests for the notification websocket consumer. database_sync_to_async
+    closes the connection it runs on, so this cannot run inside TestCase's
+    wrapping transaction.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(email="hr@example.com", password="pass12345")
+
+    def test_consumer_sends_snapshot_then_group_events(self):
+        async def scenario():
+            communicator = WebsocketCommunicator(NotificationConsumer.as_asgi(), "/ws/notifications/")
+            communicator.scope["user"] = self.user
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+            snapshot = await communicator.receive_json_from()
+            await get_channel_layer().group_send(
+                user_group(self.user.id), {"type": "notify.event", "event": "task", "tasks": 3}
+            )
+            event = await communicator.receive_json_from()
+            await communicator.disconnect()
+            return snapshot, event
+
+        with patch("apps.notification.consumers.user_badges", return_value={"notifications": 2, "tasks": 1}):
+            snapshot, event = async_to_sync(scenario)()
+        self.assertEqual(snapshot, {"event": "badges", "notifications": 2, "tasks": 1})
+        self.assertEqual(event, {"event": "task", "tasks": 3})
+
+    @patch("apps.main.edit_locks.publish_lock_changed")
+    def test_consumer_answers_with_current_locks(self, mock_publish):
+        cache.clear()
+        set_lock(7, self.user.id)
+
+        async def scenario():
+            communicator = WebsocketCommunicator(NotificationConsumer.as_asgi(), "/ws/notifications/")
+            communicator.scope["user"] = self.user
+            await communicator.connect()
+            await communicator.receive_json_from()
+            await communicator.send_json_to({"type": "locks", "employee_ids": [7, 8, "x"]})
+            locks = await communicator.receive_json_from()
+            await communicator.disconnect()
+            return locks
+
+        with patch("apps.notification.consumers.user_badges", return_value={"notifications": 0, "tasks": 0}):
+            locks = async_to_sync(scenario)()
+        self.assertEqual(locks["employee_ids"], [7, 8])
+        self.assertEqual(locks["locks"]["7"]["locked_by"], self.user.id)
+        self.assertLessEqual(locks["locks"]["7"]["expires_in"], EDIT_LOCK_TIMEOUT)
@@ -1,79 +1,193 @@
 """Utility functions for checking document expiry and creating notifications."""
 from datetime import date
 from dateutil.relativedelta import relativedelta
+from django.db import models
+from django.db.models import Exists, OuterRef, Q
 
+from apps.main.models import Employee, Document, WorkPermit
+from apps.notification.events import notifications_changed
 from apps.notification.models import Notification
 
 
+# Notifications exist for documents expiring within this window from today
+NOTIFICATION_WINDOW = relativedelta(months=2)
+
+DISMISSED_STATUS = "Zwolniony"
+
+
 def check_and_create_notifications(employee):
     """
-    Check all documents and work permits for the given employee and create
-    notifications for those expiring within 2 months.
+    Check all documents and work permits for the given employee and bring
+    their notifications in line with the 2 month window.
 
     Args:
         employee: Employee instance to check documents for
     """
-    if employee.working_status == "Zwolniony":
-        return
+    check_and_create_notifications_bulk([employee.pk])
+
+
+def check_and_create_notifications_bulk(employees, batch_size=1000):
+    """
+    Batch version of check_and_create_notifications for created and updated
+    employees.
+
+    Notifications of dismissed employees and of documents that left the
+    window are deleted with one DELETE. Missing or out-of-date notifications
+    (different expiry date or employee) are found with one anti-join
+    (NOT EXISTS) per source type and upserted with INSERT ... ON CONFLICT, as
+    upsert_notifications does, so the number of queries does not depend on
+    the number of employees or documents.
+
+    Args:
+        employees: Employee queryset or iterable of employee ids
+        batch_size: rows per INSERT statement
+
+    Returns:
+        Number of notifications that were missing or out of date
+    """
+    if isinstance(employees, models.QuerySet):
+        employee_ids = employees.values("pk")
+    else:
+        employee_ids = list(employees)
 
     today = date.today()
-    target_date = today + relativedelta(months=2)
+    target_date = today + NOTIFICATION_WINDOW
 
-    # Check Document objects
-    documents = employee.documents.filter(
-        valid_until__isnull=False,
-        valid_until__gte=today,
-        valid_until__lte=target_date
-    )
-
-    for doc in documents:
-        # Check if notification already exists
-        if not Notification.objects.filter(
-            document=doc,
-            employee=employee
-        ).exists():
-            days_left = (doc.valid_until - today).days
-            doc_type = doc.doc_type or "Невідомий"
-            doc_number = doc.number or "Не вказано"
-
-            message = (
-                f"Документ {doc_type} №{doc_number} "
-                f"закінчується через {days_left} днів (до {doc.valid_until})"
-            )
+    deleted, _ = Notification.objects.filter(employee_id__in=employee_ids).filter(
+        Q(employee__working_status=DISMISSED_STATUS)
+        | Q(document__isnull=False) & ~Q(document__valid_until__range=(today, target_date))
+        | Q(work_permit__isnull=False) & ~Q(work_permit__end_date__range=(today, target_date))
+    ).delete()
 
-            Notification.objects.create(
-                notification_type="document",
-                employee=employee,
-                document=doc,
-                days_left=days_left,
-                message=message
-            )
+    documents = Document.objects.filter(
+        employee_id__in=employee_ids,
+        valid_until__gte=today,
+        valid_until__lte=target_date,
+    ).exclude(
+        employee__working_status=DISMISSED_STATUS
+    ).exclude(
+        Exists(Notification.objects.filter(
+            document=OuterRef("pk"), employee=OuterRef("employee"), expires_on=OuterRef("valid_until")
+        ))
+    ).values_list("id", "employee_id", "valid_until")
 
-    # Check WorkPermit objects
-    work_permits = employee.work_permits.filter(
-        end_date__isnull=False,
+    work_permits = WorkPermit.objects.filter(
+        employee_id__in=employee_ids,
         end_date__gte=today,
-        end_date__lte=target_date
-    )
-
-    for permit in work_permits:
-        # Check if notification already exists
-        if not Notification.objects.filter(
-            work_permit=permit,
-            employee=employee
-        ).exists():
-            days_left = (permit.end_date - today).days
-            doc_type = permit.doc_type or "Невідомий"
-
-            message = (
-                f"Документ {doc_type} "
-                f"закінчується через {days_left} днів (до {permit.end_date})"
-            )
+        end_date__lte=target_date,
+    ).exclude(
+        employee__working_status=DISMISSED_STATUS
+    ).exclude(
+        Exists(Notification.objects.filter(
+            work_permit=OuterRef("pk"), employee=OuterRef("employee"), expires_on=OuterRef("end_date")
+        ))
+    ).values_list("id", "employee_id", "end_date")
 
-            Notification.objects.create(
-                notification_type="work_permit",
-                employee=employee,
-                work_permit=permit,
-                days_left=days_left,
-                message=message
+    changed = 0
+    for notifications, source_field in (
+        ([Notification(notification_type="document", employee_id=employee_id, document_id=pk,
+                       expires_on=expires_on)
+          for pk, employee_id, expires_on in documents], "document"),
+        ([Notification(notification_type="work_permit", employee_id=employee_id, work_permit_id=pk,
+                       expires_on=expires_on)
+          for pk, employee_id, expires_on in work_permits], "work_permit"),
+    ):
+        if notifications:
+            Notification.objects.bulk_create(
+                notifications,
+                batch_size=batch_size,
+                update_conflicts=True,
+                unique_fields=[source_field],
+                update_fields=["employee", "expires_on"],
             )
+            changed += len(notifications)
+
+    if deleted or changed:
+        notifications_changed()
+    return changed
+
+
+def in_notification_window(expires_on, today=None):
+    """True if a document expiring on expires_on should have a notification today."""
+    if not expires_on:
+        return False
+    today = today or date.today()
+    return today <= expires_on <= today + NOTIFICATION_WINDOW
+
+
+def upsert_notifications(notifications, source_field):
+    """
+    Insert notifications, or update employee and expiry date of the existing
+    notification for the same source (one INSERT ... ON CONFLICT statement).
+
+    Args:
+        notifications: unsaved Notification instances
+        source_field: "document" or "work_permit"
+    """
+    if notifications:
+        Notification.objects.bulk_create(
+            notifications,
+            update_conflicts=True,
+            unique_fields=[source_field],
+            update_fields=["employee", "expires_on"],
+        )
+        notifications_changed()
+
+
+def _sync_source_notification(source, source_field, notification_type, expires_on):
+    if source.employee.working_status == DISMISSED_STATUS or not in_notification_window(expires_on):
+        if Notification.objects.filter(**{source_field: source}).delete()[0]:
+            notifications_changed()
+        return
+
+    upsert_notifications([
+        Notification(
+            notification_type=notification_type,
+            employee=source.employee,
+            expires_on=expires_on,
+            **{source_field: source},
+        )
+    ], source_field)
+
+
+def sync_document_notification(document_id):
+    """Create, update or delete the notification of a single document."""
+    document = Document.objects.select_related("employee").filter(pk=document_id).first()
+    if document is not None:
+        _sync_source_notification(document, "document", "document", document.valid_until)
+
+
+def sync_work_permit_notification(work_permit_id):
+    """Create, update or delete the notification of a single work permit."""
+    permit = WorkPermit.objects.select_related("employee").filter(pk=work_permit_id).first()
+    if permit is not None:
+        _sync_source_notification(permit, "work_permit", "work_permit", permit.end_date)
+
+
+def sync_employee_notifications(employee_id):
+    """
+    Bring all notifications of an employee in line with the working status:
+    dismissed employees have none, others have one per document or permit
+    in the notification window.
+    """
+    employee = Employee.objects.filter(pk=employee_id).first()
+    if employee is None:
+        return
+
+    if employee.working_status == DISMISSED_STATUS:
+        if Notification.objects.filter(employee=employee).delete()[0]:
+            notifications_changed()
+        return
+
+    today = date.today()
+    target_date = today + NOTIFICATION_WINDOW
+
+    upsert_notifications([
+        Notification(notification_type="document", employee=employee, document=doc, expires_on=doc.valid_until)
+        for doc in employee.documents.filter(valid_until__gte=today, valid_until__lte=target_date)
+    ], "document")
+
+    upsert_notifications([
+        Notification(notification_type="work_permit", employee=employee, work_permit=permit, expires_on=permit.end_date)
+        for permit in employee.work_permits.filter(end_date__gte=today, end_date__lte=target_date)
+    ], "work_permit")
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.8 on 2026-10-19 13:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="invitetoken",
+            name="email_error",
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name="invitetoken",
+            name="email_sent_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        # Існуючі запрошення надсилались синхронно і з помилкою не створювались
+        migrations.AddField(
+            model_name="invitetoken",
+            name="email_status",
+            field=models.CharField(
+                choices=[("queued", "Queued"), ("sent", "Sent"), ("failed", "Failed")],
+                default="sent",
+                max_length=16,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="invitetoken",
+            name="email_status",
+            field=models.CharField(
+                choices=[("queued", "Queued"), ("sent", "Sent"), ("failed", "Failed")],
+                default="queued",
+                max_length=16,
+            ),
+        ),
+    ]
@@ -54,10 +54,23 @@ class User(AbstractBaseUser, PermissionsMixin):
 
 
 class InviteToken(models.Model):
+    # Доля листа із запрошенням: його надсилає воркер черги email
+    EMAIL_QUEUED = 'queued'
+    EMAIL_SENT = 'sent'
+    EMAIL_FAILED = 'failed'
+    EMAIL_STATUS_CHOICES = [
+        (EMAIL_QUEUED, 'Queued'),
+        (EMAIL_SENT, 'Sent'),
+        (EMAIL_FAILED, 'Failed'),
+    ]
+
     email = models.EmailField(unique=True)
     token = models.CharField(max_length=64, unique=True, default=uuid.uuid4)
     created_at = models.DateTimeField(auto_now_add=True)
     expires_at = models.DateTimeField()
+    email_status = models.CharField(max_length=16, choices=EMAIL_STATUS_CHOICES, default=EMAIL_QUEUED)
+    email_error = models.TextField(blank=True)
+    email_sent_at = models.DateTimeField(null=True, blank=True)
 
     def is_valid(self):
         return timezone.now() < self.expires_at
@@ -9,13 +9,14 @@ django_asgi_app = get_asgi_application()
 # Теперь импортируем channels (после инициализации Django)
 from channels.routing import ProtocolTypeRouter, URLRouter
 from apps.chat.routing import websocket_urlpatterns
+from apps.notification.routing import websocket_urlpatterns as notification_websocket_urlpatterns
 from apps.chat.middleware import JWTAuthMiddleware
 
 application = ProtocolTypeRouter({
     "http": django_asgi_app,
     "websocket": JWTAuthMiddleware(
         URLRouter(
-            websocket_urlpatterns
+            websocket_urlpatterns + notification_websocket_urlpatterns
         )
     ),
 })
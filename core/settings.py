@@ -77,7 +77,6 @@ TEMPLATES = [
                 "django.template.context_processors.i18n",
                 "apps.main.context_processors.available_tasks",
                 "apps.main.context_processors.expired_docs",
-                "apps.chat.context_processors.chat_users"
             ],
         },
     },
@@ -111,21 +110,78 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Спільний кеш (лічильники бейджів, сторінки) для web і celery воркерів;
+# без CACHE_URL — локальний кеш процесу
+CACHE_URL = os.getenv('CACHE_URL')
+if CACHE_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": CACHE_URL,
+        },
+    }
+
 # Celery Configuration
 CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', 'redis://localhost:6379/0')
 CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND', 'redis://localhost:6379/0')
+# Redis для lease-блокувань періодичних задач (apps.main.jobs.single_run)
+JOB_LOCK_REDIS_URL = os.getenv('JOB_LOCK_REDIS_URL', CELERY_BROKER_URL)
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
 
+# Окремі черги, щоб довгий експорт не затримував нічні задачі чи пошту і навпаки.
+# Кожну чергу обслуговує свій воркер (docker-compose: celery_worker_<черга>) з
+# concurrency і prefetch звідси; ліміти часу застосовуються до всіх задач черги.
+CELERY_TASK_DEFAULT_QUEUE = "default"
+
+WORKER_QUEUES = {
+    # Інтерактивні: користувач чекає результат (PDF, імпорт)
+    "exports": {"concurrency": 2, "prefetch_multiplier": 1, "soft_time_limit": 10 * 60, "time_limit": 11 * 60},
+    # Нічні задачі beat
+    "maintenance": {"concurrency": 1, "prefetch_multiplier": 1, "soft_time_limit": 30 * 60, "time_limit": 32 * 60},
+    "email": {"concurrency": 4, "prefetch_multiplier": 4, "soft_time_limit": 60, "time_limit": 90},
+    "backups": {"concurrency": 1, "prefetch_multiplier": 1, "soft_time_limit": 60 * 60, "time_limit": 65 * 60},
+    "default": {"concurrency": 2, "prefetch_multiplier": 4, "soft_time_limit": 5 * 60, "time_limit": 6 * 60},
+}
+
+CELERY_TASK_ROUTES = {
+    "apps.main.tasks.generate_employees_pdf_task": {"queue": "exports"},
+    "apps.main.tasks.render_employees_pdf_part": {"queue": "exports"},
+    "apps.main.tasks.merge_employees_pdf_parts": {"queue": "exports"},
+    "apps.main.tasks.validate_import_job": {"queue": "exports"},
+    "apps.main.tasks.commit_import_job": {"queue": "exports"},
+    "apps.notification.tasks.check_expiring_documents": {"queue": "maintenance"},
+    "apps.notification.tasks.delete_expired_notifications": {"queue": "maintenance"},
+    "apps.main.tasks.mark_working_status": {"queue": "maintenance"},
+    "apps.main.tasks.render_report_presets": {"queue": "maintenance"},
+    "apps.main.tasks.cleanup_old_exports": {"queue": "maintenance"},
+    "apps.main.tasks.cleanup_old_backups": {"queue": "maintenance"},
+    "apps.main.tasks.cleanup_task_executions": {"queue": "maintenance"},
+    "apps.main.tasks.send_invitation_email_task": {"queue": "email"},
+    "apps.main.tasks.backup_postgres": {"queue": "backups"},
+}
+
+# Ліміти для задач без маршруту (черга default)
+CELERY_TASK_SOFT_TIME_LIMIT = WORKER_QUEUES["default"]["soft_time_limit"]
+CELERY_TASK_TIME_LIMIT = WORKER_QUEUES["default"]["time_limit"]
+
+CELERY_TASK_ANNOTATIONS = {
+    task: {
+        "soft_time_limit": WORKER_QUEUES[route["queue"]]["soft_time_limit"],
+        "time_limit": WORKER_QUEUES[route["queue"]]["time_limit"],
+    }
+    for task, route in CELERY_TASK_ROUTES.items()
+}
+
 CELERY_BEAT_SCHEDULE = {
     "check-expiring-documents-every-morning": {
         "task": "apps.notification.tasks.check_expiring_documents",
         "schedule": crontab(hour=1, minute=0),
     },
-    "decrease-days-left-daily": {
-        "task": "apps.notification.tasks.decrease_days_left",
+    "delete-expired-notifications-daily": {
+        "task": "apps.notification.tasks.delete_expired_notifications",
         "schedule": crontab(hour=1, minute=5),
     },
     "mark-employee-working-status": {
@@ -140,6 +196,18 @@ CELERY_BEAT_SCHEDULE = {
         "task": "apps.main.tasks.cleanup_old_backups",
         "schedule": crontab(hour=2, minute=0),
     },
+    "hourly-exports-cleaner": {
+        "task": "apps.main.tasks.cleanup_old_exports",
+        "schedule": crontab(minute=45),
+    },
+    "nightly-report-presets": {
+        "task": "apps.main.tasks.render_report_presets",
+        "schedule": crontab(hour=2, minute=30),
+    },
+    "daily-task-metrics-cleaner": {
+        "task": "apps.main.tasks.cleanup_task_executions",
+        "schedule": crontab(hour=2, minute=45),
+    },
 }
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -182,6 +250,70 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Файли з персональними даними (експорти, імпорти) — не віддаються nginx через /media/,
+# лише через view з перевіркою доступу
+PRIVATE_MEDIA_ROOT = BASE_DIR / "private_media"
+
+# Час життя підписаного посилання на завантаження експорту (секунди)
+EXPORT_DOWNLOAD_MAX_AGE = 600
+
+# На скільки частин (Celery-підзадач) ділити великий PDF-експорт; 1 — без паралелізму
+EMPLOYEES_PDF_PARALLELISM = config("EMPLOYEES_PDF_PARALLELISM", default=1, cast=int)
+
+# Звіти, які щоночі рендеряться заздалегідь (сторінка "Звіти").
+# filters — ті самі GET-параметри, що й у фільтрі списку співробітників (EmployeeMultiFilter)
+REPORT_PRESETS = {
+    "active": {
+        "title": "Працевлаштовані",
+        "filters": {"status": ["pracujący"]},
+        "formats": ["pdf", "xlsx"],
+    },
+    "students": {
+        "title": "Студенти",
+        "filters": {"status": ["student"]},
+        "formats": ["pdf", "xlsx"],
+    },
+    "pit2": {
+        "title": "PIT-2",
+        "filters": {"status": ["pit"]},
+        "formats": ["pdf", "xlsx"],
+    },
+    "expiring_permits": {
+        "title": "Дозволи на роботу, що закінчуються (60 днів)",
+        "filters": {"permit_expires_within": ["60"]},
+        "formats": ["pdf", "xlsx"],
+    },
+}
+
+# Мови, в яких рендеряться звіти
+REPORT_LANGUAGES = ["uk", "pl"]
+
+# Максимальний сумарний розмір кешу готових експортів на диску (байти), витіснення — LRU
+EXPORT_CACHE_MAX_BYTES = config("EXPORT_CACHE_MAX_BYTES", default=512 * 1024 * 1024, cast=int)
+
+# Від чийого імені пишеться історія автоматичних змін (нічні задачі); порожньо — без автора
+SYSTEM_USER_EMAIL = config("SYSTEM_USER_EMAIL", default="")
+
+# Історія чату: повідомлень на сторінку за замовчуванням і максимум на запит
+CHAT_PAGE_SIZE = 50
+CHAT_PAGE_SIZE_MAX = 200
+
+# Скільки днів зберігати журнал виконань задач (TaskExecution)
+TASK_METRICS_RETENTION_DAYS = config("TASK_METRICS_RETENTION_DAYS", default=30, cast=int)
+# Резервні копії БД (apps.main.backups): каталог, паралельність pg_dump -j,
+# стиснення (-Z: рівень gzip, на pg_dump 16+ можна "zstd:3") і ретенція
+BACKUP_DIR = config("BACKUP_DIR", default="/backups")
+BACKUP_JOBS = config("BACKUP_JOBS", default=2, cast=int)
+BACKUP_COMPRESSION = config("BACKUP_COMPRESSION", default="6")
+# Скільки останніх перевірених копій лишати завжди і скільки максимум
+BACKUP_KEEP_MIN = config("BACKUP_KEEP_MIN", default=3, cast=int)
+BACKUP_KEEP_MAX = config("BACKUP_KEEP_MAX", default=14, cast=int)
+BACKUP_MAX_AGE_DAYS = config("BACKUP_MAX_AGE_DAYS", default=14, cast=int)
+BACKUP_MAX_BYTES = config("BACKUP_MAX_BYTES", default=20 * 1024 ** 3, cast=int)
+
+# Bearer-токен для збору /metrics/ без сесії (Prometheus); порожньо — лише суперкористувачі
+METRICS_TOKEN = config("METRICS_TOKEN", default="")
+
 STATICFILES_DIRS = []
 
 if (BASE_DIR / "static").exists():
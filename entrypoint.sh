@@ -21,13 +21,18 @@ else:
     print("Superuser already exists.")
 END
 
-    python manage.py import_employee
+    python manage.py import_employee --update
     python manage.py mark_status
 
     touch "$INIT_FLAG"
     echo "✔️ Ініціалізація завершена. Файл-прапор створено."
 else
     echo "➡️ Повторний запуск контейнера – пропускаю ініціалізацію."
+    python manage.py migrate --noinput
+    # Повторний імпорт seed-CSV перезаписує правки з інтерфейсу, тому лише на явний запит
+    if [ "${IMPORT_EMPLOYEES_ON_START:-0}" = "1" ]; then
+        python manage.py import_employee --update
+    fi
 fi
 
 echo "🔧 Запуск Gunicorn..."
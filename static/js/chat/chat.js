@@ -24,6 +24,28 @@ const UNREAD_MESSAGES_KEY = "chatUnreadMessages";
 let notificationSound = null;
 let soundEnabled = false;
 
+// ===============================
+// CHAT ROSTER (HTMX FRAGMENT)
+// ===============================
+// The personal chats list is loaded by HTMX (hx-trigger="load") after the page,
+// so WebSockets are opened only once its .chat-user elements are in the DOM
+let resolveChatRoster;
+const chatRosterLoaded = new Promise(resolve => { resolveChatRoster = resolve; });
+
+["htmx:afterSettle", "htmx:responseError"].forEach(eventName => {
+    document.addEventListener(eventName, (evt) => {
+        if (evt.detail.target && evt.detail.target.id === "chatRoster") resolveChatRoster();
+    });
+});
+
+// ===============================
+// HISTORY PAGINATION
+// ===============================
+// Chat history is fetched page by page: opening a chat loads the latest page,
+// scrolling near the top loads older ones via the ?before=<cursor> of the oldest
+const HISTORY_LOAD_THRESHOLD = 80; // px from the top of #chatBody
+let chatHistory = { url: null, before: null, hasMore: false, loading: false };
+
 // ===============================
 // FILE HANDLING VARIABLES
 // ===============================
@@ -224,6 +246,8 @@ document.addEventListener("DOMContentLoaded", async () => {
 
     loadUnreadFromStorage();
     updateTotalUnread();
+
+    await chatRosterLoaded;
     Object.keys(unreadMessages).forEach(uid => updateBadge(uid));
 
     await syncUnreadCountsWithServer();
@@ -347,25 +371,31 @@ function initializeChatUI() {
 
     backBtn.addEventListener("click", showUsersList);
 
-    document.querySelectorAll(".chat-user").forEach(el => {
-        el.addEventListener("click", () => {
-            document.querySelectorAll(".chat-user")
-                .forEach(u => u.classList.remove("active"));
-            el.classList.add("active");
+    document.getElementById("chatBody").addEventListener("scroll", (evt) => {
+        if (evt.target.scrollTop < HISTORY_LOAD_THRESHOLD) loadOlderMessages();
+    });
 
-            const userId = el.dataset.userId;
-            const name   = el.querySelector(".chat-user-name").textContent;
+    // Delegated: roster entries arrive later as an HTMX fragment
+    document.getElementById("chatUsers").addEventListener("click", (evt) => {
+        const el = evt.target.closest(".chat-user");
+        if (!el) return;
 
-            if (!soundEnabled) {
-                enableSound();
-            }
+        document.querySelectorAll(".chat-user")
+            .forEach(u => u.classList.remove("active"));
+        el.classList.add("active");
 
-            if (userId === "group") {
-                openGroupChat();
-            } else {
-                openChat(userId, name);
-            }
-        });
+        const userId = el.dataset.userId;
+        const name   = el.querySelector(".chat-user-name").textContent;
+
+        if (!soundEnabled) {
+            enableSound();
+        }
+
+        if (userId === "group") {
+            openGroupChat();
+        } else {
+            openChat(userId, name);
+        }
     });
 }
 
@@ -541,6 +571,7 @@ function connectToUser(userId) {
         if (isCurrentChatActive(chatUserId)) {
             console.log(`→ Rendering msg in active chat ${chatUserId}`);
             renderMessage(data, senderId);
+            if (senderId !== String(window.CURRENT_USER_ID)) markConversationRead(chatUserId, data.id);
         }
 
         const isFromMe = senderId === myId;
@@ -629,6 +660,7 @@ function connectGroupChat() {
             console.log("→ Rendering message in active group chat");
 
             renderGroupMessage(data, senderId, senderName);
+            if (senderId !== myId) markConversationRead("group", data.id);
         }
 
         const isFromMe = senderId === myId;
@@ -675,6 +707,7 @@ async function openChat(userId, userName) {
     await loadMessages(sUserId);
 
     clearUnreadBadge(sUserId);
+    markConversationRead(sUserId);
 
     // Автоскролл
     scrollChatToBottom();
@@ -701,6 +734,7 @@ async function openGroupChat() {
     await loadGroupMessages();
 
     clearUnreadBadge("group");
+    markConversationRead("group");
 
     scrollChatToBottom();
 }
@@ -710,36 +744,85 @@ async function openGroupChat() {
 // LOAD MESSAGES FOR PRIVATE CHAT
 // ===============================
 async function loadMessages(userId) {
+    await loadLatestPage(`/chat/messages/${userId}/`);
+}
+
+
+// ===============================
+// LOAD GROUP MESSAGES
+// ===============================
+async function loadGroupMessages() {
+    await loadLatestPage(`/chat/group-messages/`);
+}
+
+
+// ===============================
+// HISTORY PAGES
+// ===============================
+async function fetchHistoryPage(url, before = null) {
+    const query = before ? `?before=${encodeURIComponent(before)}` : "";
+    const response = await fetch(url + query);
+    if (!response.ok) throw new Error(`HTTP ${response.status}`);
+    return response.json();
+}
+
+function buildHistoryMessage(msg) {
+    return isGroupChatActive
+        ? buildGroupMessageElement(msg, String(msg.sender), msg.sender_name)
+        : buildMessageElement(msg, String(msg.sender));
+}
+
+async function loadLatestPage(url) {
+    const chat = currentUser;
+    chatHistory = { url, before: null, hasMore: false, loading: true };
+
     try {
-        const response = await fetch(`/chat/messages/${userId}/`);
-        const data = await response.json();
+        const data = await fetchHistoryPage(url);
+        if (chat !== currentUser) return;  // another chat was opened meanwhile
 
         data.messages.forEach(msg => {
-            renderMessage(msg, String(msg.sender));
+            if (isGroupChatActive) {
+                renderGroupMessage(msg, String(msg.sender), msg.sender_name);
+            } else {
+                renderMessage(msg, String(msg.sender));
+            }
         });
+        chatHistory.before = data.before;
+        chatHistory.hasMore = data.has_more;
     } catch (e) {
         console.error("Failed to load messages:", e);
+    } finally {
+        if (chatHistory.url === url) chatHistory.loading = false;
     }
 }
 
+async function loadOlderMessages() {
+    if (!chatHistory.url || !chatHistory.hasMore || chatHistory.loading) return;
+
+    const chat = currentUser;
+    const url = chatHistory.url;
+    chatHistory.loading = true;
 
-// ===============================
-// LOAD GROUP MESSAGES
-// ===============================
-async function loadGroupMessages() {
     try {
-        const response = await fetch(`/chat/group-messages/`);
-        const data = await response.json();
+        const data = await fetchHistoryPage(url, chatHistory.before);
+        if (chat !== currentUser || url !== chatHistory.url) return;
 
-        data.messages.forEach(msg => {
-            renderGroupMessage(
-                msg,
-                String(msg.sender),
-                msg.sender_name
-            );
-        });
+        const body = document.getElementById("chatBody");
+        const previousHeight = body.scrollHeight;
+
+        const fragment = document.createDocumentFragment();
+        data.messages.forEach(msg => fragment.appendChild(buildHistoryMessage(msg)));
+        body.insertBefore(fragment, body.firstChild);
+
+        // Keep the message the user was looking at in place
+        body.scrollTop += body.scrollHeight - previousHeight;
+
+        chatHistory.before = data.before;
+        chatHistory.hasMore = data.has_more;
     } catch (e) {
-        console.error("Failed to load group messages:", e);
+        console.error("Failed to load older messages:", e);
+    } finally {
+        if (chatHistory.url === url) chatHistory.loading = false;
     }
 }
 
@@ -774,10 +857,7 @@ function clearUnreadBadge(userId) {
 // ===============================
 // RENDER PERSONAL MESSAGES
 // ===============================
-function renderMessage(messageObj, senderId) {
-    const body = document.getElementById("chatBody");
-    if (!body) return;
-    
+function buildMessageElement(messageObj, senderId) {
     const myId = String(window.CURRENT_USER_ID);
 
     const div = document.createElement("div");
@@ -804,30 +884,21 @@ function renderMessage(messageObj, senderId) {
         }
     }
 
-    div.style.opacity = '0';
-    div.style.transform = 'translateY(10px)';
+    return div;
+}
 
-    body.appendChild(div);
-    
-    requestAnimationFrame(() => {
-        requestAnimationFrame(() => {
-            div.style.transition = 'opacity 0.3s ease-out, transform 0.3s ease-out';
-            div.style.opacity = '1';
-            div.style.transform = 'translateY(0)';
-        });
-    });
-    
-    scrollChatToBottom();
+function renderMessage(messageObj, senderId) {
+    const body = document.getElementById("chatBody");
+    if (!body) return;
+
+    appendAnimated(body, buildMessageElement(messageObj, senderId));
 }
 
 
 // ===============================
 // RENDER GROUP MESSAGES
 // ===============================
-function renderGroupMessage(messageObj, senderId, senderName) {
-    const body = document.getElementById("chatBody");
-    if (!body) return;
-    
+function buildGroupMessageElement(messageObj, senderId, senderName) {
     const myId = String(window.CURRENT_USER_ID);
 
     const div = document.createElement("div");
@@ -854,7 +925,18 @@ function renderGroupMessage(messageObj, senderId, senderName) {
         );
         div.appendChild(fileLink);
     }
- 
+
+    return div;
+}
+
+function renderGroupMessage(messageObj, senderId, senderName) {
+    const body = document.getElementById("chatBody");
+    if (!body) return;
+
+    appendAnimated(body, buildGroupMessageElement(messageObj, senderId, senderName));
+}
+
+function appendAnimated(body, div) {
     div.style.opacity = '0';
     div.style.transform = 'translateY(10px)';
 
@@ -995,17 +1077,17 @@ async function syncUnreadCountsWithServer() {
         const response = await fetch('/chat/unread-counts/');
         if (!response.ok) return;
 
+        // Exact counts per conversation: the server is the source of truth
         const data = await response.json();
+        const conversations = new Set([...Object.keys(unreadMessages), ...Object.keys(data)]);
 
-        Object.keys(data).forEach(userId => {
-            const count = data[userId];
-            if (count > 0) {
-                unreadMessages[userId] = count;
-            }
+        unreadMessages = {};
+        Object.keys(data).forEach(conversation => {
+            if (data[conversation] > 0) unreadMessages[conversation] = data[conversation];
         });
 
         saveUnreadToStorage();
-        Object.keys(unreadMessages).forEach(uid => updateBadge(uid));
+        conversations.forEach(uid => updateBadge(uid));
         updateTotalUnread();
 
         console.log("Unread counts synced with server");
@@ -1015,6 +1097,55 @@ async function syncUnreadCountsWithServer() {
 }
 
 
+// ===============================
+// READ RECEIPTS
+// ===============================
+let readReceiptTimers = {};
+
+function markConversationRead(conversation, lastId = null) {
+    // Several messages in a row while the chat is open → one request
+    clearTimeout(readReceiptTimers[conversation]);
+    readReceiptTimers[conversation] = setTimeout(async () => {
+        delete readReceiptTimers[conversation];
+
+        const url = conversation === "group" ? "/chat/read/group/" : `/chat/read/${conversation}/`;
+        const body = new URLSearchParams();
+        if (lastId) body.append("last_id", lastId);
+
+        try {
+            await fetch(url, {
+                method: "POST",
+                headers: { "X-CSRFToken": getCookie("csrftoken") },
+                body,
+            });
+        } catch (e) {
+            console.error("Failed to mark conversation read:", e);
+        }
+    }, 300);
+}
+
+// chat_unread events from ws/notifications/ (notifications.js)
+document.addEventListener("chat:unread", (evt) => {
+    const conversation = String(evt.detail.conversation);
+    const unread = evt.detail.unread;
+
+    if (unread > 0 && isCurrentChatActive(conversation)) {
+        // The message is already on screen
+        markConversationRead(conversation);
+        return;
+    }
+
+    if (unread > 0) {
+        unreadMessages[conversation] = unread;
+    } else {
+        delete unreadMessages[conversation];
+    }
+    saveUnreadToStorage();
+    updateBadge(conversation);
+    updateTotalUnread();
+});
+
+
 // ===============================
 // SOUND NOTIFICATIONS
 // ===============================
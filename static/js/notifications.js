@@ -0,0 +1,142 @@
+/******************************************************
+ *  NOTIFICATIONS.JS
+ *  Live badge counts, task, lock and chat unread events (ws/notifications/)
+ ******************************************************/
+
+// ===============================
+// GLOBAL VARS
+// ===============================
+let notificationsWs = null;
+let notificationsReconnectDelay = 1000;
+let tasksReloadTimer = null;
+const lockExpiryTimers = new Map();
+
+const NOTIFICATIONS_MAX_RECONNECT_DELAY = 30 * 1000;
+
+
+// ===============================
+// CONNECTION
+// ===============================
+function connectNotifications() {
+    if (!window.CURRENT_USER_ID) return;
+
+    const protocol = window.location.protocol === "https:" ? "wss://" : "ws://";
+    const ws = new WebSocket(
+        protocol + window.location.host +
+        `/ws/notifications/?token=${encodeURIComponent(window.ACCESS_TOKEN || "")}`
+    );
+    notificationsWs = ws;
+
+    ws.addEventListener("open", () => {
+        notificationsReconnectDelay = 1000;
+        // Locks may have been taken or released while disconnected
+        requestEmployeeLocks();
+    });
+
+    ws.addEventListener("message", (e) => {
+        handleNotificationEvent(JSON.parse(e.data));
+    });
+
+    ws.addEventListener("close", async () => {
+        if (notificationsWs !== ws) return;
+        notificationsWs = null;
+
+        // Counts may change while disconnected: one refresh from the server cache
+        htmx.trigger(document.body, "badges-refresh");
+
+        await new Promise(r => setTimeout(r, notificationsReconnectDelay));
+        notificationsReconnectDelay = Math.min(notificationsReconnectDelay * 2, NOTIFICATIONS_MAX_RECONNECT_DELAY);
+
+        if (typeof window.refreshAccessToken === "function") {
+            await window.refreshAccessToken();
+        }
+        connectNotifications();
+    });
+}
+
+
+// ===============================
+// EVENTS
+// ===============================
+function handleNotificationEvent(data) {
+    if ("notifications" in data) setBadge("notifications", data.notifications);
+    if ("tasks" in data) setBadge("tasks", data.tasks);
+
+    if (data.event === "task") {
+        scheduleTasksReload();
+    } else if (data.event === "lock") {
+        markEmployeeLocked(data.employee_id, data.locked_by, data.expires_in);
+    } else if (data.event === "locks") {
+        applyEmployeeLocks(data.locks, data.employee_ids);
+    } else if (data.event === "chat_unread") {
+        // Exact per-conversation counter, handled by chat.js
+        document.dispatchEvent(new CustomEvent("chat:unread", { detail: data }));
+    }
+}
+
+function setBadge(name, count) {
+    document.querySelectorAll(`#badge-${name}, [data-badge="${name}"]`).forEach(el => {
+        el.textContent = count;
+    });
+}
+
+function scheduleTasksReload() {
+    // Only when the tasks board is open; several events in a row → one reload
+    if (!document.getElementById("tasks-board") || typeof loadTasks !== "function") return;
+
+    clearTimeout(tasksReloadTimer);
+    tasksReloadTimer = setTimeout(() => {
+        loadTasks(typeof currentFilter !== "undefined" ? currentFilter : {});
+    }, 300);
+}
+
+function markEmployeeLocked(employeeId, lockedBy, expiresIn) {
+    const locked = Boolean(lockedBy) && String(lockedBy) !== String(window.CURRENT_USER_ID);
+    document.querySelectorAll(`.employees-table__row[data-employee-id="${employeeId}"]`).forEach(row => {
+        row.classList.toggle("employees-table__row--locked", locked);
+    });
+
+    // A lock that lapses in the cache (closed tab, timeout) is never unlocked explicitly
+    const key = String(employeeId);
+    clearTimeout(lockExpiryTimers.get(key));
+    lockExpiryTimers.delete(key);
+    if (locked && expiresIn) {
+        lockExpiryTimers.set(key, setTimeout(() => markEmployeeLocked(employeeId, null), expiresIn * 1000));
+    }
+}
+
+function visibleEmployeeIds() {
+    const ids = new Set();
+    document.querySelectorAll(".employees-table__row[data-employee-id]").forEach(row => {
+        ids.add(Number(row.dataset.employeeId));
+    });
+    return [...ids];
+}
+
+// locks: {employee_id: {locked_by, expires_in}}; rows of employeeIds missing from it are unlocked
+function applyEmployeeLocks(locks, employeeIds = []) {
+    locks = locks || {};
+    employeeIds.forEach(id => {
+        if (!(id in locks)) markEmployeeLocked(id, null);
+    });
+    Object.entries(locks).forEach(([id, lock]) => markEmployeeLocked(id, lock.locked_by, lock.expires_in));
+}
+
+function requestEmployeeLocks() {
+    const employeeIds = visibleEmployeeIds();
+    if (!employeeIds.length || !notificationsWs || notificationsWs.readyState !== WebSocket.OPEN) return;
+    notificationsWs.send(JSON.stringify({ type: "locks", employee_ids: employeeIds }));
+}
+
+// Locks rendered with the table (main/partials/employees_table_body.html)
+function applyPageEmployeeLocks() {
+    const script = document.getElementById("employee-edit-locks");
+    if (script) applyEmployeeLocks(JSON.parse(script.textContent));
+}
+
+
+document.addEventListener("DOMContentLoaded", () => {
+    applyPageEmployeeLocks();
+    connectNotifications();
+});
+document.addEventListener("htmx:afterSwap", applyPageEmployeeLocks);
@@ -236,3 +236,692 @@ def parse_contact(contact_str):
         return parts[0], parts[1]   # 'viber', '+48453172686'
 
     return None, None
+
+
+# =====================================================================
+# Векторизованный препроцессинг (целые колонки за раз, без strptime по строкам)
+# =====================================================================
+
+DATE_COLUMNS = ("Від", "До", "Дата", "Термін документу")
+# Порядок важен: совпадает с clean_and_parse_row (m/d/Y раньше d/m/Y),
+# двузначный год (выгрузки XLSX) — последним
+DATE_FORMATS = ("%d.%m.%Y", "%Y-%m-%d", "%m/%d/%Y", "%d/%m/%Y", "%d.%m.%y")
+# Совпадает с parse_date_field (дата в "Дозвіл на роботу")
+PERMIT_DATE_FORMATS = ("%d.%m.%Y", "%Y-%m-%d", "%d/%m/%Y", "%d.%m.%y")
+
+CONTRACT_TYPE_MAP = {
+    "o prace": "o_prace",
+    "zlecenia": "zlecenia",
+}
+
+FRAME_DATE_COLUMNS = (
+    "start_date", "end_date", "doc_valid_until", "permit_end_date", "submission_date",
+)
+
+
+def read_import_csv(path):
+    df = pd.read_csv(
+        path,
+        delimiter=",",
+        encoding="utf-8",
+        dtype=str,
+    )
+    df.index = df.index + 2  # номер строки в файле (1 — заголовок)
+    return normalize_raw_frame(df)
+
+
+def iter_csv_frames(path, chunk_size=5000):
+    """Читает CSV пачками по chunk_size строк; индекс — номер строки в файле."""
+    chunks = pd.read_csv(
+        path,
+        delimiter=",",
+        encoding="utf-8",
+        dtype=str,
+        chunksize=chunk_size,
+    )
+    for df in chunks:
+        df.index = df.index + 2
+        yield normalize_raw_frame(df)
+
+
+def normalize_raw_frame(df):
+    df = df.apply(lambda col: col.str.strip() if col.dtype == "object" else col)
+    if "Призвіще" in df:
+        df["Призвіще"] = df["Призвіще"].str.replace(r"^\d+\.\s*", "", regex=True)
+    return df
+
+
+def parse_date_column(series, formats=DATE_FORMATS):
+    """Парсит колонку строк в datetime64, пробуя форматы по очереди; мусор → NaT."""
+    values = series.astype("string").str.strip()
+    parsed = pd.Series(pd.NaT, index=series.index, dtype="datetime64[ns]")
+    for fmt in formats:
+        missing = parsed.isna()
+        if not missing.any():
+            break
+        parsed = parsed.fillna(pd.to_datetime(values.where(missing), format=fmt, errors="coerce"))
+    return parsed
+
+
+def _text_column(df, name):
+    """Колонка как string dtype: NaN и пустые строки → <NA>."""
+    if name not in df:
+        return pd.Series(pd.NA, index=df.index, dtype="string")
+    col = df[name].astype("string").str.strip()
+    return col.mask(col == "")
+
+
+def preprocess_frame(df):
+    """
+    Нормализует сырой CSV/XLSX фрейм целиком и возвращает типизированный фрейм,
+    по одной строке на сотрудника, готовый для bulk_create_from_frame.
+    """
+    out = pd.DataFrame(index=df.index)
+
+    # -------------------------------
+    # 1. Имя: "Фамилия Имя ..." → last_name / first_name
+    # -------------------------------
+    raw_name = _text_column(df, "Призвіще").fillna("")
+    parts = raw_name.str.split()
+    has_two = parts.str.len() >= 2
+    out["first_name"] = parts.str[1].where(has_two, raw_name).astype("string")
+    out["last_name"] = parts.str[0].where(has_two, "").astype("string")
+
+    # -------------------------------
+    # 2. Поля Employee
+    # -------------------------------
+    out["age"] = pd.to_numeric(_text_column(df, "Вік"), errors="coerce").astype("Int64")
+    out["is_student"] = _text_column(df, "Студент").notna()
+    out["pesel"] = _text_column(df, "Песель")
+    out["pesel_urk"] = _text_column(df, "UKR").notna()
+    out["workplace"] = _text_column(df, "Місце затруднення")
+    out["pit_2"] = _text_column(df, "Пит-2").notna()
+
+    # -------------------------------
+    # 3. EmploymentPeriod
+    # -------------------------------
+    out["start_date"] = parse_date_column(_text_column(df, "Від"))
+    out["end_date"] = parse_date_column(_text_column(df, "До"))
+
+    # -------------------------------
+    # 4. Document: "karta RS123" → ("karta", "RS123"), иначе тип в lower
+    # -------------------------------
+    basis = _text_column(df, "Підстава").str.lower()
+    is_karta = basis.str.startswith("karta").fillna(False)
+    number = _text_column(df, "Підстава").str.replace(r"(?i)^karta", "", regex=True).str.strip()
+    out["doc_type"] = basis.where(~is_karta, "karta")
+    out["doc_number"] = number.where(is_karta & (number != ""))
+    out["doc_valid_until"] = parse_date_column(_text_column(df, "Термін документу")).where(basis.notna())
+
+    # -------------------------------
+    # 5. Contract / Sanepid
+    # -------------------------------
+    out["contract_type"] = _text_column(df, "Вид умови").map(CONTRACT_TYPE_MAP).astype("string")
+    out["sanepid"] = _text_column(df, "Sanepid").str.lower()
+
+    # -------------------------------
+    # 6. Work Permit: "<номер> do <дата>"
+    # -------------------------------
+    permit = _text_column(df, "Дозвіл на роботу").str.split(r"\s*\bdo\b\s*", n=1, regex=True)
+    out["permit_doc"] = permit.str[0].astype("string").str.strip()
+    out["permit_end_date"] = parse_date_column(permit.str[1], PERMIT_DATE_FORMATS)
+
+    # -------------------------------
+    # 7. Card Submission
+    # -------------------------------
+    out["submission_type"] = _text_column(df, "Подача на карту")
+    out["submission_date"] = parse_date_column(_text_column(df, "Дата"))
+
+    # -------------------------------
+    # 8. Contacts: email или "<тип> <значение>"
+    # -------------------------------
+    contact = _text_column(df, "Контакт")
+    contact_parts = contact.str.split()
+    is_email = contact.str.contains("@", regex=False).fillna(False)
+    is_pair = (contact_parts.str.len() == 2) & ~is_email
+    out["has_contact"] = contact.notna()
+    out["contact_type"] = pd.Series(pd.NA, index=df.index, dtype="string")
+    out.loc[is_email, "contact_type"] = "email"
+    out.loc[is_pair, "contact_type"] = contact_parts[is_pair].str[0]
+    out["contact_value"] = contact.where(is_email)
+    out.loc[is_pair, "contact_value"] = contact_parts[is_pair].str[1]
+
+    return out
+
+
+def _frame_records(frame):
+    """Типизированный фрейм → список dict с None вместо NA/NaT и date вместо Timestamp."""
+    frame = frame.copy()
+    for name in FRAME_DATE_COLUMNS:
+        frame[name] = frame[name].dt.date
+    frame = frame.astype(object)
+    return frame.where(frame.notna(), None).to_dict(orient="records")
+
+
+def build_objects_from_record(rec):
+    """
+    Возвращает (employee, [связанные объекты без employee]) для одной строки фрейма.
+    Без запросов в БД — привязка к employee делается после bulk_create.
+    """
+    employee = Employee(
+        first_name=rec["first_name"],
+        last_name=rec["last_name"],
+        age=rec["age"],
+        is_student=rec["is_student"],
+        pesel=rec["pesel"],
+        pesel_urk=rec["pesel_urk"],
+        workplace=rec["workplace"],
+        pit_2=rec["pit_2"],
+        import_hash=rec.get("import_hash"),
+    )
+
+    related = []
+    if rec["start_date"]:
+        related.append(EmploymentPeriod(start_date=rec["start_date"], end_date=rec["end_date"]))
+
+    related.append(Document(
+        doc_type=rec["doc_type"],
+        number=rec["doc_number"],
+        valid_until=rec["doc_valid_until"],
+    ))
+
+    if rec["contract_type"]:
+        related.append(Contract(contract_type=rec["contract_type"]))
+
+    if rec["sanepid"]:
+        related.append(Sanepid(status=rec["sanepid"], doc_type=rec["sanepid"]))
+
+    if rec["permit_doc"] is not None:
+        related.append(WorkPermit(doc_type=rec["permit_doc"], end_date=rec["permit_end_date"]))
+
+    if rec["submission_type"]:
+        related.append(CardSubmission(doc_type=rec["submission_type"], start_date=rec["submission_date"]))
+
+    if rec["has_contact"]:
+        related.append(Contact(contact_type=rec["contact_type"], value=rec["contact_value"]))
+
+    return employee, related
+
+
+def bulk_create_from_frame(frame, batch_size=500, changed_by=None, dry_run=False):
+    """
+    Создает сотрудников и связанные объекты из типизированного фрейма пачками
+    (по batch_size строк: один INSERT на модель на пачку) + записи History "created".
+
+    dry_run=True — запись будет откачена вызывающим, поэтому общий кеш не сбрасывается.
+
+    Возвращает количество созданных сотрудников.
+    """
+    return len(_bulk_create_records(_frame_records(frame), batch_size, changed_by, dry_run))
+
+
+def _bulk_create_records(records, batch_size=500, changed_by=None, dry_run=False):
+    from django.contrib.contenttypes.models import ContentType
+    from django.db import transaction
+    from apps.main.employee_cache import invalidate_employee_list
+    from apps.main.models import History, DataVersion
+
+    ct = ContentType.objects.get_for_model(Employee)
+    created = []
+
+    for start in range(0, len(records), batch_size):
+        chunk = [build_objects_from_record(rec) for rec in records[start:start + batch_size]]
+
+        with transaction.atomic():
+            employees = Employee.objects.bulk_create([employee for employee, _ in chunk])
+
+            related_by_model = {}
+            for employee, related in chunk:
+                for obj in related:
+                    obj.employee = employee
+                    related_by_model.setdefault(type(obj), []).append(obj)
+
+            for model, objs in related_by_model.items():
+                model.objects.bulk_create(objs)
+
+            History.objects.bulk_create([
+                History(
+                    content_type=ct,
+                    object_id=employee.pk,
+                    field_name="__all__",
+                    changed_by=changed_by,
+                    action="created",
+                )
+                for employee in employees
+            ])
+
+        created.extend(employees)
+
+    if created:
+        # Версия кеша списка не транзакционная: пробный прогон ее не трогает
+        if not dry_run:
+            invalidate_employee_list()
+        DataVersion.bump()
+
+    return created
+
+
+# =====================================================================
+# Инкрементальный импорт (upsert по PESEL / имени + хеш содержимого строки)
+# =====================================================================
+
+EMPLOYEE_IMPORT_FIELDS = (
+    "first_name", "last_name", "age", "is_student", "pesel", "pesel_urk", "workplace", "pit_2",
+)
+
+# Поля связанных моделей, которые заполняет импорт (по одному объекту каждой модели)
+RELATED_IMPORT_FIELDS = {
+    EmploymentPeriod: ("start_date", "end_date"),
+    Document: ("doc_type", "number", "valid_until"),
+    Contract: ("contract_type",),
+    Sanepid: ("status", "doc_type"),
+    WorkPermit: ("doc_type", "end_date"),
+    CardSubmission: ("doc_type", "start_date"),
+    Contact: ("contact_type", "value"),
+}
+
+RELATED_NAMES = {
+    EmploymentPeriod: "employment_period",
+    Document: "documents",
+    Contract: "contracts",
+    Sanepid: "sanepids",
+    WorkPermit: "work_permits",
+    CardSubmission: "card_submissions",
+    Contact: "contacts",
+}
+
+
+def employee_import_key(pesel, first_name, last_name):
+    """Ключ сопоставления: PESEL, а если его нет — нормализованное "фамилия имя"."""
+    pesel = "".join((pesel or "").split())
+    if pesel:
+        return f"pesel:{pesel}"
+    return "name:" + " ".join(f"{last_name or ''} {first_name or ''}".lower().split())
+
+
+def add_import_keys(frame):
+    """Добавляет к типизированному фрейму колонки import_key и import_hash (векторно)."""
+    frame = frame.copy()
+    content = frame.drop(columns=["import_key", "import_hash"], errors="ignore")
+
+    pesel = frame["pesel"].str.replace(r"\s+", "", regex=True)
+    pesel = pesel.mask(pesel == "")
+    name = (frame["last_name"].fillna("") + " " + frame["first_name"].fillna("")).str.lower()
+    frame["import_key"] = ("pesel:" + pesel).fillna("name:" + name.str.split().str.join(" "))
+    frame["import_hash"] = pd.util.hash_pandas_object(content, index=False).map("{:016x}".format)
+    return frame
+
+
+class ImportIndex:
+    """
+    import_key → (id, import_hash) всех существующих сотрудников, загруженный
+    одним запросом. Один индекс можно переиспользовать между пачками потокового импорта.
+
+    dry_hashes — import_key → import_hash строк, записанных пробным прогоном:
+    их запись откатывается, id нет, но повтор ключа в следующей пачке должен
+    считаться обновлением или без изменений, как при настоящей записи.
+    """
+
+    def __init__(self):
+        self.ids = {}
+        self.hashes = {}
+        self.dry_hashes = {}
+
+    @classmethod
+    def load(cls):
+        index = cls()
+        rows = Employee.objects.order_by("id").values_list(
+            "id", "pesel", "first_name", "last_name", "import_hash"
+        )
+        for pk, pesel, first_name, last_name, import_hash in rows.iterator(chunk_size=5000):
+            key = employee_import_key(pesel, first_name, last_name)
+            if key not in index.ids:
+                index.add(key, pk, import_hash)
+        return index
+
+    def add(self, key, pk, import_hash):
+        self.ids[key] = pk
+        self.hashes[key] = import_hash
+
+
+def upsert_from_frame(frame, batch_size=500, changed_by=None, index=None, dry_run=False):
+    """
+    Идемпотентный импорт: строки сопоставляются с существующими сотрудниками
+    по import_key через ImportIndex; строки с тем же import_hash пропускаются,
+    новые создаются пачками через bulk_create, измененные — update_from_frame.
+
+    dry_run=True — запись будет откачена вызывающим: индекс не пополняется id
+    откаченных строк (ключи запоминаются в ImportIndex.dry_hashes), кеш списка
+    не сбрасывается.
+
+    Возвращает dict(created=..., updated=..., unchanged=...).
+    """
+    if index is None:
+        index = ImportIndex.load()
+
+    frame = add_import_keys(frame).drop_duplicates("import_key", keep="last")
+    keys = frame["import_key"]
+
+    ids = keys.map(index.ids)
+    old_hashes = keys.map(index.hashes)
+
+    # Ключи, уже записанные этим пробным прогоном в предыдущих пачках
+    dry_seen = keys.isin(index.dry_hashes.keys())
+    old_hashes = old_hashes.where(~dry_seen, keys.map(index.dry_hashes))
+
+    is_new = ids.isna() & ~dry_seen
+    is_unchanged = ~is_new & (old_hashes == frame["import_hash"])
+    is_changed = ~is_new & ~is_unchanged
+    # Созданы откаченной записью — обновлять нечего, только посчитать
+    is_dry_changed = is_changed & ids.isna()
+    is_changed &= ~is_dry_changed
+
+    new_rows = frame[is_new]
+    employees = _bulk_create_records(_frame_records(new_rows), batch_size, changed_by, dry_run)
+
+    changed_rows = frame[is_changed]
+    changed_ids = ids[is_changed].astype(int).tolist()
+    updated = update_from_frame(
+        changed_rows, changed_ids, batch_size=batch_size, changed_by=changed_by, dry_run=dry_run
+    )
+
+    if dry_run:
+        written = frame[is_new | is_changed | is_dry_changed]
+        index.dry_hashes.update(zip(written["import_key"], written["import_hash"]))
+    else:
+        for key, employee in zip(new_rows["import_key"], employees):
+            index.add(key, employee.pk, employee.import_hash)
+        for key, pk, import_hash in zip(changed_rows["import_key"], changed_ids, changed_rows["import_hash"]):
+            index.add(key, pk, import_hash)
+
+    # Хеш строки изменился, но значения полей те же (например, другие пробелы)
+    return {
+        "created": len(employees),
+        "updated": updated + int(is_dry_changed.sum()),
+        "unchanged": int(is_unchanged.sum()) + len(changed_ids) - updated,
+    }
+
+
+def update_from_frame(frame, employee_ids, batch_size=500, changed_by=None, dry_run=False):
+    """
+    Пишет в существующих сотрудников (и их связанные объекты) только изменившиеся поля:
+    bulk_update на модель на пачку + History "updated" для каждого поля.
+    dry_run=True — запись будет откачена вызывающим, общий кеш не сбрасывается.
+
+    Импорт только дополняет и обновляет: связанный объект, чьи поля в CSV очищены,
+    не удаляется (в файле одна запись на модель, а в интерфейсе их может быть
+    несколько) — удалять такие записи нужно в интерфейсе.
+
+    Возвращает количество сотрудников, у которых действительно изменились поля;
+    у остальных обновляется только import_hash.
+    """
+    from django.contrib.contenttypes.models import ContentType
+    from django.db import transaction
+    from apps.main.employee_cache import invalidate_employee_list
+    from apps.main.models import History, DataVersion
+
+    records = _frame_records(frame)
+    updated = 0
+
+    for start in range(0, len(records), batch_size):
+        chunk = list(zip(employee_ids[start:start + batch_size], records[start:start + batch_size]))
+        employees = Employee.objects.prefetch_related(*RELATED_NAMES.values()).in_bulk(
+            [pk for pk, _ in chunk]
+        )
+
+        to_update = {}
+        update_fields = {}
+        to_create = []
+        history = []
+
+        def diff(obj, target, fields):
+            changed = []
+            for name in fields:
+                old = getattr(obj, name)
+                new = getattr(target, name)
+                old_val = obj._prepare_value(old)
+                new_val = obj._prepare_value(new)
+                if old_val != new_val:
+                    setattr(obj, name, new)
+                    changed.append(name)
+                    history.append(History(
+                        content_type=ContentType.objects.get_for_model(obj),
+                        object_id=obj.pk,
+                        field_name=name,
+                        old_value=old_val,
+                        new_value=new_val,
+                        changed_by=changed_by,
+                        action="updated",
+                    ))
+            if changed:
+                to_update.setdefault(type(obj), {})[obj.pk] = obj
+                update_fields.setdefault(type(obj), set()).update(changed)
+            return changed
+
+        for pk, rec in chunk:
+            employee = employees.get(pk)
+            if employee is None:
+                continue
+
+            target, related = build_objects_from_record(rec)
+            changed = bool(diff(employee, target, EMPLOYEE_IMPORT_FIELDS))
+
+            for obj in related:
+                current = sorted(
+                    getattr(employee, RELATED_NAMES[type(obj)]).all(), key=lambda o: o.pk
+                )
+                if current:
+                    changed |= bool(diff(current[0], obj, RELATED_IMPORT_FIELDS[type(obj)]))
+                else:
+                    obj.employee = employee
+                    to_create.append(obj)
+                    changed = True
+
+            # updated_at — только при реальных изменениях: по нему после импорта
+            # выбираются сотрудники для пересчета сроков и уведомлений
+            employee.import_hash = target.import_hash
+            if changed:
+                employee.updated_at = now()
+                updated += 1
+            to_update.setdefault(Employee, {})[employee.pk] = employee
+            update_fields.setdefault(Employee, set()).update({"import_hash", "updated_at"})
+
+        with transaction.atomic():
+            for model, objs in to_update.items():
+                model.objects.bulk_update(list(objs.values()), sorted(update_fields[model]))
+
+            created_by_model = {}
+            for obj in to_create:
+                created_by_model.setdefault(type(obj), []).append(obj)
+            for model, objs in created_by_model.items():
+                model.objects.bulk_create(objs)
+
+            History.objects.bulk_create(history)
+
+    if updated:
+        if not dry_run:
+            invalidate_employee_list()
+        DataVersion.bump()
+
+    return updated
+
+
+# =====================================================================
+# Валидация и общий потоковый конвейер (CSV и XLSX)
+# =====================================================================
+
+# Сырые колонки с датами → колонки типизированного фрейма
+VALIDATED_DATE_COLUMNS = {
+    "Від": "start_date",
+    "До": "end_date",
+    "Дата": "submission_date",
+}
+
+
+def validate_frame(raw, frame):
+    """
+    Построчная проверка сырого фрейма и результата preprocess_frame.
+
+    Возвращает (valid, errors): valid — bool Series по строкам, errors — список
+    dict(row=..., column=..., value=..., error=...), row — индекс строки в raw.
+    """
+    errors = []
+    valid = pd.Series(True, index=raw.index)
+
+    def fail(mask, column, message):
+        nonlocal valid
+        mask = mask.fillna(False).astype(bool)
+        if not mask.any():
+            return
+        values = _text_column(raw, column)
+        for row, value in values[mask].items():
+            errors.append({
+                "row": row,
+                "column": column,
+                "value": None if pd.isna(value) else value,
+                "error": message,
+            })
+        valid &= ~mask
+
+    fail(_text_column(raw, "Призвіще").isna(), "Призвіще", "Не вказано прізвище та ім'я")
+    fail(_text_column(raw, "Вік").notna() & frame["age"].isna(), "Вік", "Вік має бути числом")
+
+    for column, target in VALIDATED_DATE_COLUMNS.items():
+        fail(_text_column(raw, column).notna() & frame[target].isna(), column, "Невірний формат дати")
+
+    fail(
+        _text_column(raw, "Термін документу").notna() & frame["doc_type"].notna() & frame["doc_valid_until"].isna(),
+        "Термін документу",
+        "Невірний формат дати",
+    )
+
+    permit_date = _text_column(raw, "Дозвіл на роботу").str.extract(r"\bdo\b\s*(.+)$", expand=False)
+    fail(
+        permit_date.notna() & frame["permit_end_date"].isna(),
+        "Дозвіл на роботу",
+        "Невірний формат дати дозволу",
+    )
+
+    return valid, errors
+
+
+def _validated_chunk(raw, report):
+    """preprocess + validate одной сырой пачки; счетчики и ошибки пишутся в report."""
+    frame = preprocess_frame(raw)
+    valid, errors = validate_frame(raw, frame)
+
+    report["rows"] += len(raw)
+    report["valid"] += int(valid.sum())
+    report["errors"].extend(errors)
+    return frame[valid]
+
+
+def _import_chunk(frame, report, batch_size, update, changed_by, index, dry_run=False):
+    """Запись одной типизированной пачки: bulk insert или upsert (update=True)."""
+    if update:
+        result = upsert_from_frame(
+            frame, batch_size=batch_size, changed_by=changed_by, index=index, dry_run=dry_run
+        )
+        for key in ("created", "updated", "unchanged"):
+            report[key] += result[key]
+    else:
+        report["created"] += bulk_create_from_frame(
+            frame, batch_size=batch_size, changed_by=changed_by, dry_run=dry_run
+        )
+
+
+def import_frames(raw_frames, batch_size=500, update=False, changed_by=None):
+    """
+    Общий конвейер импорта для потока сырых фреймов (iter_csv_frames / iter_xlsx_frames):
+    preprocess → validate → bulk insert (или upsert при update=True) по пачкам.
+    В памяти одновременно только одна пачка.
+
+    Возвращает отчет dict(rows, valid, created, updated, unchanged, errors).
+    """
+    report = {"rows": 0, "valid": 0, "created": 0, "updated": 0, "unchanged": 0, "errors": []}
+    index = ImportIndex.load() if update else None
+
+    for raw in raw_frames:
+        frame = _validated_chunk(raw, report)
+        _import_chunk(frame, report, batch_size, update, changed_by, index)
+
+    return report
+
+
+# =====================================================================
+# Двухфазный импорт: разбор в промежуточные файлы → пробный прогон → запись
+# =====================================================================
+
+SPOOL_SUFFIX = ".pkl"
+
+
+def spool_frames(raw_frames, spool_dir, on_progress=None):
+    """
+    Первая фаза фонового импорта: разбор и валидация файла ровно один раз.
+    Валидные типизированные пачки сохраняются в spool_dir (pickle, по файлу на пачку),
+    чтобы подтвержденный импорт не разбирал CSV/XLSX повторно.
+
+    Возвращает отчет dict(rows, valid, duplicates, errors); duplicates — строки,
+    чей import_key уже встречался выше в этом же файле.
+    on_progress(report) вызывается после каждой пачки.
+    """
+    import os
+
+    os.makedirs(spool_dir, exist_ok=True)
+    report = {"rows": 0, "valid": 0, "duplicates": 0, "errors": []}
+    seen = set()
+
+    for number, raw in enumerate(raw_frames):
+        frame = _validated_chunk(raw, report)
+
+        keys = add_import_keys(frame)["import_key"]
+        report["duplicates"] += int((keys.duplicated() | keys.isin(seen)).sum())
+        seen.update(keys)
+
+        frame.to_pickle(os.path.join(spool_dir, f"chunk_{number:05d}{SPOOL_SUFFIX}"))
+
+        if on_progress:
+            on_progress(report)
+
+    return report
+
+
+def iter_spooled_frames(spool_dir):
+    """Типизированные пачки, сохраненные spool_frames, в исходном порядке."""
+    import os
+
+    for name in sorted(os.listdir(spool_dir)):
+        if name.endswith(SPOOL_SUFFIX):
+            yield pd.read_pickle(os.path.join(spool_dir, name))
+
+
+def import_typed_frames(frames, batch_size=500, update=False, changed_by=None, dry_run=False, on_progress=None):
+    """
+    Вторая фаза: запись уже разобранных пачек (iter_spooled_frames).
+
+    dry_run=True — каждая пачка пишется в транзакции, которая откатывается:
+    отчет показывает, сколько строк будет создано/обновлено, а база не меняется.
+    Нетранзакционные побочные эффекты (сброс кеша списка, пополнение ImportIndex
+    id откаченных строк) при этом пропускаются; ключ, повторяющийся в разных
+    пачках, считается так же, как при настоящей записи.
+
+    Откат по пачкам (а не одна общая транзакция) оставляет on_progress-обновления,
+    сделанные между пачками, видимыми другим соединениям.
+
+    Возвращает dict(created, updated, unchanged).
+    """
+    from django.db import transaction
+
+    report = {"created": 0, "updated": 0, "unchanged": 0}
+    index = ImportIndex.load() if update else None
+
+    for frame in frames:
+        with transaction.atomic():
+            _import_chunk(frame, report, batch_size, update, changed_by, index, dry_run)
+            if dry_run:
+                transaction.set_rollback(True)
+
+        if on_progress:
+            on_progress(report)
+
+    return report
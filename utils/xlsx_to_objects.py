@@ -0,0 +1,83 @@
+from datetime import date, datetime
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from utils.csv_to_objects import normalize_raw_frame
+
+
+# Заголовки из выгрузок HR, которые отличаются от колонок CSV
+HEADER_ALIASES = {
+    "Призвіще, ім'я": "Призвіще",
+}
+
+PESEL_LENGTH = 11
+
+
+def _cell_to_text(value):
+    if value is None:
+        return None
+    if isinstance(value, (datetime, date)):
+        return value.strftime("%Y-%m-%d")
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _header(values):
+    names = []
+    for value in values:
+        name = (_cell_to_text(value) or "").strip()
+        names.append(HEADER_ALIASES.get(name, name))
+    return names
+
+
+def _make_frame(sheet_title, header, rows, row_numbers):
+    width = len(header)
+    df = pd.DataFrame(
+        [[_cell_to_text(v) for v in (tuple(row) + (None,) * width)[:width]] for row in rows],
+        columns=header,
+        dtype=str,
+    )
+    df = df.loc[:, [bool(name) for name in header]]
+    df.index = [f"{sheet_title}!{number}" for number in row_numbers]
+
+    if "Песель" in df:
+        # Ведущие нули PESEL: числовые ячейки их теряют, текстовые помечены "(" или "'"
+        pesel = df["Песель"].astype("string").str.strip().str.replace(r"^[(']+", "", regex=True)
+        is_digits = pesel.str.isdigit().fillna(False)
+        df["Песель"] = pesel.where(~is_digits, pesel.str.zfill(PESEL_LENGTH))
+
+    return normalize_raw_frame(df)
+
+
+def iter_xlsx_frames(file, chunk_size=5000):
+    """
+    Потоково читает все листы книги (openpyxl read-only) и отдает сырые фреймы
+    по chunk_size строк с колонками как в CSV. Индекс — "Лист!номер_строки".
+    Первая непустая строка листа — заголовок; пустые листы и строки пропускаются.
+    """
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            header = None
+            rows = []
+            row_numbers = []
+
+            for row_number, values in enumerate(sheet.iter_rows(values_only=True), 1):
+                if all(v is None or str(v).strip() == "" for v in values):
+                    continue
+                if header is None:
+                    header = _header(values)
+                    continue
+
+                rows.append(values)
+                row_numbers.append(row_number)
+                if len(rows) >= chunk_size:
+                    yield _make_frame(sheet.title, header, rows, row_numbers)
+                    rows, row_numbers = [], []
+
+            if rows:
+                yield _make_frame(sheet.title, header, rows, row_numbers)
+    finally:
+        workbook.close()